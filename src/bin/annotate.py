@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+"""
+    Annotate variants offline, with a store exported by the hub (see utils.offline).
+
+    Reads a list of ids, one per line, looked up with the scopes the
+    annotation endpoint would use, or a VCF file, plain or gzip compressed,
+    and writes the annotations as NDJSON.
+
+        python bin/annotate.py /data/offline/myvariant_hg19.sqlite ids.txt > annotations.ndjson
+        python bin/annotate.py /data/offline/myvariant_hg38.sqlite --vcf sample.vcf.gz -o annotations.ndjson
+"""
+import argparse
+import gzip
+import io
+import logging
+import os
+import sys
+import time
+from itertools import islice
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from utils.offline import OfflineAnnotator, OfflineStore  # noqa: E402
+from web.dispatch import IDDispatcher  # noqa: E402
+
+
+def open_input(path):
+    raw = sys.stdin.buffer if path == "-" else open(path, "rb")
+    if raw.peek(2)[:2] == b"\x1f\x8b":  # bgzip files are multi-member gzip files
+        raw = gzip.GzipFile(fileobj=raw)
+    return io.TextIOWrapper(raw, encoding="utf-8", errors="replace")
+
+
+def batches(lines, size):
+    while True:
+        batch = list(islice(lines, size))
+        if not batch:
+            return
+        yield batch
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("store", help="offline store exported by the hub")
+    parser.add_argument("input", nargs="?", default="-", help="ids or VCF file, stdin by default")
+    parser.add_argument("--vcf", action="store_true", help="the input is a VCF file")
+    parser.add_argument("-o", "--output", help="NDJSON output file, stdout by default")
+    parser.add_argument("--batch-size", type=int, default=10000, help="ids or records looked up at a time")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    # the scopes of the annotation endpoint
+    import config_web
+    annotator = OfflineAnnotator(
+        OfflineStore(args.store),
+        IDDispatcher(config_web.ANNOTATION_ID_REGEX_LIST, config_web.ANNOTATION_DEFAULT_SCOPES))
+    logging.info("Store %s: %d documents, %s, version %s", args.store, len(annotator.store),
+                 annotator.store.assembly, annotator.store.version)
+
+    start, count = time.perf_counter(), 0
+    output = open(args.output, "wb") if args.output else sys.stdout.buffer
+    with open_input(args.input) as lines:
+        for batch in batches(lines, args.batch_size):
+            if args.vcf:
+                output.writelines(annotator.annotate_vcf(batch))
+            else:
+                batch = [line.strip() for line in batch if line.strip()]
+                output.writelines(annotator.annotate(batch))
+            count += len(batch)
+    output.flush()
+    if args.output:
+        output.close()
+
+    elapsed = time.perf_counter() - start
+    logging.info("%d %s annotated in %.1fs, %d per minute", count, "lines" if args.vcf else "ids",
+                 elapsed, count / elapsed * 60 if elapsed else 0)
+
+
+if __name__ == "__main__":
+    main()
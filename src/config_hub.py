@@ -267,3 +267,21 @@ MAX_REF_ALT_LEN = 10000
 
 # max length for _id field
 MAX_ID_LENGTH = 512
+
+# folder of the rsid -> HGVS ids tables exported on publish, for the web nodes
+# (see utils.rsidtable), None to skip the export
+RSID_TABLE_FOLDER = None
+
+# folder of the bloom filters of the ids of each published index, for the web
+# nodes to answer lookups of absent ids (see utils.bloom), None to skip them
+ID_FILTER_FOLDER = None
+ID_FILTER_ERROR_RATE = 0.001  # false positive rate
+
+# folder of the gene symbol -> genomic regions tables collected while merging
+# builds, and exported on publish for the web nodes (see utils.genetable),
+# None to skip them
+GENE_TABLE_FOLDER = None
+
+# folder of the offline stores of the merged documents of each published build,
+# for annotation jobs without access to ES (see utils.offline), None to skip them
+OFFLINE_STORE_FOLDER = None
@@ -28,18 +28,109 @@ APP_LIST = [
         {"url": "/v1/variant/{0}:g.{1}"},
     ),
     *APP_LIST,  # default handlers
+    # replace the default query and annotation handlers, the last handler of a route is used
+    (r"/{pre}/{ver}/{tps}/query/?", "web.handlers.MVQueryHandler"),
+    (r"/{pre}/{ver}/{typ}(?:/([^/]+))?/?", "web.handlers.MVBiothingHandler"),
+    (r"/{pre}/{ver}/query/?", "web.handlers.MVQueryHandler"),
     (r"/{pre}/metadata/fields/?", "web.handlers.MVMetadataFieldHandler"),
     (r"/{pre}/metadata/?", "web.handlers.MVMetadataSourceHandler"),
     (r"/{pre}/{ver}/metadata/fields/?", "web.handlers.MVMetadataFieldHandler"),
     (r"/{pre}/{ver}/metadata/?", "web.handlers.MVMetadataSourceHandler"),
     (r"/beacon/query?", "web.beacon.handlers.BeaconHandler"),
     (r"/beacon/info", "web.beacon.handlers.BeaconInfoHandler"),
+    (r"/{ver}/region/?", "web.handlers.MVRegionQueryHandler"),
+    (r"/{ver}/vcf/?", "web.handlers.MVVCFAnnotationHandler"),
+    (r"/metrics/?", "web.handlers.MVMetricsHandler"),
 ]
 # *****************************************************************************
 # ES Query Pipeline
 # *****************************************************************************
 ES_QUERY_BUILDER = "web.pipeline.MVQueryBuilder"
 ES_QUERY_BACKEND = "web.pipeline.MVQueryBackend"
+ES_RESULT_TRANSFORM = "web.pipeline.MVResultFormatter"
+
+# features of the query pipeline which need indices built with them,
+# see web.pipeline.configure_pipeline, all off by default.
+
+# also filter interval queries on the "<assembly>.bin" field, only enable
+# when the indices have been built with genomic bins (see utils.binning).
+INTERVAL_BINS = False
+
+# route the searches of a single chromosome, and the _id lookups, to the
+# shard of the chromosome. The builder tags them with its routing value, only
+# enable when the indices were built with chrom_routing (see
+# hub.dataindex.indexer.BaseVariantIndexer), as routing a search to a single
+# shard of any other index misses documents.
+CHROM_ROUTING = False
+
+# folder of the rsid tables exported by the hub (see web.rsid), to answer
+# rsid lookups, single or batch, by fetching the documents of their _ids.
+# None to always search the "dbsnp.rsid" field.
+RSID_TABLES = None
+
+# folder of the bloom filters of the _ids of each assembly, built by the hub
+# (see hub.dataindex.indexer.MyVariantIndexerManager.export_id_filter), to
+# answer lookups of absent ids without ES. None to look every id up in ES.
+ID_FILTERS = None
+
+# folder of the gene tables exported by the hub (see utils.genetable). A query
+# of a gene symbol of the table, e.g. "BTK", or of a gene symbol in one of the
+# utils.genetable.GENE_FIELDS, e.g. "dbnsfp.genename:BTK", then only matches
+# these fields, within the regions of the gene. None to search it as before.
+GENE_TABLES = None
+
+# answer the _id lookups of a batch query, e.g. a POST of "chr..:g." ids, with
+# concurrent mget requests of up to BATCH_MGET_SIZE ids, at most
+# BATCH_MGET_CONCURRENCY in flight, instead of a single _msearch request.
+# Other searches of the batch, e.g. of rsids, still go to _msearch.
+BATCH_MGET = False
+BATCH_MGET_SIZE = 200
+BATCH_MGET_CONCURRENCY = 4
+
+# responses of searches, e.g. of dashboards polling the same query string, by
+# body, parameters and index, until the index build_version changes (see
+# web.cache.ResultCache): up to RESULT_CACHE_SIZE responses in each process,
+# for RESULT_CACHE_TTL seconds, and in RESULT_CACHE_STORE, if set, a store
+# shared by the web nodes, e.g. web.cache.RedisStore(redis.asyncio.from_url(...)).
+# 0 and None to disable.
+RESULT_CACHE_SIZE = 0
+RESULT_CACHE_TTL = 3600
+RESULT_CACHE_STORE = None
+
+# chain files of the assemblies the coordinates of interval queries and _id
+# lookups can be lifted from, with the "assembly_from" option, e.g.
+# {("hg19", "hg38"): "hg19ToHg38.over.chain.gz"}, see utils.liftover.
+# The option is only registered with chains, a pair without one is a 400.
+LIFTOVER_CHAINS = {}
+
+# batch region query, see web.handlers.MVRegionQueryHandler
+# up to this many regions, each returning up to this many hits, are
+# answered by a single search, more are sent as _msearch requests.
+REGION_QUERY_COMBINE_MAX = 10
+REGION_QUERY_COMBINE_MAX_SIZE = 100  # ES index.max_inner_result_window
+REGION_QUERY_CHUNK_SIZE = 100  # searches per _msearch request
+REGION_QUERY_CONCURRENCY = 4  # _msearch requests in flight per batch
+
+# VCF file annotation, see web.handlers.MVVCFAnnotationHandler
+VCF_UPLOAD_MAX_SIZE = 1024 ** 3  # bytes, as uploaded
+VCF_ANNOTATION_BATCH_SIZE = 1000  # records annotated, and sent back, at a time
+VCF_ANNOTATION_MGET_SIZE = 200  # ids per mget request
+VCF_ANNOTATION_CONCURRENCY = 4  # mget requests in flight per batch
+
+# *****************************************************************************
+# Beacon
+# *****************************************************************************
+# dataset responses cached per (allele, dataset), per web process.
+# entries are also dropped when the index build_version changes.
+BEACON_CACHE_SIZE = 10000
+BEACON_CACHE_TTL = 3600  # seconds
+
+# *****************************************************************************
+# Response cache
+# *****************************************************************************
+# serialized /metadata, /metadata/fields and /beacon/info responses,
+# per arguments, per web process, until the index build_version changes.
+RESPONSE_CACHE_SIZE = 256
 
 # *****************************************************************************
 # Analytics & Tracking
@@ -128,11 +219,39 @@ ASSEMBLY_TYPEDEF = {
     "assembly": {"type": str, "default": "hg19", "enum": ("hg19", "hg38")}
 }
 
+# positions given in another assembly than the one queried, see LIFTOVER_CHAINS,
+# no enum as an absent option fails it, web.pipeline.MVQueryBuilder.liftover
+# answers the assemblies without chains with a 400.
+LIFTOVER_TYPEDEF = {
+    "assembly": {**ASSEMBLY_TYPEDEF["assembly"], "alias": ["assembly_to"]},
+    "assembly_from": {"type": str},
+}
+
 ANNOTATION_KWARGS = copy.deepcopy(ANNOTATION_KWARGS)
-ANNOTATION_KWARGS["*"].update(ASSEMBLY_TYPEDEF)
+ANNOTATION_KWARGS["*"].update(LIFTOVER_TYPEDEF if LIFTOVER_CHAINS else ASSEMBLY_TYPEDEF)
 
 QUERY_KWARGS = copy.deepcopy(QUERY_KWARGS)
-QUERY_KWARGS["*"].update(ASSEMBLY_TYPEDEF)
+QUERY_KWARGS["*"].update(LIFTOVER_TYPEDEF if LIFTOVER_CHAINS else ASSEMBLY_TYPEDEF)
+# all the hits as newline-delimited JSON, see web.handlers.MVQueryHandler
+QUERY_KWARGS["GET"]["stream"] = {"type": bool, "default": False}
+
+REGION_KWARGS = {
+    "*": ASSEMBLY_TYPEDEF,
+    "POST": {
+        "regions": {"type": list, "required": True, "max": 1000},
+        "q": {"type": str},
+        "size": {"type": int, "default": 10, "max": 1000},
+        "fields": {"type": list, "alias": ["field", "filter"]},
+    },
+}
+
+VCF_KWARGS = {
+    "*": ASSEMBLY_TYPEDEF,
+    "POST": {
+        "out": {"type": str, "default": "json", "enum": ("json", "vcf")},
+        "fields": {"type": list, "alias": ["field", "filter"]},
+    },
+}
 
 METADATA_KWARGS = {"*": ASSEMBLY_TYPEDEF}
 FIELDS_KWARGS = {"*": ASSEMBLY_TYPEDEF}
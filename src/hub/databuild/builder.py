@@ -1,4 +1,5 @@
 import math
+import os
 import asyncio
 from functools import partial
 import datetime
@@ -10,6 +11,8 @@ from pymongo import UpdateOne
 from biothings.hub.databuild.builder import DataBuilder
 from biothings.hub.databuild.backend import TargetDocMongoBackend
 import config
+from utils.binning import bin_from_positions
+from utils.genetable import GeneRegions, GeneTable
 
 
 class MyVariantDataBuilder(DataBuilder):
@@ -51,6 +54,7 @@ class MyVariantDataBuilder(DataBuilder):
             }
         }
         root_keys = {}
+        gene_regions = {}  # assembly -> GeneRegions
         # grab ids only, so we can get more and fill queue for each step
         # each round, fill the queue to make sure every cpu slots are always working
         id_batch_size = batch_size * job_manager.process_queue._max_workers * 2
@@ -79,6 +83,8 @@ class MyVariantDataBuilder(DataBuilder):
                         for k in rk:
                             root_keys.setdefault(k, 0)
                             root_keys[k] += rk[k]
+                        for assembly, genes in fres["genes"].items():
+                            gene_regions.setdefault(assembly, GeneRegions()).update(genes)
                         self.logger.info("chrom batch #%d, done" % batch_num)
                     except Exception as e:
                         import traceback
@@ -102,9 +108,20 @@ class MyVariantDataBuilder(DataBuilder):
             self.logger.info("Root keys: %s" % root_keys)
             src_build = self.source_backend.build
             src_build.update({'_id': self.target_backend.target_name}, {"$set": {"_meta.stats": root_keys}})
+            self.save_gene_tables(gene_regions)
 
         return results
 
+    def save_gene_tables(self, gene_regions):
+        """
+        Save the gene regions collected while merging to "<GENE_TABLE_FOLDER>/<build name>_<assembly>.genes.json",
+        exported on publish (see hub.dataindex.indexer.MyVariantIndexerManager.export_gene_table).
+        """
+        for assembly, regions in gene_regions.items():
+            path = os.path.join(config.GENE_TABLE_FOLDER, "%s_%s.genes.json" % (self.target_backend.target_name, assembly))
+            GeneTable.from_regions(regions, version=self.target_backend.target_name).save(path)
+            self.logger.info("Regions of %d genes saved to '%s'" % (len(regions), path))
+
     def post_merge(self, source_names, batch_size, job_manager):
         self.validate_merge()
         # we're in a new thread (see biothings.databuild.builder, post_merge is called in defer_to_thread)
@@ -191,6 +208,16 @@ def inspect_chrom(doc: dict):
     return result
 
 
+def inspect_bin(doc: dict, assembly: str):
+    """
+    Return the genomic bin (see utils.binning) of the top-level "<assembly>" position of a merged doc, e.g.
+    {"hg19": {"start": 1337588, "end": 1337588}}, or a list of such positions when its sources disagree,
+    or None if the doc has no start and end position for that assembly.
+    Every doc the range filters of an interval query can match gets a bin, or is missed by binned queries.
+    """
+    return bin_from_positions(doc.get(assembly))
+
+
 def chrom_worker(col_name, ids):
     database: Database = get_target_db()
     collection: Collection = database[col_name]
@@ -201,18 +228,33 @@ def chrom_worker(col_name, ids):
     docs_with_missing_chrom = []
     target_root_keys = set(["_id", "vcf", "total", "hg19", "hg38", "observed"])
     found_root_keys = {}
+    # gene regions speed up gene queries, see utils.genetable
+    collect_genes = bool(getattr(config, "GENE_TABLE_FOLDER", None))
+    gene_regions = {"hg19": GeneRegions(), "hg38": GeneRegions()}
 
     for doc in cur:
         chrom_info = inspect_chrom(doc)
         chrom_value = chrom_info["chrom"]
         chrom_agreement = chrom_info["agreed"]
 
+        updates = {}
         if chrom_value is None:
             docs_with_missing_chrom.append(doc["_id"])
         else:
             if chrom_agreement is False:
                 docs_with_disagreed_chrom.append(doc["_id"])
-            bulk_operations.append(UpdateOne(filter={"_id": doc["_id"]}, update={"$set": {"chrom": chrom_value}}, upsert=False))
+            updates["chrom"] = chrom_value
+
+        # genomic bins speed up interval queries, see MVQueryBuilder.interval_filter
+        for assembly in ("hg19", "hg38"):
+            genomic_bin = inspect_bin(doc, assembly)
+            if genomic_bin is not None:
+                updates[assembly + ".bin"] = genomic_bin
+            if collect_genes:
+                gene_regions[assembly].add_doc(doc, chrom_value, assembly)
+
+        if updates:
+            bulk_operations.append(UpdateOne(filter={"_id": doc["_id"]}, update={"$set": updates}, upsert=False))
 
         # count root keys for later metadata
         for k in doc:
@@ -224,4 +266,5 @@ def chrom_worker(col_name, ids):
     if bulk_operations:
         collection.bulk_write(bulk_operations, ordered=False)
 
-    return {"missing": docs_with_missing_chrom, "disagreed": docs_with_disagreed_chrom, "root_keys": found_root_keys}
+    return {"missing": docs_with_missing_chrom, "disagreed": docs_with_disagreed_chrom, "root_keys": found_root_keys,
+            "genes": {assembly: regions.genes for assembly, regions in gene_regions.items() if regions}}
@@ -7,6 +7,16 @@ from utils.stats import update_stats
 
 class MyVariantBaseSyncer(syncer.BaseSyncer):
 
+    async def sync_cols(self, diff_folder, *args, **kwargs):
+        # The sync workers get the documents to update, and delete documents, by _id without routing. On an index
+        # built with chrom_routing (see hub.dataindex.indexer.BaseVariantIndexer), that is on the wrong shard,
+        # and the updates and deletes would be silently lost: such indices are rebuilt instead.
+        self.load_metadata(diff_folder)
+        if self._meta["build_config"].get("chrom_routing"):
+            raise syncer.SyncerException("Can't sync '%s', built with chrom_routing: incremental updates don't "
+                                         "pass the routing of the documents, rebuild the index instead." % diff_folder)
+        return await super().sync_cols(diff_folder, *args, **kwargs)
+
     def post_sync_cols(self, diff_folder, batch_size, mode, force, target_backend, steps):
         assert self.target_backend_type == "es", "Only support ElasticSearch backend (got: %s)" % self.target_backend_type
         assert not self._meta is None, "Metadata not loaded (use load_metadata(diff_folder))"
@@ -1,9 +1,16 @@
 import asyncio
+import lzma
+import os
 
 import config
 from biothings.hub.dataindex.indexer import Indexer, IndexManager, ColdHotIndexer
 from biothings.hub.dataexport.ids import export_ids, upload_ids
 from biothings.utils.hub_db import get_src_build
+from biothings.utils.mongo import get_src_db, get_target_db
+from utils.bloom import BloomFilter
+from utils.genetable import GeneTable
+from utils.offline import OfflineStoreWriter
+from utils.rsidtable import parse_rsid, write_rsid_table
 from utils.stats import ESMappingMetaStatsService, BuildDocMetaStatsService
 
 from elasticsearch import JSONSerializer, SerializationError, Elasticsearch
@@ -60,6 +67,19 @@ class MyVariantJSONSerializer(JSONSerializer):
 
 class BaseVariantIndexer(Indexer):
 
+    # Ingest pipeline setting the routing of a document to the chromosome in its _id,
+    # e.g. "X" for "chrX:g.1337588C>A", so that all the variants of a chromosome live on the same shard.
+    CHROM_ROUTING_PIPELINE = "myvariant_chrom_routing"
+    CHROM_ROUTING_SCRIPT = """
+        String id = ctx._id;
+        if (id != null && id.startsWith('chr')) {
+            int sep = id.indexOf(':');
+            if (sep > 3) {
+                ctx._routing = id.substring(3, sep);
+            }
+        }
+    """
+
     def __init__(self, build_doc, indexer_env, index_name):
         super().__init__(build_doc, indexer_env, index_name)
 
@@ -94,6 +114,33 @@ class BaseVariantIndexer(Indexer):
 
         self.assembly = build_doc["build_config"]["assembly"]
 
+        # Opt-in, with `"chrom_routing": true` in the build config.
+        # Query side, see the CHROM_ROUTING setting of config_web.
+        # Only full indexing goes through the ingest pipeline, such indices are not synced incrementally,
+        # see hub.databuild.syncer.MyVariantBaseSyncer.
+        self.chrom_routing = build_doc["build_config"].get("chrom_routing", False)
+        if self.chrom_routing:
+            self.es_index_settings["default_pipeline"] = self.CHROM_ROUTING_PIPELINE
+
+        # genomic bin of the variant position, set in post-merge (see hub.databuild.builder.chrom_worker)
+        assembly_mapping = self.es_index_mappings["properties"].setdefault(self.assembly, {})
+        assembly_mapping.setdefault("properties", {})["bin"] = {
+            "type": "integer"
+        }
+
+    async def pre_index(self, *args, **kwargs):
+        if self.chrom_routing:
+            # must exist before any document is sent to the index using it as default pipeline
+            with Elasticsearch(**self.es_client_args) as es_client:
+                es_client.ingest.put_pipeline(
+                    id=self.CHROM_ROUTING_PIPELINE,
+                    description="Route MyVariant documents to shards by chromosome",
+                    processors=[{"script": {"lang": "painless", "source": self.CHROM_ROUTING_SCRIPT}}]
+                )
+            self.logger.info(f"Ingest pipeline {self.CHROM_ROUTING_PIPELINE} set for index {self.es_index_name}")
+
+        return await super().pre_index(*args, **kwargs)
+
     async def post_index(self, *args, **kwargs):
         # No idea how come the decision to sleep for 3 minutes
         # Migrated from Sebastian's commit 1a7b7a. It was originally marked "Not Tested Yet".
@@ -147,6 +194,110 @@ class MyVariantIndexerManager(IndexManager):
                    aws_key=config.AWS_KEY,
                    aws_secret=config.AWS_SECRET)
 
+        if "demo" in index or "demo" in snapshot:
+            return
+        if getattr(config, "ID_FILTER_FOLDER", None):
+            self.export_id_filter(bdoc, ids_file)
+        if getattr(config, "RSID_TABLE_FOLDER", None):
+            self.export_rsid_table(bdoc)
+        if getattr(config, "GENE_TABLE_FOLDER", None):
+            self.export_gene_table(bdoc)
+        if getattr(config, "OFFLINE_STORE_FOLDER", None):
+            self.export_offline_store(bdoc)
+
+    def export_id_filter(self, build_doc, ids_file):
+        """
+        Build the bloom filter of the ids exported from a build, tagged with the build version,
+        to "<ID_FILTER_FOLDER>/ids_<assembly>.bloom" (see utils.bloom, and the ID_FILTERS setting of config_web).
+        """
+        assembly = build_doc["build_config"]["assembly"]
+        version = build_doc["_meta"]["build_version"]
+        error_rate = getattr(config, "ID_FILTER_ERROR_RATE", 0.001)
+
+        def ids():
+            # one id per line, see biothings.hub.dataexport.ids.export_ids
+            with lzma.open(ids_file, "rt") as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        yield line
+
+        capacity = sum(1 for _ in ids())
+        bloom = BloomFilter.create(capacity, error_rate, version=version)
+        bloom.update(ids())
+
+        path = os.path.join(config.ID_FILTER_FOLDER, "ids_%s.bloom" % assembly)
+        bloom.save(path)
+        self.logger.info("Bloom filter of %d ids saved to '%s', %d bytes, %d hashes, version %s" %
+                         (bloom.count, path, (bloom.bits + 7) // 8, bloom.hashes, version))
+        return path
+
+    def export_rsid_table(self, build_doc):
+        """
+        Write the rsid -> HGVS ids table of the dbSNP source of a build to
+        "<RSID_TABLE_FOLDER>/rsid_<assembly>.tbl", tagged with the build version
+        (see utils.rsidtable, and the RSID_TABLES setting of config_web).
+        """
+        assembly = build_doc["build_config"]["assembly"]
+        version = build_doc["_meta"]["build_version"]
+        collection = get_src_db()["dbsnp_%s" % assembly]
+
+        def pairs():
+            for doc in collection.find({"dbsnp.rsid": {"$exists": True}}, {"dbsnp.rsid": 1}):
+                # same as the "observed_skipidtoolong" mapper, those ids are not indexed
+                if len(doc["_id"]) > config.MAX_ID_LENGTH:
+                    continue
+                rsid = parse_rsid(str(doc["dbsnp"]["rsid"]))
+                if rsid is not None:
+                    yield rsid, doc["_id"]
+
+        path = os.path.join(config.RSID_TABLE_FOLDER, "rsid_%s.tbl" % assembly)
+        self.logger.info("Exporting rsid table of '%s' to '%s'" % (collection.name, path))
+        count = write_rsid_table(path, pairs(), version)
+        self.logger.info("%d rsids exported to '%s', version %s" % (count, path, version))
+        return path
+
+    def export_gene_table(self, build_doc):
+        """
+        Export the gene regions collected while merging a build (see
+        hub.databuild.builder.MyVariantDataBuilder.save_gene_tables) to
+        "<GENE_TABLE_FOLDER>/genes_<assembly>.json", tagged with the build version
+        (see utils.genetable, and the GENE_TABLES setting of config_web).
+        """
+        assembly = build_doc["build_config"]["assembly"]
+        version = build_doc["_meta"]["build_version"]
+        build_path = os.path.join(config.GENE_TABLE_FOLDER, "%s_%s.genes.json" % (build_doc["_id"], assembly))
+        if not os.path.exists(build_path):
+            self.logger.warning("No gene regions collected for build '%s', expected '%s'" % (build_doc["_id"], build_path))
+            return None
+
+        table = GeneTable.load(build_path)
+        table.version = version
+        path = os.path.join(config.GENE_TABLE_FOLDER, "genes_%s.json" % assembly)
+        table.save(path)
+        self.logger.info("Regions of %d genes exported to '%s', version %s" % (len(table), path, version))
+        return path
+
+    def export_offline_store(self, build_doc):
+        """
+        Write the merged documents of a build to "<OFFLINE_STORE_FOLDER>/myvariant_<assembly>.sqlite",
+        tagged with the build version, for offline annotation (see utils.offline, and bin/annotate.py).
+        """
+        assembly = build_doc["build_config"]["assembly"]
+        version = build_doc["_meta"]["build_version"]
+        collection = get_target_db()[build_doc["_id"]]
+
+        path = os.path.join(config.OFFLINE_STORE_FOLDER, "myvariant_%s.sqlite" % assembly)
+        self.logger.info("Exporting '%s' to offline store '%s'" % (collection.name, path))
+        with OfflineStoreWriter(path, version=version, assembly=assembly) as store:
+            for doc in collection.find():
+                # same as the "observed_skipidtoolong" mapper, those ids are not indexed
+                if len(doc["_id"]) > config.MAX_ID_LENGTH:
+                    continue
+                store.add(doc)
+        self.logger.info("%d documents exported to '%s', version %s" % (store.count, path, version))
+        return path
+
 
 class VariantIndexer(BaseVariantIndexer):
     pass
@@ -1,3 +1,4 @@
+import glob
 import os
 import os.path
 import subprocess
@@ -11,6 +12,7 @@ biothings.config_for_app(config)
 from config import DATA_ARCHIVE_ROOT
 from biothings.hub.dataload.dumper import LastModifiedHTTPDumper
 from biothings.utils.common import unzipall
+from utils.genome import from_pickle
 
 
 class SnpeffDumper(LastModifiedHTTPDumper):
@@ -31,6 +33,12 @@ class SnpeffDumper(LastModifiedHTTPDumper):
     def post_dump(self, *args, **kwargs):
         self.logger.info("Uncompressing files in '%s'" % self.new_data_folder) 
         unzipall(self.new_data_folder)
+        # pickled bitarrays -> memory-mapped genome files, read by VCFConstruct
+        for pyobj in glob.glob(os.path.join(self.new_data_folder, "*_genome.pyobj")):
+            genome = re.sub(r"\.pyobj$", ".mvgenome", pyobj)
+            self.logger.info("Converting '%s' to '%s'" % (pyobj, genome))
+            from_pickle(pyobj, genome)
+            os.remove(pyobj)
         prev = os.path.abspath(os.curdir)
         try:
             os.chdir(os.path.join(self.new_data_folder,"snpEff"))
@@ -4,10 +4,9 @@ import re
 import subprocess
 
 from biothings import config
-from biothings.utils.common import loadobj
 from biothings.utils.dataload import unlist, dict_sweep
-from utils.hgvs import prune_redundant_seq
-from utils.validate import bit_to_nuc
+from utils.genome import GenomeStore
+from utils.hgvs import parse_hgvs_id, prune_redundant_seq
 
 logging = config.logger
 
@@ -15,6 +14,7 @@ logging = config.logger
 class VCFConstruct(object):
 
     def __init__(self, genome, logger=logging):
+        # a genome file of utils.genome, memory-mapped, shared by the processes
         self.genome = genome
         self._chr_data = None
         self.logger = logger
@@ -22,79 +22,34 @@ class VCFConstruct(object):
     def load_chr_data(self):
         self.logger.info("\tLoading chromosome data from '%s'..." % self.genome)
         try:
-            self._chr_data = loadobj(self.genome)
+            self._chr_data = GenomeStore.open(self.genome)
         except Exception as e:
             self.logger.info(e)
             raise
         self.logger.info("Done.")
 
-    def snp_hgvs_id_parser(self, id):
-        '''get chr, pos, ref, alt from hgvs_id'''
-        pat = 'chr(\w+):g\.(\d+)(\w)\>(\w)'
-        mat = re.match(pat, id)
-        if mat:
-            r = mat.groups()
-            return r
-
-    def del_hgvs_id_parser_interval(self, id):
-        pat = 'chr(\w+):g\.(\d+)\_(\d+)del'
-        mat = re.match(pat, id)
-        if mat:
-            r = mat.groups()
-            return r
-
-    def del_hgvs_id_parser(self, id):
-        pat = 'chr(\w+):g\.(\d+)del'
-        mat = re.match(pat, id)
-        if mat:
-            r = mat.groups()
-            return r
-
-    def ins_hgvs_id_parser(self, id):
-        pat = 'chr(\w+):g\.(\d+)\_(\d+)ins(\w+)'
-        mat = re.match(pat, id)
-        if mat:
-            r = mat.groups()
-            return r
-
-    def delins_hgvs_id_parser(self, id):
-        pat = 'chr(\w+):g\.(\d+)\_(\d+)delins(\w+)'
-        mat = re.match(pat, id)
-        if mat:
-            r = mat.groups()
-            return r
-
     def snp_vcf_constructor(self, hgvs):
-        '''construct a VCF file based on chr, pos, ref, alt information'''
-        chrom = hgvs[0]
+        '''construct a VCF file based on chr, pos, ref, alt information of an HGVSRecord'''
+        chrom = hgvs.chrom
         if chrom == 'MT':
             chrom = 'M'
-        pos = hgvs[1]
-        ref = hgvs[2]
-        alt = hgvs[3]
+        pos = hgvs.start
+        ref = hgvs.ref
+        alt = hgvs.alt
         vcf = {"chrom": str(chrom), "position": str(pos), "ref": ref, "alt": alt}
         return vcf
 
     def del_vcf_constructor(self, hgvs):
         if self._chr_data is None:
             self.load_chr_data()
-        chrom = hgvs[0]
-        pos = int(hgvs[1]) - 1
-        # len=2 was a single del, len=3 was internval del
-        if len(hgvs) == 2:
-            end = int(hgvs[1])
-        else:
-            end = int(hgvs[2])
-        chr_bit = self._chr_data[str(chrom)]
-        ref = ''
-        for i in range(pos, end+1):
-            try:
-                nuc_chr_bit = chr_bit[i*4-4:i*4]
-                nuc_chr = bit_to_nuc(nuc_chr_bit)
-                ref += nuc_chr
-            except Exception as e:
-                self.logger.warning("Couldn't extract nucleotide from bits with HGVS %s: %s" % (repr(hgvs),e))
-                return None
+        chrom = hgvs.chrom
+        pos = hgvs.start - 1
+        end = hgvs.end
+        try:
+            ref = self._chr_data.seq(str(chrom), pos, end)
+        except Exception as e:
+            self.logger.warning("Couldn't extract nucleotide from bits with HGVS %s: %s" % (repr(hgvs),e))
+            return None
         alt = ref[0]
         if chrom == 'MT':
             chrom = 'M'
@@ -104,17 +59,14 @@ class VCFConstruct(object):
     def ins_vcf_constructor(self, hgvs):
         if self._chr_data is None:
             self.load_chr_data()
-        chrom = hgvs[0]
-        pos = int(hgvs[1])
-        chr_bit = self._chr_data[str(chrom)]
-        nuc_chr_bit = chr_bit[pos*4-4:pos*4]
+        chrom = hgvs.chrom
+        pos = hgvs.start
         try:
-            ref = bit_to_nuc(nuc_chr_bit)
+            ref = self._chr_data.seq(str(chrom), pos, pos)
         except Exception as e:
             self.logger.warning("Couldn't extract nucleotide from bits with HGVS %s: %s" % (repr(hgvs),e))
             return None
-        alt = hgvs[3]
-        alt = ref + alt
+        alt = ref + hgvs.alt
         if chrom == 'MT':
             chrom = 'M'
         vcf = {"chrom": str(chrom), "position": str(pos), "ref": ref, "alt": alt}
@@ -123,20 +75,15 @@ class VCFConstruct(object):
     def delins_vcf_constructor(self, hgvs):
         if self._chr_data is None:
             self.load_chr_data()
-        chrom = hgvs[0]
-        pos = int(hgvs[1])
-        end = int(hgvs[2])
-        chr_bit = self._chr_data[str(chrom)]
-        ref = ''
-        for i in range(pos, end+1):
-            try:
-                nuc_chr_bit = chr_bit[i*4-4:i*4]
-                nuc_chr = bit_to_nuc(nuc_chr_bit)
-                ref += nuc_chr
-            except Exception as e:
-                self.logger.warning("Couldn't extract nucleotide from bits with HGVS %s: %s" % (repr(hgvs),e))
-                return None
-        alt = hgvs[3]
+        chrom = hgvs.chrom
+        pos = hgvs.start
+        end = hgvs.end
+        try:
+            ref = self._chr_data.seq(str(chrom), pos, end)
+        except Exception as e:
+            self.logger.warning("Couldn't extract nucleotide from bits with HGVS %s: %s" % (repr(hgvs),e))
+            return None
+        alt = hgvs.alt
         if chrom == 'MT':
             chrom = 'M'
         vcf = {"chrom": str(chrom), "position": str(pos), "ref": ref, "alt": alt}
@@ -145,56 +92,23 @@ class VCFConstruct(object):
     def build_vcfs(self, hgvs_ids):
         '''load data'''
         # extract each hgvs_id from list, transform into vcf format
+        constructors = {
+            'snp': self.snp_vcf_constructor,
+            'del': self.del_vcf_constructor,
+            'ins': self.ins_vcf_constructor,
+            'delins': self.delins_vcf_constructor,
+        }
         hgvs_vcfs = {}
         for hgvs_id in hgvs_ids:
-            if '>' in hgvs_id:
-                hgvs_info = self.snp_hgvs_id_parser(hgvs_id)
-                if not hgvs_info:
-                    continue
-                vcf = self.snp_vcf_constructor(hgvs_info)
-                if not vcf:
-                    continue
-                hgvs_vcfs[hgvs_id] = {"_id" : hgvs_id, "vcf" : vcf}
-
-            elif hgvs_id.endswith('del') and '_' in hgvs_id:
-                hgvs_info = self.del_hgvs_id_parser_interval(hgvs_id)
-                if not hgvs_info:
-                    continue
-                vcf = self.del_vcf_constructor(hgvs_info)
-                if not vcf:
-                    continue
-                hgvs_vcfs[hgvs_id] = {"_id" : hgvs_id, "vcf" : vcf}
-
-            elif hgvs_id.endswith('del') and '_' not in hgvs_id:
-                hgvs_info = self.del_hgvs_id_parser(hgvs_id)
-                if not hgvs_info:
-                    continue
-                vcf = self.del_vcf_constructor(hgvs_info)
-                if not vcf:
-                    continue
-                hgvs_vcfs[hgvs_id] = {"_id" : hgvs_id, "vcf" : vcf}
-
-            elif 'ins' in hgvs_id and 'del' not in hgvs_id:
-                hgvs_info = self.ins_hgvs_id_parser(hgvs_id)
-                if not hgvs_info:
-                    continue
-                vcf = self.ins_vcf_constructor(hgvs_info)
-                if not vcf:
-                    continue
-                hgvs_vcfs[hgvs_id] = {"_id" : hgvs_id, "vcf" : vcf}
-
-            elif 'delins' in hgvs_id:
-                hgvs_info = self.delins_hgvs_id_parser(hgvs_id)
-                if not hgvs_info:
-                    continue
-                vcf = self.delins_vcf_constructor(hgvs_info)
-                if not vcf:
-                    continue
-                hgvs_vcfs[hgvs_id] = {"_id" : hgvs_id, "vcf" : vcf}
-
-            else:
+            hgvs_info = parse_hgvs_id(hgvs_id)
+            constructor = constructors.get(hgvs_info.type) if hgvs_info else None
+            if constructor is None:
                 self.logger.info('%s: beyond current capacity, skip it' % hgvs_id)
                 continue
+            vcf = constructor(hgvs_info)
+            if not vcf:
+                continue
+            hgvs_vcfs[hgvs_id] = {"_id" : hgvs_id, "vcf" : vcf}
 
         return hgvs_vcfs
 
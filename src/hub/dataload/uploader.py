@@ -1,6 +1,7 @@
 import glob
 import os
 import math
+import re
 
 import biothings.hub.dataload.uploader as uploader
 from biothings.hub.dataload.storage import UpsertStorage
@@ -11,6 +12,7 @@ from biothings.utils.common import iter_n
 import hub.dataload.sources.snpeff.snpeff_upload as snpeff_upload
 import hub.dataload.sources.snpeff.snpeff_parser as snpeff_parser
 from hub.dataload.storage import MyVariantBasicStorage
+from utils.genome import from_pickle
 from utils.hgvs import get_pos_start_end
 from config import MAX_REF_ALT_LEN
 
@@ -38,8 +40,16 @@ class SnpeffPostUpdateUploader(uploader.BaseSourceUploader):
         snpeff_dir = snpeff_doc["download"]["data_folder"]
         # -q: when there's an update, there's a message on stderr....
         cmd = "java -Xmx4g -jar %s/snpEff/snpEff.jar -noStats -noExpandIUB %s" % (snpeff_dir, version)
-        # genome files are in "data_folder"/../data
-        genomes = glob.glob(os.path.join(snpeff_dir, "%s_genome.*" % version))
+        # genome files are in "data_folder"/../data, see utils.genome
+        genomes = glob.glob(os.path.join(snpeff_dir, "%s_genome.mvgenome" % version))
+        if not genomes:
+            # dumped before the genome files were converted by the dumper
+            pyobjs = glob.glob(os.path.join(snpeff_dir, "%s_genome.pyobj" % version))
+            assert len(pyobjs) == 1, "Expected only one genome files for '%s', got: %s" % (version, pyobjs)
+            genome = re.sub(r"\.pyobj$", ".mvgenome", pyobjs[0])
+            self.logger.info("Converting '%s' to '%s'" % (pyobjs[0], genome))
+            from_pickle(pyobjs[0], genome)
+            genomes = [genome]
         assert len(genomes) == 1, "Expected only one genome files for '%s', got: %s" % (version, genomes)
         genome = genomes[0]
         annotator = snpeff_parser.SnpeffAnnotator(cmd, logger=self.logger)
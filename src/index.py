@@ -1,14 +1,20 @@
-from tornado.web import StaticFileHandler, RedirectHandler
+from tornado.web import RedirectHandler
 
 from biothings.web.launcher import main
 
+from web.compression import CompressionTransform, PrecompressedStaticFileHandler
+from web.timing import ServerTimingTransform
+
 
 if __name__ == "__main__":
     main([
         # override default frontpage
         (r"/", RedirectHandler, {"url": "/standalone", "permanent": False}),
-        (r"/demo/?()", StaticFileHandler,
+        (r"/demo/?()", PrecompressedStaticFileHandler,
          {"path": "docs/demo", "default_filename": "index.html"}),
-        (r"/standalone/?()", StaticFileHandler,
+        (r"/standalone/?()", PrecompressedStaticFileHandler,
          {"path": "docs/standalone", "default_filename": "index.html"}),
-    ])
+    ], {
+        # replaces the default transforms, with zstd and brotli compression
+        "transforms": [CompressionTransform, ServerTimingTransform],
+    })
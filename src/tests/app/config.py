@@ -50,3 +50,9 @@ ES_INDICES = {
 ES_ARGS = {
     'request_timeout': 120,
 }
+
+# answered by mget requests in test_batch_mget
+BATCH_MGET = True
+
+# a scroll page per hit, streamed in test_stream_pages
+ES_SCROLL_SIZE = 1
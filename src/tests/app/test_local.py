@@ -1,3 +1,5 @@
+import gzip
+import json
 from time import sleep
 from urllib.parse import urljoin
 
@@ -23,6 +25,15 @@ class TestMetadataAssemblyAware(BiothingsWebAppTest):
         assert res_default.json() == res_hg19.json()
         assert res_hg19.json() != res_hg38.json()  # I am not certain this will hold true
 
+    def test_metadata_etag(self):
+        for metadata_url in ('metadata', 'metadata/fields'):
+            res = self.request(metadata_url, params={'assembly': 'hg38'})
+            etag = res.headers['ETag']
+            self.request(metadata_url, params={'assembly': 'hg38'},
+                         headers={'If-None-Match': etag}, expect=304)
+            res_hg19 = self.request(metadata_url, params={'assembly': 'hg19'})
+            assert res_hg19.headers['ETag'] != etag
+
 
 class TestAnnotationFields(BiothingsWebAppTest):
     TEST_DATA_DIR_NAME = 'mv_app_test'
@@ -153,6 +164,35 @@ class TestBeaconEndpoints(BiothingsWebAppTest):
         r = self.request('/beacon/query', method='post')
         assert r
 
+    def test_datasets(self):
+        r = self.request('/beacon/query', method='get', params={
+            'referenceName': '8', 'start': '7194707',
+            'referenceBases': 'G', 'alternateBases': 'A',
+            'assemblyId': 'GRCh37', 'datasetIds': ['dbsnp', 'dbnsfp', 'clinvar'],
+            'includeDatasetResponses': 'true'
+        }).json()
+        assert r['exists']
+        responses = r['alleleDatasetRespone']
+        assert [res['datasetId'] for res in responses] == ['dbsnp', 'dbnsfp', 'clinvar']
+        assert [res['exists'] for res in responses] == [True, True, False]
+
+    def test_allele_cache(self):
+        params = {
+            'referenceName': '8', 'start': '7194707',
+            'referenceBases': 'G', 'alternateBases': 'A',
+            'assemblyId': 'GRCh37', 'datasetIds': 'dbsnp'
+        }
+        first = self.request('/beacon/query', params=params).json()
+        second = self.request('/beacon/query', params=params).json()
+        assert first == second
+        stats = self.request('/metrics').json()['beacon.allele_cache']
+        assert stats['hits'] >= 1
+
+    def test_info(self):
+        res = self.request('/beacon/info')
+        assert res.json()['datasets']
+        self.request('/beacon/info', headers={'If-None-Match': res.headers['ETag']}, expect=304)
+
 
 class TestGenomicIntervalQuery(BiothingsWebAppTest):
     TEST_DATA_DIR_NAME = 'mv_app_test'
@@ -202,6 +242,82 @@ class TestGenomicIntervalQuery(BiothingsWebAppTest):
             'cadd.chrom:9 OR cadd.chrom:8'
         })
 
+    def test_stream(self):
+        res = self.request('query', params={'q': 'chr8:7194706-7194708', 'stream': 'true'})
+        assert res.headers['Content-Type'].startswith('application/x-ndjson')
+        hits = [json.loads(line) for line in res.text.splitlines()]
+        assert [hit['_id'] for hit in hits] == ['chr8:g.7194707G>A']
+
+    def test_stream_pages(self):
+        res = self.request('query', params={'q': '__all__', 'stream': 'true'})
+        hits = [json.loads(line) for line in res.text.splitlines()]
+        assert sorted(hit['_id'] for hit in hits) == ['chr11:g.76912557del', 'chr8:g.7194707G>A']
+
+    def test_stream_invalid(self):
+        self.request('query', params={'q': 'cadd.chrom:(', 'stream': 'true'}, expect=400)
+
+
+class TestRegionQuery(BiothingsWebAppTest):
+    TEST_DATA_DIR_NAME = 'mv_app_test'
+
+    def test_regions(self):
+        res = self.request('region', method='POST', json={
+            'regions': ['chr8:7194706-7194708', 'chr8:1-100', 'chr8:7,194,707']
+        }).json()
+        assert [r['query'] for r in res] == ['chr8:7194706-7194708', 'chr8:1-100', 'chr8:7,194,707']
+        assert [r['total'] for r in res] == [1, 0, 1]
+        assert res[0]['hits'][0]['_id'] == 'chr8:g.7194707G>A'
+
+    def test_regions_msearch(self):
+        # more regions than REGION_QUERY_COMBINE_MAX
+        regions = [f'chr8:{pos}' for pos in range(7194700, 7194720)]
+        res = self.request('region', method='POST', json={'regions': regions}).json()
+        assert [r['total'] for r in res] == [int(pos == 'chr8:7194707') for pos in regions]
+
+    def test_regions_query(self):
+        res = self.request('region', method='POST', json={
+            'regions': ['chr8:7194706-7194708'], 'q': 'cadd.chrom:9'
+        }).json()
+        assert res[0]['total'] == 0
+
+    def test_regions_hg38(self):
+        res = self.request('region', method='POST', json={
+            'regions': ['chrX:30718532'], 'assembly': 'hg38'
+        }).json()
+        assert res[0]['hits'][0]['_id'] == 'chrX:g.30718532C>T'
+
+    def test_invalid_region(self):
+        self.request('region', method='POST', json={'regions': ['chr8']}, expect=400)
+
+
+class TestVCFAnnotation(BiothingsWebAppTest):
+    TEST_DATA_DIR_NAME = 'mv_app_test'
+
+    VCF = (
+        "##fileformat=VCFv4.2\n"
+        "#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n"
+        "8\t7194707\t.\tG\tA,<DEL>\t.\tPASS\tDP=10\n"
+        "chr8\t1\trs0\tA\tC\t.\tPASS\t.\n"
+    )
+
+    def test_ndjson(self):
+        res = self.request('vcf', method='POST', data=self.VCF)
+        assert res.headers['Content-Type'].startswith('application/x-ndjson')
+        records = [json.loads(line) for line in res.text.splitlines()]
+        assert [record['pos'] for record in records] == [7194707, 1]
+        assert records[0]['hits'][0]['_id'] == 'chr8:g.7194707G>A'
+        assert records[0]['hits'][1]['notfound']
+        assert records[1]['hits'][0] == {'query': 'chr8:g.1A>C', 'notfound': True}
+
+    def test_vcf_gzip(self):
+        res = self.request('vcf', method='POST', params={'out': 'vcf', 'fields': 'cadd.chrom'},
+                           data=gzip.compress(self.VCF.encode()))
+        lines = res.text.splitlines()
+        assert lines[1].startswith('##INFO=<ID=MYVARIANT')
+        assert lines[3].split('\t')[7].startswith('DP=10;MYVARIANT=%7B')
+        assert lines[3].endswith(',.')
+        assert lines[4].split('\t')[7] == 'MYVARIANT=.'
+
 
 class TestIssue133(BiothingsWebAppTest):
     TEST_DATA_DIR_NAME = 'issue_133'
@@ -223,3 +339,17 @@ class TestIssue133(BiothingsWebAppTest):
         for variant in variants:
             # we don't really care about the results
             assert self.value_in_result(variant, res, 'query')
+
+    def test_batch_mget(self):
+        variants = ['chr8:g.7194707G>A', 'rs1047781', 'chr8:g.7194707G>C', 'chr19:g.49206631A>C']
+        ids = ','.join([f'"{variant}"' for variant in variants])
+        res = self.request('variant', method='POST', data={'ids': ids}).json()
+        queries = [hit['query'] for hit in res]
+        # _id lookups by mget, the rsid searched, in the order of the ids
+        assert queries[0] == 'chr8:g.7194707G>A' and res[0]['_id'] == 'chr8:g.7194707G>A'
+        assert queries[-2:] == ['chr8:g.7194707G>C', 'chr19:g.49206631A>C']
+        assert res[-2].get('notfound') and res[-1]['_id'] == 'chr19:g.49206631A>C'
+        assert set(queries[1:-2]) == {'rs1047781'}
+        stats = self.request('/metrics').json()
+        assert stats['mget.chunk_size']['count'] >= 1
+        assert stats['mget.parallelism']['count'] >= 1
@@ -0,0 +1,95 @@
+"""
+    Bytes saved versus CPU spent compressing annotation responses, for each
+    content encoding available (see utils.compression) and level.
+
+    Payloads are batch annotation responses, JSON lists of full documents.
+    By default they are made of the documents of the local test app data,
+    with --url they are fetched from a running API instead, e.g.:
+
+        python tests/benchmark/bench_compression.py --url http://localhost:8000/v1/variant --ids ids.txt
+
+    zstd and brotli are only measured when zstandard and brotli are installed.
+"""
+import argparse
+import json
+import os
+import time
+from urllib.request import Request, urlopen
+
+import benchutils
+
+from utils.compression import ENCODINGS, compress
+
+LEVELS = {"gzip": (1, 6, 9), "br": (1, 4, 6, 11), "zstd": (1, 3, 9, 19)}
+TEST_DATA = os.path.join(os.path.dirname(__file__), os.pardir, "app", "test_data", "issue_133", "mvtest_hg19.ndjson")
+
+
+def test_data_payload(size):
+    """An annotation response of `size` documents of the test data, cycled."""
+    with open(TEST_DATA) as f:
+        docs = [json.loads(line) for line in f if not line.startswith('{"index"')]
+    hits = []
+    for i in range(size):
+        doc = dict(docs[i % len(docs)])
+        hits.append({"query": f"{doc['_id']}#{i}" if "_id" in doc else str(i), **doc})
+    return json.dumps(hits).encode()
+
+
+def api_payload(url, ids, fields):
+    body = json.dumps({"ids": ids, "fields": fields}).encode()
+    request = Request(url, data=body, headers={"Content-Type": "application/json", "Accept-Encoding": "identity"})
+    with urlopen(request) as response:
+        return response.read()
+
+
+def cpu_time(func, *args, repeat):
+    """Best process time of `repeat` calls, and the last result."""
+    best, result = None, None
+    for _ in range(repeat):
+        t0 = time.process_time()
+        result = func(*args)
+        elapsed = time.process_time() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def measure(payload, repeat):
+    results = {}
+    for encoding in ENCODINGS:
+        for level in LEVELS[encoding]:
+            elapsed, compressed = cpu_time(compress, payload, encoding, level, repeat=repeat)
+            results[f"{encoding}-{level}"] = {
+                "bytes": len(compressed),
+                "saved_pct": round(100 * (1 - len(compressed) / len(payload)), 2),
+                "cpu_ms": round(elapsed * 1000, 3),
+                "mb_per_cpu_s": round(len(payload) / 1e6 / elapsed, 1) if elapsed else None,
+            }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000], help="documents per payload")
+    parser.add_argument("--url", help="annotation endpoint to fetch the payloads from")
+    parser.add_argument("--ids", help="file of the ids to annotate, one per line, with --url")
+    parser.add_argument("--fields", default="all", help="fields to annotate with, with --url")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="also write the JSON results to this file")
+    args = parser.parse_args()
+
+    if args.url:
+        with open(args.ids) as f:
+            ids = [line.strip() for line in f if line.strip()]
+
+    results = {"encodings": list(ENCODINGS), "payloads": {}}
+    for size in args.sizes:
+        if args.url:
+            payload = api_payload(args.url, ids[:size], args.fields)
+        else:
+            payload = test_data_payload(size)
+        results["payloads"][str(size)] = {"bytes": len(payload), **measure(payload, args.repeat)}
+    benchutils.report(results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+    Gene symbol query latency, current path vs gene table rewrite.
+
+    Builds the gene table of an index of the local test app, as the hub does
+    while merging (see utils.genetable), then times the queries of its genes:
+
+        query_string   the current path, q=<symbol> as a query string query
+        gene           the match of the symbol in the GENE_FIELDS
+        gene_regions   the same, restricted to the regions of the gene,
+                       as MVQueryBuilder.gene_search builds it
+
+    and checks the last two find the same variants.
+
+        python tests/benchmark/bench_gene_query.py --es http://localhost:9200 --index myvariant_current_hg19
+"""
+import argparse
+import random
+import time
+
+import benchutils
+from elasticsearch import Elasticsearch, helpers
+
+from utils.genetable import GENE_FIELDS, GeneRegions, GeneTable
+from web.pipeline import MVQueryBuilder
+
+MODES = ("query_string", "gene", "gene_regions")
+
+
+def gene_table(client, index, assembly):
+    regions = GeneRegions()
+    source = ["chrom", assembly, *GENE_FIELDS]
+    for hit in helpers.scan(client, index=index, query={"query": {"match_all": {}}}, _source=source):
+        regions.add_doc(hit["_source"], hit["_source"].get("chrom"), assembly)
+    return GeneTable.from_regions(regions)
+
+
+def queries(symbol, regions, assembly):
+    search = MVQueryBuilder.gene_search(symbol, GENE_FIELDS, regions, assembly)
+    return {
+        "query_string": {"query_string": {"query": symbol}},
+        "gene": search.to_dict()["query"],
+        "gene_regions": search.in_regions().to_dict()["query"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--es", default="http://localhost:9200")
+    parser.add_argument("--index", default="myvariant_current_hg19")
+    parser.add_argument("--assembly", default="hg19", choices=("hg19", "hg38"))
+    parser.add_argument("--genes", type=int, default=100, help="genes queried, at most")
+    parser.add_argument("--repeat", type=int, default=5, help="queries per gene and mode")
+    parser.add_argument("--output", help="also write the JSON results to this file")
+    args = parser.parse_args()
+
+    client = Elasticsearch(args.es, request_timeout=120)
+    load_time, table = benchutils.timeit(gene_table, client, args.index, args.assembly)
+    symbols = sorted(table.genes)
+    symbols = random.Random(0).sample(symbols, min(args.genes, len(symbols)))
+
+    latencies = {mode: [] for mode in MODES}
+    mismatches = []
+    for symbol in symbols:
+        for _ in range(args.repeat):
+            totals = {}
+            for mode, query in queries(symbol, table.lookup(symbol), args.assembly).items():
+                t0 = time.perf_counter()
+                # request_cache off, we want to measure the query itself
+                res = client.search(index=args.index, query=query, size=10,
+                                    track_total_hits=True, request_cache=False)
+                latencies[mode].append(time.perf_counter() - t0)
+                totals[mode] = res["hits"]["total"]["value"]
+        if totals["gene"] != totals["gene_regions"]:
+            mismatches.append(symbol)
+
+    benchutils.report({
+        "index": args.index,
+        "docs": client.count(index=args.index)["count"],
+        "genes": len(table),
+        "table_s": round(load_time, 3),
+        "queried": len(symbols),
+        "mismatches": mismatches,
+        "modes": {mode: benchutils.summarize(values) for mode, values in latencies.items()},
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+    Reference bases of indels, as VCFConstruct reads them: base by base, with
+    Chromosome.base(), as before, vs. in one call of Chromosome.seq(), decoding
+    whole bytes through lookup tables. With bitarray installed, also the
+    original bitarray slicing and validate.bit_to_nuc per base.
+
+    Indel lengths follow a power law, about half of them of 1 base, a few
+    of hundreds, as in dbSNP and gnomAD:
+
+        python tests/benchmark/bench_genome_ranges.py --indels 200000
+"""
+import argparse
+import os
+import random
+import tempfile
+
+import benchutils
+
+from utils.genome import GenomeStore, write_genome
+
+try:
+    from bitarray import bitarray
+except ImportError:
+    bitarray = None
+
+
+def indel_lengths(n, rnd, max_length=1000, alpha=2.0):
+    weights = [length ** -alpha for length in range(1, max_length + 1)]
+    return rnd.choices(range(1, max_length + 1), weights, k=n)
+
+
+def base_by_base(chrom, ranges):
+    out = []
+    for start, end in ranges:
+        ref = ''
+        for i in range(start, end + 1):
+            ref += chrom.base(i)
+        out.append(ref)
+    return out
+
+
+def one_call(chrom, ranges):
+    return [chrom.seq(start, end) for start, end in ranges]
+
+
+def bitarray_base_by_base(chr_bit, ranges):
+    from utils.validate import bit_to_nuc
+    out = []
+    for start, end in ranges:
+        ref = ''
+        for i in range(start, end + 1):
+            ref += bit_to_nuc(chr_bit[i * 4 - 4:i * 4])
+        out.append(ref)
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--indels", type=int, default=200000)
+    parser.add_argument("--length", type=int, default=10 ** 7, help="length of the synthetic chromosome")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="also write the JSON results to this file")
+    args = parser.parse_args()
+
+    rnd = random.Random(args.seed)
+    seq = "".join(rnd.choices("ACGT", k=args.length))
+    ranges = []
+    for length in indel_lengths(args.indels, rnd):
+        start = rnd.randint(1, args.length - length + 1)
+        ranges.append((start, start + length - 1))
+
+    results = {"indels": args.indels, "bases": sum(end - start + 1 for start, end in ranges)}
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "genome.mvgenome")
+        write_genome(path, [("1", [seq[i:i + (1 << 20)] for i in range(0, len(seq), 1 << 20)])])
+        genome = GenomeStore.open(path)
+        chrom = genome["1"]
+        looped_s, looped = benchutils.timeit(base_by_base, chrom, ranges)
+        seq_s, decoded = benchutils.timeit(one_call, chrom, ranges)
+        if looped != decoded or decoded[0] != seq[ranges[0][0] - 1:ranges[0][1]]:
+            raise AssertionError("Chromosome.seq() differs from the bases read one by one.")
+        results["base"] = {"s": round(looped_s, 3), "indels_per_s": round(args.indels / looped_s)}
+        results["seq"] = {"s": round(seq_s, 3), "indels_per_s": round(args.indels / seq_s)}
+        results["speedup"] = round(looped_s / seq_s, 2)
+        genome.close()
+
+    if bitarray is not None:
+        from utils.validate import nuc_to_bit
+        bits_s, _ = benchutils.timeit(bitarray_base_by_base, nuc_to_bit(seq), ranges)
+        results["bitarray"] = {"s": round(bits_s, 3), "indels_per_s": round(args.indels / bits_s)}
+        results["speedup_bitarray"] = round(bits_s / seq_s, 2)
+    benchutils.report(results, args.output)
+
+
+if __name__ == "__main__":
+    main()
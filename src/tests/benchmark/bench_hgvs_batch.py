@@ -0,0 +1,101 @@
+"""
+    VCF to HGVS id conversion, row by row with utils.hgvs.get_hgvs_from_vcf
+    vs. by columns with utils.hgvs.get_hgvs_from_vcf_batch, checking that
+    both give the same ids and var types.
+
+    The synthetic records are mostly SNVs, with short deletions, insertions,
+    delins and MNVs, in about the proportions of dbSNP:
+
+        python tests/benchmark/bench_hgvs_batch.py --records 10000000 --chunk 1000000
+"""
+import argparse
+import random
+
+import benchutils
+
+from utils.hgvs import get_hgvs_from_vcf, get_hgvs_from_vcf_batch
+
+CHROMS = [str(i) for i in range(1, 23)] + ["X", "Y", "MT"]
+
+
+def synthetic_records(n, seed=0):
+    """Columns chrom, pos, ref, alt of `n` records."""
+    rnd = random.Random(seed)
+
+    def seq(k):
+        return "".join(rnd.choices("ACGT", k=k))
+
+    def snv():
+        ref = rnd.choice("ACGT")
+        return ref, rnd.choice([base for base in "ACGT" if base != ref])
+
+    def deletion():
+        ref = seq(rnd.randint(2, 12))
+        return ref, ref[0]
+
+    def insertion():
+        ref = seq(1)
+        return ref, ref + seq(rnd.randint(1, 10))
+
+    def delins():
+        return seq(rnd.randint(2, 6)), seq(rnd.randint(1, 6))
+
+    def mnv():  # sharing a first base, trimmed
+        ref = seq(rnd.randint(2, 4))
+        return ref, ref[0] + seq(rnd.randint(1, 4))
+
+    makers = [snv, deletion, insertion, delins, mnv]
+    weights = [88, 6, 4, 1, 1]
+    chroms, positions, refs, alts = [], [], [], []
+    for _ in range(n):
+        ref, alt = rnd.choices(makers, weights)[0]()
+        chroms.append(rnd.choice(CHROMS))
+        positions.append(rnd.randint(1, 2 * 10 ** 8))
+        refs.append(ref)
+        alts.append(alt)
+    return chroms, positions, refs, alts
+
+
+def row_by_row(chroms, positions, refs, alts):
+    ids, var_types = [], []
+    for row in zip(chroms, positions, refs, alts):
+        try:
+            hgvs, var_type = get_hgvs_from_vcf(*row, mutant_type=True)
+        except ValueError:
+            hgvs = var_type = None
+        ids.append(hgvs)
+        var_types.append(var_type)
+    return ids, var_types
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=1000000)
+    parser.add_argument("--chunk", type=int, default=1000000, help="records generated and converted at a time")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="also write the JSON results to this file")
+    args = parser.parse_args()
+
+    scalar_s = batch_s = 0.0
+    done = 0
+    while done < args.records:
+        n = min(args.chunk, args.records - done)
+        columns = synthetic_records(n, seed=args.seed + done)
+        elapsed, (ids, var_types) = benchutils.timeit(row_by_row, *columns)
+        scalar_s += elapsed
+        elapsed, batch = benchutils.timeit(get_hgvs_from_vcf_batch, *columns)
+        batch_s += elapsed
+        if (batch[0], batch[1]) != (ids, var_types):
+            raise AssertionError("get_hgvs_from_vcf_batch differs from get_hgvs_from_vcf.")
+        done += n
+
+    benchutils.report({
+        "records": args.records,
+        "get_hgvs_from_vcf": {"s": round(scalar_s, 3), "records_per_s": round(args.records / scalar_s)},
+        "get_hgvs_from_vcf_batch": {"s": round(batch_s, 3), "records_per_s": round(args.records / batch_s)},
+        "speedup": round(scalar_s / batch_s, 2),
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
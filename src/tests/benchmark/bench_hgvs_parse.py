@@ -0,0 +1,113 @@
+"""
+    HGVS id parsing, the per-type parsers snpeff_parser.VCFConstruct used,
+    one re.match of a pattern string per type, vs. utils.hgvs.parse_hgvs_id,
+    cold, then with its cache warm, as when the same ids come again.
+
+    The ids are a mix of SNVs, deletions, insertions and delins, with a share
+    of repeated ids:
+
+        python tests/benchmark/bench_hgvs_parse.py --ids 1000000 --repeated 0.3
+"""
+import argparse
+import gc
+import random
+import re
+
+import benchutils
+
+from utils.hgvs import parse_hgvs_id
+
+
+def legacy_parse(hgvs_id):
+    """
+    The classification and parsing of VCFConstruct.build_vcfs before parse_hgvs_id,
+    with the positions converted to int, as its VCF constructors did.
+    """
+    if '>' in hgvs_id:
+        mat = re.match(r'chr(\w+):g\.(\d+)(\w)\>(\w)', hgvs_id)
+    elif hgvs_id.endswith('del') and '_' in hgvs_id:
+        mat = re.match(r'chr(\w+):g\.(\d+)\_(\d+)del', hgvs_id)
+    elif hgvs_id.endswith('del') and '_' not in hgvs_id:
+        mat = re.match(r'chr(\w+):g\.(\d+)del', hgvs_id)
+    elif 'ins' in hgvs_id and 'del' not in hgvs_id:
+        mat = re.match(r'chr(\w+):g\.(\d+)\_(\d+)ins(\w+)', hgvs_id)
+    elif 'delins' in hgvs_id:
+        mat = re.match(r'chr(\w+):g\.(\d+)\_(\d+)delins(\w+)', hgvs_id)
+    else:
+        return None
+    if not mat:
+        return None
+    groups = mat.groups()
+    return (groups[0], int(groups[1]), int(groups[2]) if groups[2].isdigit() else groups[2], *groups[3:]) \
+        if len(groups) > 2 else (groups[0], int(groups[1]))
+
+
+def mixed_ids(n, repeated, seed=0):
+    rnd = random.Random(seed)
+    chroms = [str(i) for i in range(1, 23)] + ["X", "Y", "MT"]
+
+    def seq(k):
+        return "".join(rnd.choices("ACGT", k=k))
+
+    def pos():
+        return rnd.randint(1, 2 * 10 ** 8)
+
+    makers = [
+        lambda c: f"chr{c}:g.{pos()}{seq(1)}>{seq(1)}",
+        lambda c: f"chr{c}:g.{pos()}del",
+        lambda c: (lambda p: f"chr{c}:g.{p}_{p + rnd.randint(1, 20)}del")(pos()),
+        lambda c: (lambda p: f"chr{c}:g.{p}_{p + 1}ins{seq(rnd.randint(1, 10))}")(pos()),
+        lambda c: (lambda p: f"chr{c}:g.{p}_{p + rnd.randint(1, 5)}delins{seq(rnd.randint(1, 5))}")(pos()),
+    ]
+    weights = [85, 4, 4, 4, 3]
+    ids = []
+    for _ in range(n):
+        if ids and rnd.random() < repeated:
+            ids.append(rnd.choice(ids))
+        else:
+            ids.append(rnd.choices(makers, weights)[0](rnd.choice(chroms)))
+    return ids
+
+
+def parse_all(parse, ids):
+    """Number of ids parsed, the records are not kept, nor collected by gc meanwhile."""
+    gc.disable()
+    try:
+        return sum(parse(hgvs_id) is not None for hgvs_id in ids)
+    finally:
+        gc.enable()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ids", type=int, default=1000000)
+    parser.add_argument("--repeated", type=float, default=0.3, help="share of ids seen before")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="also write the JSON results to this file")
+    args = parser.parse_args()
+
+    ids = mixed_ids(args.ids, args.repeated, args.seed)
+    legacy_s, legacy = benchutils.timeit(parse_all, legacy_parse, ids)
+    parse_hgvs_id.cache_clear()
+    cold_s, parsed = benchutils.timeit(parse_all, parse_hgvs_id, ids)
+    cache = parse_hgvs_id.cache_info()
+    warm_ids = ids[-parse_hgvs_id.cache_info().maxsize:]
+    warm_s, _ = benchutils.timeit(parse_all, parse_hgvs_id, warm_ids)
+
+    if legacy != parsed:
+        raise AssertionError("parse_hgvs_id and the legacy parsers do not parse the same ids.")
+
+    benchutils.report({
+        "ids": args.ids,
+        "repeated": args.repeated,
+        "legacy": {"s": round(legacy_s, 3), "ids_per_s": round(args.ids / legacy_s)},
+        "parse_hgvs_id": {"s": round(cold_s, 3), "ids_per_s": round(args.ids / cold_s),
+                          "cache_hits": cache.hits, "cache_misses": cache.misses},
+        "parse_hgvs_id_cached": {"ids_per_s": round(len(warm_ids) / warm_s)},
+        "speedup": round(legacy_s / cold_s, 2),
+        "speedup_cached": round(legacy_s / args.ids * len(warm_ids) / warm_s, 2),
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
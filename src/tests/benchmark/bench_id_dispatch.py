@@ -0,0 +1,83 @@
+"""
+    Annotation id parsing, pattern by pattern vs. the combined dispatcher.
+
+    Parses a batch of mixed ids (HGVS, rsids, CURIEs, RCV accessions,
+    UniProt ids, and ids matching no pattern) against
+    config_web.ANNOTATION_ID_REGEX_LIST, the way the framework query string
+    parser does, then with web.dispatch.IDDispatcher, checking that both
+    give the same results.
+
+        python tests/benchmark/bench_id_dispatch.py --ids 10000
+"""
+import argparse
+import random
+import re
+
+import benchutils
+
+import config_web
+from web.dispatch import IDDispatcher
+
+
+def mixed_ids(n, seed=0):
+    rnd = random.Random(seed)
+    makers = [
+        lambda: f"chr{rnd.choice(['1', '8', '17', 'X', 'MT'])}:g.{rnd.randint(1, 10**8)}"
+                f"{rnd.choice('ACGT')}>{rnd.choice('ACGT')}",
+        lambda: f"rs{rnd.randint(1, 10**9)}",
+        lambda: f"DBSNP:rs{rnd.randint(1, 10**9)}",
+        lambda: f"CLINVAR:{rnd.randint(1, 10**6)}",
+        lambda: f"CAID:CA{rnd.randint(1, 10**9)}",
+        lambda: f"RCV{rnd.randint(1, 10**6):09d}.{rnd.randint(1, 5)}",
+        lambda: f"VAR_{rnd.randint(1, 10**6):06d}",
+        lambda: f"CA{rnd.randint(1, 10**9)}",  # default scopes
+    ]
+    weights = [40, 30, 5, 5, 5, 5, 5, 5]
+    return [rnd.choices(makers, weights)[0]() for _ in range(n)]
+
+
+def sequential(ids, patterns, default_scopes):
+    out = []
+    for q in ids:
+        for regex, scopes in patterns:
+            match = re.fullmatch(regex, q)
+            if match:
+                named_groups = match.groupdict()
+                scopes = [scopes] if isinstance(scopes, str) else scopes
+                out.append((named_groups.get("term") or q, named_groups.get("scope") or scopes))
+                break
+        else:
+            out.append((q, default_scopes))
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ids", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--output", help="also write the JSON results to this file")
+    args = parser.parse_args()
+
+    ids = mixed_ids(args.ids)
+    patterns = config_web.ANNOTATION_ID_REGEX_LIST
+    default_scopes = config_web.ANNOTATION_DEFAULT_SCOPES
+    dispatcher = IDDispatcher(patterns, default_scopes)
+
+    seq_time, expected = benchutils.timeit(sequential, ids, patterns, default_scopes, repeat=args.repeat)
+    parse_time, parsed = benchutils.timeit(
+        lambda: [tuple(dispatcher.parse(q)) for q in ids], repeat=args.repeat)
+    classify_time, _ = benchutils.timeit(dispatcher.classify, ids, repeat=args.repeat)
+    assert parsed == expected, "the dispatcher and the sequential parser disagree"
+
+    benchutils.report({
+        "ids": len(ids),
+        "combined": dispatcher.regex is not None,
+        "sequential_ms": round(seq_time * 1000, 3),
+        "dispatcher_ms": round(parse_time * 1000, 3),
+        "classify_ms": round(classify_time * 1000, 3),
+        "speedup": round(seq_time / parse_time, 2),
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+    Interval query latency with and without the genomic bin filter.
+
+    Loads synthetic variants on one chromosome into a scratch index of a
+    local Elasticsearch, then times 1kb, 100kb and 10Mb window queries built
+    by MVQueryBuilder.interval_filter, with and without bins.
+
+        python tests/benchmark/bench_interval_bins.py --es http://localhost:9200 --docs 2000000
+"""
+import argparse
+import random
+import time
+
+import benchutils
+from elasticsearch import Elasticsearch, helpers
+
+from utils.binning import bin_from_range
+from web.pipeline import MVQueryBuilder
+
+WINDOWS = {"1kb": 1_000, "100kb": 100_000, "10Mb": 10_000_000}
+CHROM_LENGTH = 248_956_422  # hg38 chr1
+
+
+def load(client, index, n_docs, assembly, seed=0):
+    client.indices.create(index=index, mappings={
+        "properties": {
+            "chrom": {"type": "keyword"},
+            assembly: {"properties": {
+                "start": {"type": "integer"},
+                "end": {"type": "integer"},
+                "bin": {"type": "integer"},
+            }}
+        }
+    }, settings={"number_of_replicas": 0, "refresh_interval": -1})
+
+    rnd = random.Random(seed)
+
+    def docs():
+        for i in range(n_docs):
+            start = rnd.randint(1, CHROM_LENGTH - 100)
+            end = start + rnd.choice((0, 0, 0, 1, 5, 30))
+            yield {
+                "_index": index,
+                "_id": str(i),
+                "chrom": "1",
+                assembly: {"start": start, "end": end, "bin": bin_from_range(start, end)},
+            }
+
+    helpers.bulk(client, docs(), chunk_size=5000, request_timeout=300)
+    client.indices.put_settings(index=index, settings={"refresh_interval": "1s"})
+    client.indices.refresh(index=index)
+    client.indices.forcemerge(index=index, max_num_segments=1, request_timeout=600)
+
+
+def run(client, index, assembly, window, repeat, seed=1):
+    rnd = random.Random(seed)
+    latencies = {"range": [], "bins": []}
+    for _ in range(repeat):
+        start = rnd.randint(1, CHROM_LENGTH - window)
+        end = start + window - 1
+        for mode in ("range", "bins"):
+            query = MVQueryBuilder.interval_filter("1", str(start), str(end), assembly, mode == "bins").to_dict()
+            t0 = time.perf_counter()
+            # request_cache off, we want to measure the query itself
+            client.search(index=index, query=query, size=10, track_total_hits=True, request_cache=False)
+            latencies[mode].append(time.perf_counter() - t0)
+    return {mode: benchutils.summarize(values) for mode, values in latencies.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--es", default="http://localhost:9200")
+    parser.add_argument("--index", default="mvbench_interval_bins")
+    parser.add_argument("--docs", type=int, default=2_000_000)
+    parser.add_argument("--assembly", default="hg38", choices=("hg19", "hg38"))
+    parser.add_argument("--repeat", type=int, default=200, help="queries per window size and mode")
+    parser.add_argument("--keep", action="store_true", help="reuse/keep the scratch index")
+    parser.add_argument("--output", help="also write the JSON results to this file")
+    args = parser.parse_args()
+
+    client = Elasticsearch(args.es, request_timeout=120)
+    if not client.indices.exists(index=args.index):
+        load(client, args.index, args.docs, args.assembly)
+
+    try:
+        results = {"docs": client.count(index=args.index)["count"], "windows": {}}
+        for name, window in WINDOWS.items():
+            results["windows"][name] = run(client, args.index, args.assembly, window, args.repeat)
+        benchutils.report(results, args.output)
+    finally:
+        if not args.keep:
+            client.indices.delete(index=args.index)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+    Liftover throughput, one position at a time and by batch.
+
+    Lifts random positions of chromosome 1 with a UCSC chain file, e.g.
+    hg19ToHg38.over.chain.gz, or with synthetic chains if none is given.
+    Batches use numpy when it is installed.
+
+        python tests/benchmark/bench_liftover.py --chain hg19ToHg38.over.chain.gz --positions 1000000
+"""
+import argparse
+import random
+
+import benchutils
+
+from utils import liftover
+from utils.liftover import LiftOver
+
+CHROM_LENGTH = 249_250_621  # hg19 chr1
+
+
+def synthetic_blocks(n_blocks, seed=0):
+    """Blocks of chromosome 1 shifted by a growing offset, with gaps in between."""
+    rnd = random.Random(seed)
+    size = CHROM_LENGTH // n_blocks
+    shift = 0
+    for i in range(n_blocks):
+        shift += rnd.randint(0, 100)
+        yield "1", i * size, size - rnd.randint(1, 50), "1", i * size + shift, "+", CHROM_LENGTH * 2
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chain", help="chain file, synthetic chains otherwise")
+    parser.add_argument("--blocks", type=int, default=10_000, help="synthetic blocks")
+    parser.add_argument("--positions", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="also write the JSON results to this file")
+    args = parser.parse_args()
+
+    load_time, lift = benchutils.timeit(
+        lambda: LiftOver.from_chain_file(args.chain) if args.chain else LiftOver(synthetic_blocks(args.blocks)))
+
+    rnd = random.Random(1)
+    positions = [rnd.randint(1, CHROM_LENGTH) for _ in range(args.positions)]
+
+    single_time, single = benchutils.timeit(
+        lambda: [lift.convert("1", position) for position in positions], repeat=args.repeat)
+    batch_time, batch = benchutils.timeit(lift.convert_many, "1", positions, repeat=args.repeat)
+    assert single == batch, "single and batch liftover disagree"
+
+    benchutils.report({
+        "chain": args.chain or f"synthetic, {args.blocks} blocks",
+        "numpy": liftover.np is not None,
+        "load_s": round(load_time, 3),
+        "positions": len(positions),
+        "lifted": sum(result is not None for result in batch),
+        "single_per_s": round(len(positions) / single_time),
+        "batch_per_s": round(len(positions) / batch_time),
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+    Sets of variant ids, as strings vs. as utils.varkey integer keys, in a
+    VariantKeySet and in a sorted array of int64 keys, searched by bisection:
+    memory (traced by tracemalloc, the ids themselves included), build,
+    lookup and sort times.
+
+    The ids are mostly SNVs, with deletions, insertions and delins, see
+    bench_hgvs_parse.py, and look ups are half of ids of the set:
+
+        python tests/benchmark/bench_varkey.py --ids 1000000
+"""
+import argparse
+import gc
+import tracemalloc
+from array import array
+from bisect import bisect_left
+
+import benchutils
+from bench_hgvs_parse import mixed_ids
+
+from utils.varkey import VariantKeySet, encode, sort_key
+
+
+def traced(func, *args):
+    """Return the memory allocated by func(*args) and still held by its result, and the result."""
+    gc.collect()
+    tracemalloc.start()
+    result = func(*args)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size, result
+
+
+def copy_ids(ids):
+    # new strings, not shared with the list of ids, as when read from a file
+    return [hgvs_id.encode().decode() for hgvs_id in ids]
+
+
+def string_set(ids):
+    return set(copy_ids(ids))
+
+
+def key_set(ids):
+    return VariantKeySet(copy_ids(ids))
+
+
+def key_array(ids):
+    keys = [encode(hgvs_id) for hgvs_id in ids]
+    return array("q", sorted(key for key in keys if key is not None))
+
+
+def in_array(keys, hgvs_id):
+    key = encode(hgvs_id)
+    i = bisect_left(keys, key)
+    return i < len(keys) and keys[i] == key
+
+
+def count_in(container, queries):
+    return sum(hgvs_id in container for hgvs_id in queries)
+
+
+def count_in_array(keys, queries):
+    return sum(in_array(keys, hgvs_id) for hgvs_id in queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ids", type=int, default=1000000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="also write the JSON results to this file")
+    args = parser.parse_args()
+
+    ids = list(dict.fromkeys(mixed_ids(args.ids, 0, args.seed)))
+    absent = mixed_ids(len(ids) // 2, 0, args.seed + 1)
+    queries = ids[::2] + absent
+    encodable = sum(encode(hgvs_id) is not None for hgvs_id in ids)
+
+    results = {"ids": len(ids), "encodable": encodable}
+    for name, build, lookup in [
+        ("str_set", string_set, count_in),
+        ("VariantKeySet", key_set, count_in),
+        ("int64_array", key_array, count_in_array),
+    ]:
+        size, _ = traced(build, ids)
+        build_s, container = benchutils.timeit(build, ids)
+        lookup_s, found = benchutils.timeit(lookup, container, queries)
+        results[name] = {
+            "bytes_per_id": round(size / len(ids), 1),
+            "build_s": round(build_s, 3),
+            "lookups_per_s": round(len(queries) / lookup_s),
+            "found": found,
+        }
+        del container
+
+    results["str_set"]["sort_s"] = round(benchutils.timeit(sorted, ids)[0], 3)
+    results["VariantKeySet"]["sort_s"] = round(benchutils.timeit(sorted, ids, key=sort_key)[0], 3)
+    keys = [encode(hgvs_id) for hgvs_id in ids if encode(hgvs_id) is not None]
+    results["int64_array"]["sort_s"] = round(benchutils.timeit(sorted, keys)[0], 3)
+    benchutils.report(results, args.output)
+
+
+if __name__ == "__main__":
+    main()
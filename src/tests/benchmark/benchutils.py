@@ -0,0 +1,56 @@
+"""
+    Helpers shared by the benchmark scripts in this folder.
+
+    The scripts are meant to be run directly, e.g.:
+
+        python tests/benchmark/bench_interval_bins.py --help
+
+    and print their results as JSON, so they can be compared between commits.
+"""
+import json
+import os as _os
+import statistics
+import sys as _sys
+import time
+
+# make the application modules importable, like tests/app/config.py does
+_sys.path.insert(0, _os.path.abspath(_os.path.join(_os.path.dirname(__file__), _os.pardir, _os.pardir)))
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    if not values:
+        return None
+    k = (len(values) - 1) * pct / 100
+    lo, hi = int(k), min(int(k) + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def summarize(latencies):
+    """latencies in seconds -> summary in milliseconds"""
+    return {
+        "n": len(latencies),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 3) if latencies else None,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3) if latencies else None,
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3) if latencies else None,
+    }
+
+
+def timeit(func, *args, repeat=1, **kwargs):
+    """Return the best wall time of `repeat` calls of func(*args, **kwargs), and its last result."""
+    best, result = None, None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = func(*args, **kwargs)
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def report(results, output=None):
+    text = json.dumps(results, indent=2, sort_keys=True)
+    if output:
+        with open(output, "w") as f:
+            f.write(text + "\n")
+    print(text)
@@ -0,0 +1,253 @@
+"""
+    Load test of the web API, against a local Elasticsearch loaded with the
+    test app data.
+
+    Loads the test data of tests/app/test_data/<name> into the local ES,
+    starts the app from index.py with the test app config, then replays a
+    mix of requests, built from the test documents, at a fixed concurrency,
+    and reports the QPS, and the latency percentiles of each kind of request:
+
+        annotation_get   GET  /v1/variant/<id>
+        annotation_post  POST /v1/variant, a batch of ids
+        interval         GET  /v1/query?q=chr<chrom>:<start>-<end>
+        rsid             GET  /v1/query?q=dbsnp.rsid:<rsid>
+        beacon           GET  /beacon/query
+        metadata         GET  /v1/metadata, /v1/metadata/fields
+
+    The results are JSON, with --output written to a file, and compared to
+    the ones of a previous run with --baseline, e.g. in CI:
+
+        python tests/benchmark/loadtest.py --duration 30 --concurrency 16 --output head.json --baseline base.json
+        python tests/benchmark/loadtest.py --url http://localhost:8000 --mix annotation_get=1,metadata=1
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from urllib.parse import urlencode
+
+import benchutils
+from elasticsearch import Elasticsearch, helpers
+from tornado.httpclient import AsyncHTTPClient, HTTPClientError
+
+SRC = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, os.pardir))
+TEST_APP = os.path.join(SRC, "tests", "app")
+
+DEFAULT_MIX = "annotation_get=4,annotation_post=1,interval=2,rsid=2,beacon=1,metadata=1"
+
+
+def load_test_data(client, name):
+    """
+    Create the indices of the test data folder `name`, as the test app does,
+    unless they exist. Return the names of the indices created, and the
+    documents of all the indices.
+    """
+    folder = os.path.join(TEST_APP, "test_data", name)
+    created, docs = [], []
+    for filename in sorted(os.listdir(folder)):
+        index, ext = os.path.splitext(filename)
+        if ext != ".json":
+            continue
+        data_path = os.path.join(folder, index + ".ndjson")
+        if not os.path.exists(data_path):
+            continue
+        with open(data_path) as f:
+            lines = [json.loads(line) for line in f if line.strip()]
+        index_docs = [{"_id": action["index"]["_id"], **doc} for action, doc in zip(lines[::2], lines[1::2])]
+        docs.extend(index_docs)
+
+        if client.indices.exists(index=index):
+            continue
+        with open(os.path.join(folder, filename)) as f:
+            definition = json.load(f)
+        client.indices.create(index=index, body=definition)
+        helpers.bulk(client, ({"_index": index, "_id": doc["_id"],
+                               "_source": {k: v for k, v in doc.items() if k != "_id"}}
+                              for doc in index_docs))
+        client.indices.refresh(index=index)
+        created.append(index)
+    return created, docs
+
+
+def request_templates(docs, prefix, batch_size):
+    """The requests of each kind, built from the test documents: (method, path, body)."""
+    ids = [doc["_id"] for doc in docs]
+    rsids = sorted({doc["dbsnp"]["rsid"] for doc in docs if "rsid" in doc.get("dbsnp", {})})
+    positions = [(doc["chrom"], doc["hg19"]["start"], doc["hg19"]["end"])
+                 for doc in docs if "chrom" in doc and "hg19" in doc]
+    alleles = [(doc["chrom"], doc["vcf"]["position"], doc["vcf"]["ref"], doc["vcf"]["alt"])
+               for doc in docs if "chrom" in doc and "vcf" in doc]
+
+    def get(path, **params):
+        return "GET", path + ("?" + urlencode(params) if params else ""), None
+
+    return {
+        "annotation_get": [get(f"/{prefix}/variant/{_id}") for _id in ids],
+        "annotation_post": [("POST", f"/{prefix}/variant", json.dumps({
+            "ids": [ids[(i + k) % len(ids)] for k in range(batch_size)]
+        })) for i in range(len(ids))],
+        "interval": [get(f"/{prefix}/query", q=f"chr{chrom}:{start - 1000}-{end + 1000}")
+                     for chrom, start, end in positions],
+        "rsid": [get(f"/{prefix}/query", q=f"dbsnp.rsid:{rsid}") for rsid in rsids],
+        "beacon": [get("/beacon/query", referenceName=chrom, start=position, referenceBases=ref,
+                       alternateBases=alt, assemblyId="GRCh37")
+                   for chrom, position, ref, alt in alleles],
+        "metadata": [get(f"/{prefix}/metadata"), get(f"/{prefix}/metadata/fields")],
+    }
+
+
+def parse_mix(mix):
+    weights = {}
+    for item in mix.split(","):
+        kind, _, weight = item.partition("=")
+        weights[kind.strip()] = float(weight or 1)
+    return weights
+
+
+def schedule(templates, weights, seed=0):
+    """An endless, reproducible, sequence of (kind, request) drawn by weight."""
+    kinds = [kind for kind in weights if weights[kind] > 0 and templates.get(kind)]
+    if not kinds:
+        raise ValueError("No request to make with this mix and test data.")
+    rnd = random.Random(seed)
+    while True:
+        kind = rnd.choices(kinds, [weights[kind] for kind in kinds])[0]
+        yield kind, rnd.choice(templates[kind])
+
+
+async def run(url, requests, concurrency, duration, warmup):
+    client = AsyncHTTPClient(max_clients=concurrency)
+    latencies, errors = {}, {}
+    deadline = None
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            kind, (method, path, body) = next(requests)
+            headers = {"Content-Type": "application/json"} if body else None
+            t0 = time.perf_counter()
+            try:
+                await client.fetch(url + path, method=method, body=body, headers=headers,
+                                   decompress_response=True, request_timeout=60)
+            except (HTTPClientError, OSError) as exc:
+                errors[kind] = errors.get(kind, 0) + 1
+                if isinstance(exc, OSError):
+                    raise
+                continue
+            if measuring:
+                latencies.setdefault(kind, []).append(time.perf_counter() - t0)
+
+    measuring = False
+    deadline = time.perf_counter() + warmup
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    errors.clear()
+
+    measuring = True
+    start = time.perf_counter()
+    deadline = start + duration
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return latencies, errors, elapsed
+
+
+def start_app(conf, port, prefix, timeout=60):
+    process = subprocess.Popen([sys.executable, "index.py", f"--conf={conf}", f"--port={port}"], cwd=SRC)
+    url = f"http://localhost:{port}"
+    client = AsyncHTTPClient()
+    deadline = time.monotonic() + timeout
+
+    async def ready():
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"The app exited with status {process.returncode}.")
+            try:
+                await client.fetch(f"{url}/{prefix}/metadata", request_timeout=5)
+                return
+            except (HTTPClientError, OSError):
+                await asyncio.sleep(0.5)
+        raise RuntimeError(f"The app did not start in {timeout}s.")
+
+    try:
+        asyncio.run(ready())
+    except BaseException:
+        process.terminate()
+        raise
+    return process, url
+
+
+def compare(results, baseline):
+    """Ratios of the QPS and latency percentiles of `results` to those of `baseline`."""
+    def ratio(value, base):
+        return round(value / base, 3) if value is not None and base else None
+
+    out = {"qps": ratio(results["qps"], baseline.get("qps"))}
+    for kind, stats in results["kinds"].items():
+        base = baseline.get("kinds", {}).get(kind)
+        if base:
+            out[kind] = {key: ratio(stats[key], base.get(key)) for key in ("p50_ms", "p95_ms", "p99_ms")}
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--es", default="http://localhost:9200")
+    parser.add_argument("--data", default="issue_133", help="test data folder, in tests/app/test_data")
+    parser.add_argument("--conf", default=os.path.join(TEST_APP, "config.py"), help="config of the app")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--url", help="load test a running app instead of starting one")
+    parser.add_argument("--prefix", default="v1")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="kind=weight of the requests, comma separated")
+    parser.add_argument("--concurrency", type=int, default=8, help="requests in flight")
+    parser.add_argument("--duration", type=float, default=30, help="seconds measured")
+    parser.add_argument("--warmup", type=float, default=5, help="seconds before measuring")
+    parser.add_argument("--batch-size", type=int, default=100, help="ids per annotation POST")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep", action="store_true", help="keep the test indices")
+    parser.add_argument("--output", help="also write the JSON results to this file")
+    parser.add_argument("--baseline", help="JSON results of a previous run to compare to")
+    args = parser.parse_args()
+
+    client = Elasticsearch(args.es, request_timeout=120)
+    created, docs = load_test_data(client, args.data)
+    process = None
+    try:
+        url = args.url
+        if not url:
+            process, url = start_app(args.conf, args.port, args.prefix)
+
+        templates = request_templates(docs, args.prefix, args.batch_size)
+        weights = parse_mix(args.mix)
+        latencies, errors, elapsed = asyncio.run(run(
+            url.rstrip("/"), schedule(templates, weights, args.seed),
+            args.concurrency, args.duration, args.warmup))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+        if not args.keep:
+            for index in created:
+                client.indices.delete(index=index)
+
+    total = sum(len(values) for values in latencies.values())
+    results = {
+        "mix": weights,
+        "concurrency": args.concurrency,
+        "duration_s": round(elapsed, 3),
+        "requests": total,
+        "errors": errors,
+        "qps": round(total / elapsed, 1),
+        "all": benchutils.summarize([value for values in latencies.values() for value in values]),
+        "kinds": {kind: {**benchutils.summarize(values), "qps": round(len(values) / elapsed, 1)}
+                  for kind, values in sorted(latencies.items())},
+    }
+    if args.baseline:
+        with open(args.baseline) as f:
+            results["vs_baseline"] = compare(results, json.load(f))
+    benchutils.report(results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+import random
+import unittest
+
+from utils.binning import bin_from_positions, bin_from_range, overlapping_bins, BIN_MAX_POSITION
+
+
+class TestBinning(unittest.TestCase):
+    def test_bin_from_range(self):
+        # values from the UCSC binFromRange() implementation (0-based, half open)
+        self.assertEqual(585, bin_from_range(1, 1))
+        self.assertEqual(585, bin_from_range(1, 131072))
+        self.assertEqual(586, bin_from_range(131073, 131073))
+        # crossing a 128kb boundary moves the variant one level up
+        self.assertEqual(73, bin_from_range(131072, 131073))
+        self.assertEqual(0, bin_from_range(1, BIN_MAX_POSITION))
+        # end before start, as stored for some insertions
+        self.assertEqual(bin_from_range(100, 101), bin_from_range(101, 100))
+
+    def test_bin_from_positions(self):
+        self.assertEqual(585, bin_from_positions({"start": 1, "end": 1}))
+        self.assertEqual(585, bin_from_positions({"start": "100", "end": "101"}))
+        # positions of sources which disagree, binned as their union
+        self.assertEqual(73, bin_from_positions([{"start": 131072, "end": 131072}, {"start": 131073, "end": 131073}]))
+        self.assertEqual(585, bin_from_positions([{"start": 10, "end": 10}, {"start": 10}, "10"]))
+        # out of the binning range, matched by any binned query
+        self.assertEqual(0, bin_from_positions({"start": 0, "end": 1}))
+        self.assertIsNone(bin_from_positions({"start": 10}))
+        self.assertIsNone(bin_from_positions([]))
+        self.assertIsNone(bin_from_positions("chr1:10"))
+
+    def test_out_of_range(self):
+        self.assertRaises(ValueError, bin_from_range, 0, 10)
+        self.assertRaises(ValueError, bin_from_range, 1, BIN_MAX_POSITION + 1)
+        self.assertRaises(ValueError, overlapping_bins, 0, 10)
+
+    def test_overlapping_bins(self):
+        self.assertEqual([585, 73, 9, 1, 0], overlapping_bins(1, 1000))
+        self.assertEqual([585, 586, 73, 9, 1, 0], overlapping_bins(1, 131073))
+
+    def test_overlap(self):
+        rnd = random.Random(42)
+        for _ in range(2000):
+            start = rnd.randint(1, 250_000_000)
+            end = start + rnd.choice([0, 1, 10, 1000, 200_000, 5_000_000])
+            q_start = rnd.randint(max(1, start - 10_000_000), end)
+            q_end = q_start + rnd.choice([0, 1000, 100_000, 10_000_000])
+            if q_end < start:
+                continue
+            # the variant overlaps the query window
+            self.assertIn(bin_from_range(start, end), overlapping_bins(q_start, q_end))
@@ -0,0 +1,45 @@
+import os
+import tempfile
+import unittest
+
+from utils.bloom import BloomFilter, optimal_size
+
+
+class TestBloomFilter(unittest.TestCase):
+    IDS = [f"chr1:g.{pos}A>G" for pos in range(1, 20001)]
+
+    def test_no_false_negatives(self):
+        bloom = BloomFilter.create(len(self.IDS), 0.01)
+        bloom.update(self.IDS)
+        self.assertTrue(all(_id in bloom for _id in self.IDS))
+
+    def test_error_rate(self):
+        bloom = BloomFilter.create(len(self.IDS), 0.01)
+        bloom.update(self.IDS)
+        absent = [f"chr2:g.{pos}A>G" for pos in range(1, 20001)]
+        false_positives = sum(_id in bloom for _id in absent)
+        self.assertLess(false_positives / len(absent), 0.02)
+        self.assertAlmostEqual(0.01, bloom.error_rate(), delta=0.002)
+
+    def test_optimal_size(self):
+        self.assertEqual((9586, 7), optimal_size(1000, 0.01))
+        self.assertRaises(ValueError, optimal_size, 1000, 0)
+
+    def test_save_load(self):
+        bloom = BloomFilter.create(100, 0.001, version="20240101")
+        bloom.update(self.IDS[:100])
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "ids_hg19.bloom")
+            bloom.save(path)
+            loaded = BloomFilter.load(path)
+            self.assertEqual("20240101", loaded.version)
+            self.assertEqual(100, loaded.count)
+            self.assertTrue(all(_id in loaded for _id in self.IDS[:100]))
+            self.assertEqual(
+                [_id in bloom for _id in self.IDS[100:1000]],
+                [_id in loaded for _id in self.IDS[100:1000]])
+            loaded.close()
+
+            with open(path, "r+b") as f:
+                f.truncate(100)
+            self.assertRaises(ValueError, BloomFilter.load, path)
@@ -0,0 +1,59 @@
+import gzip
+import unittest
+import zlib
+
+from utils import compression
+from utils.compression import compress, compressor, negotiate, parse_accept_encoding
+
+PAYLOAD = b'{"_id":"chr1:g.218631822G>A","dbnsfp":{"genename":"TGFB2"}}\n' * 200
+
+
+class TestNegotiate(unittest.TestCase):
+    def test_parse(self):
+        self.assertEqual({"gzip": 1.0, "br": 0.5, "zstd": 0.0},
+                         parse_accept_encoding("gzip, br;q=0.5, zstd;q=0"))
+
+    def test_negotiate(self):
+        encodings = ("zstd", "br", "gzip")
+        self.assertEqual("zstd", negotiate("gzip, deflate, br, zstd", encodings))
+        self.assertEqual("br", negotiate("gzip, br", encodings))
+        self.assertEqual("gzip", negotiate("gzip;q=1, br;q=0.5", encodings))
+        self.assertEqual("br", negotiate("*, zstd;q=0", encodings))
+        self.assertIsNone(negotiate("deflate", encodings))
+        self.assertIsNone(negotiate("gzip;q=0", encodings))
+        self.assertIsNone(negotiate("", encodings))
+        self.assertEqual("gzip", negotiate("zstd, gzip", ("gzip",)))
+
+
+class TestCompression(unittest.TestCase):
+    def test_gzip(self):
+        self.assertEqual(PAYLOAD, gzip.decompress(compress(PAYLOAD, "gzip", 6)))
+        self.assertEqual(compress(PAYLOAD, "gzip", 6), compress(PAYLOAD, "gzip", 6))
+
+    def test_stream(self):
+        stream = compressor("gzip", 6)
+        chunks = [stream.compress(PAYLOAD[:1000]) + stream.flush()]
+        # a flushed chunk can be decompressed on its own
+        self.assertEqual(PAYLOAD[:1000], zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(chunks[0]))
+        chunks.append(stream.compress(PAYLOAD[1000:]) + stream.finish())
+        self.assertEqual(PAYLOAD, gzip.decompress(b"".join(chunks)))
+
+    def test_unsupported(self):
+        self.assertRaises(ValueError, compress, PAYLOAD, "deflate", 6)
+        self.assertRaises(ValueError, compressor, "deflate", 6)
+
+    @unittest.skipIf(compression.zstandard is None, "zstandard is not installed")
+    def test_zstd(self):
+        decompressor = compression.zstandard.ZstdDecompressor()
+        self.assertEqual(PAYLOAD, decompressor.decompress(compress(PAYLOAD, "zstd", 3)))
+        stream = compressor("zstd", 3)
+        data = stream.compress(PAYLOAD) + stream.flush() + stream.finish()
+        self.assertEqual(PAYLOAD, decompressor.decompressobj().decompress(data))
+
+    @unittest.skipIf(compression.brotli is None, "brotli is not installed")
+    def test_brotli(self):
+        self.assertEqual(PAYLOAD, compression.brotli.decompress(compress(PAYLOAD, "br", 4)))
+        stream = compressor("br", 4)
+        data = stream.compress(PAYLOAD) + stream.flush() + stream.finish()
+        self.assertEqual(PAYLOAD, compression.brotli.decompress(data))
+
@@ -0,0 +1,60 @@
+import os
+import tempfile
+import unittest
+
+from utils.genetable import GeneRegions, GeneTable, gene_symbols
+
+
+class TestGeneSymbols(unittest.TestCase):
+    def test_fields(self):
+        doc = {
+            "dbnsfp": {"genename": ["BTK", "RPL36A-HNRNPH2"]},
+            "dbsnp": {"gene": [{"symbol": "btk"}, {"geneid": 695}]},
+            "snpeff": {"ann": {"genename": "GLA"}},
+        }
+        self.assertEqual({"BTK", "RPL36A-HNRNPH2", "GLA"}, gene_symbols(doc))
+
+    def test_no_genes(self):
+        self.assertEqual(set(), gene_symbols({"snpeff": {"ann": [{"effect": "intergenic_region"}]}}))
+
+
+class TestGeneTable(unittest.TestCase):
+    def regions(self):
+        regions = GeneRegions()
+        regions.add_doc({"hg19": {"start": 100611164, "end": 100611164}, "dbnsfp": {"genename": "BTK"}}, "X", "hg19")
+        regions.add_doc({"hg19": {"start": 100604435, "end": 100604440}, "snpeff": {"ann": {"genename": "BTK"}}}, "X", "hg19")
+        regions.add_doc({"hg19": {"start": 1, "end": 1}, "dbnsfp": {"genename": "BTK"}}, None, "hg19")
+        regions.add_doc({"hg38": {"start": 1, "end": 1}, "dbnsfp": {"genename": "BTK"}}, "X", "hg19")
+        regions.add("SHOX", "X", 585079, 607558)
+        regions.add("SHOX", "Y", 535079, 557558)
+        return regions
+
+    def test_regions(self):
+        table = GeneTable.from_regions(self.regions(), version="20240101")
+        self.assertEqual([("X", 100604435, 100611164)], table.lookup("btk"))
+        self.assertEqual([("X", 585079, 607558), ("Y", 535079, 557558)], table.lookup("SHOX"))
+        self.assertIsNone(table.lookup("GLA"))
+        self.assertIn("BTK", table)
+        self.assertEqual(2, len(table))
+
+    def test_update(self):
+        regions = GeneRegions()
+        regions.add("BTK", "X", 100611000, 100700000)
+        regions.update(self.regions().genes)
+        self.assertEqual({"X": [100604435, 100700000]}, regions.genes["BTK"])
+
+    def test_save_load(self):
+        table = GeneTable.from_regions(self.regions(), version="20240101")
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "genes_hg19.json")
+            table.save(path)
+            loaded = GeneTable.load(path)
+            self.assertEqual(["genes_hg19.json"], os.listdir(folder))
+        self.assertEqual("20240101", loaded.version)
+        self.assertEqual(table.genes, loaded.genes)
+
+    def test_load_invalid(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".json") as f:
+            f.write('{"genes": []}')
+            f.flush()
+            self.assertRaises(ValueError, GeneTable.load, f.name)
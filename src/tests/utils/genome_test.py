@@ -0,0 +1,99 @@
+import gzip
+import os
+import random
+import tempfile
+import unittest
+
+from utils.genome import GenomeStore, from_bitarrays, from_fasta, write_genome
+
+try:
+    from bitarray import bitarray
+except ImportError:
+    bitarray = None
+
+
+class TestGenomeStore(unittest.TestCase):
+
+    def setUp(self):
+        rnd = random.Random(0)
+        self.chroms = {
+            "1": "".join(rnd.choices("ACGT", k=1001)),
+            "X": "NNNN" + "".join(rnd.choices("ACGT", k=50)) + "NRN" + "ACGTA" + "N" * 30,
+            "MT": "ACG",
+        }
+        self.folder = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.folder.name, "hg19_genome.mvgenome")
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def assertGenome(self, genome):
+        self.assertEqual(set(self.chroms), set(genome))
+        for chrom, seq in self.chroms.items():
+            self.assertEqual(len(seq), len(genome[chrom]))
+            self.assertEqual(seq, genome.seq(chrom, 1, len(seq)))
+            self.assertEqual([base for base in seq], [genome.base(chrom, i) for i in range(1, len(seq) + 1)])
+
+    def test_fasta(self):
+        fasta = os.path.join(self.folder.name, "genome.fa.gz")
+        with gzip.open(fasta, "wt") as f:
+            for chrom, seq in self.chroms.items():
+                f.write(f">chr{'M' if chrom == 'MT' else chrom} description\n")
+                for i in range(0, len(seq), 60):
+                    f.write(seq[i:i + 60].lower() + "\n")
+        from_fasta([fasta], self.path)
+        genome = GenomeStore.open(self.path)
+        self.assertGenome(genome)
+        self.assertEqual("NRN", genome.seq("chrX", 55, 57))
+        self.assertEqual("A", genome["chrM"].base(1))
+        genome.close()
+
+    def test_chunks(self):
+        chunks = {chrom: [seq[i:i + 7] for i in range(0, len(seq), 7)] for chrom, seq in self.chroms.items()}
+        write_genome(self.path, chunks.items())
+        genome = GenomeStore.open(self.path)
+        self.assertGenome(genome)
+        genome.close()
+
+    def test_seq(self):
+        write_genome(self.path, self.chroms.items())
+        genome = GenomeStore.open(self.path)
+        rnd = random.Random(1)
+        for chrom, seq in self.chroms.items():
+            for _ in range(200):
+                start = rnd.randint(1, len(seq))
+                end = rnd.randint(start, len(seq))
+                self.assertEqual(seq[start - 1:end], genome.seq(chrom, start, end), (chrom, start, end))
+        self.assertEqual("NNNN", genome.seq("X", 1, 4))
+        self.assertEqual("NRNA", genome.seq("X", 55, 58))
+        self.assertRaises(IndexError, genome.seq, "1", 10, 9)
+        self.assertRaises(IndexError, genome.seq, "1", 1000, 1002)
+        genome.close()
+
+    def test_view(self):
+        write_genome(self.path, [("1", [self.chroms["1"]])])
+        genome = GenomeStore.open(self.path)
+        chrom = genome["1"]
+        view = chrom.view(6, 13)
+        self.assertEqual(3, len(view))
+        self.assertEqual(chrom.base(5), "ACGT"[view[0] >> 6])
+        self.assertEqual(chrom.base(6), "ACGT"[view[0] >> 4 & 3])
+        view.release()
+        self.assertRaises(IndexError, chrom.view, 0, 3)
+        self.assertRaises(IndexError, chrom.base, 1002)
+        self.assertRaises(KeyError, genome.__getitem__, "2")
+        genome.close()
+
+    def test_invalid(self):
+        write_genome(self.path, self.chroms.items())
+        with open(self.path, "r+b") as f:
+            f.truncate(100)
+        self.assertRaises(ValueError, GenomeStore.open, self.path)
+
+    @unittest.skipIf(bitarray is None, "bitarray is not installed")
+    def test_bitarrays(self):
+        from utils.validate import nuc_to_bit
+        from_bitarrays({chrom: nuc_to_bit(seq) for chrom, seq in self.chroms.items()}, self.path)
+        genome = GenomeStore.open(self.path)
+        self.assertGenome(genome)
+        genome.close()
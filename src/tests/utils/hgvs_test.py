@@ -1,3 +1,4 @@
+import random
 import unittest
 from utils.hgvs import *
 from utils.hgvs import _normalized_vcf
@@ -23,6 +24,26 @@ class TestFunctions(unittest.TestCase):
         hgvs = "chrY:g.21724699_21724700delinsTTGTACAGAGA"
         self.assertFalse(is_snp(hgvs))
 
+        # a prefix match, unlike parse_hgvs_id
+        hgvs = "chr1:g.100A>TT"
+        self.assertTrue(is_snp(hgvs))
+        self.assertIsNone(parse_hgvs_id(hgvs))
+
+    def test_parse_hgvs_id(self):
+        self.assertEqual(HGVSRecord("Y", 1885021, 1885021, "snp", "C", "A"), parse_hgvs_id("chrY:g.1885021C>A"))
+        self.assertEqual(HGVSRecord("Y", 21733168, 21733168, "del", None, None), parse_hgvs_id("chrY:g.21733168del"))
+        self.assertEqual(HGVSRecord("1", 100, 103, "del", None, None), parse_hgvs_id("chr1:g.100_103del"))
+        self.assertEqual(HGVSRecord("X", 123, 345, "dup", None, None), parse_hgvs_id("chrX:g.123_345dup"))
+        self.assertEqual(HGVSRecord("Y", 21878072, 21878073, "ins", None, "T"),
+                         parse_hgvs_id("chrY:g.21878072_21878073insT"))
+        self.assertEqual(HGVSRecord("MT", 15452, 15453, "delins", None, "AC"), parse_hgvs_id("chrMT:g.15452_15453delinsAC"))
+        self.assertEqual(HGVSRecord("X", 100, 100, "delins", None, "CT"), parse_hgvs_id("chrX:g.100delinsCT"))
+        for hgvs in ("chrMT:m.8279_8280del", "chr1:g.100A>TT", "chr1:g.100_101A>T", "chr1:g.100insA",
+                     "chr6:g.166253474_166253480TC[2]", "chr1:g.100_200delins_seqhashed_0f", "rs58991260"):
+            self.assertIsNone(parse_hgvs_id(hgvs), hgvs)
+        # cached
+        self.assertIs(parse_hgvs_id("chrY:g.1885021C>A"), parse_hgvs_id("chrY:g.1885021C>A"))
+
     def test_reverse_complement_seq(self):
         input_seq = "ACTG"
         expected_seq = "CAGT"
@@ -140,6 +161,25 @@ class TestFunctions(unittest.TestCase):
         input_vcf = ("X", 100, "SEQ", "GENE")
         self.assertRaises(ValueError, get_hgvs_from_vcf, *input_vcf, True)
 
+    def test_get_hgvs_from_vcf_batch(self):
+        rnd = random.Random(42)
+        alleles = ["A", "C", "G", "T", "N", "CT", "CTTTT", "ACGTN", "", "*", "<DEL>", "A\n", None]
+        rows = [("X", 100, "CT", "C"), ("1", "100", "CT", "CTTTT"), ("X", "one-hundred", "CT", "A")]
+        rows += [(rnd.choice(["1", "X", "MT"]), rnd.randint(1, 10 ** 8), rnd.choice(alleles), rnd.choice(alleles))
+                 for _ in range(2000)]
+        ids, var_types, starts, ends = get_hgvs_from_vcf_batch(*zip(*rows))
+        for row, hgvs, var_type, start, end in zip(rows, ids, var_types, starts, ends):
+            try:
+                expected = get_hgvs_from_vcf(*row, mutant_type=True)
+            except (TypeError, ValueError):
+                expected = (None, None)
+            self.assertEqual(expected, (hgvs, var_type), row)
+            if hgvs is not None and start is not None:
+                self.assertTrue(hgvs.split(".")[1].startswith(str(start)), row)
+        self.assertEqual((["chrX:g.101del"], ["del"], [101], [101]), get_hgvs_from_vcf_batch(["X"], [100], ["CT"], ["C"]))
+        self.assertEqual(([None], [None], [None], [None]), get_hgvs_from_vcf_batch(["X"], [100], ["*"], ["C"]))
+        self.assertRaises(ValueError, get_hgvs_from_vcf_batch, ["X"], [100, 101], ["A"], ["C"])
+
     def test_get_pos_start_end(self):
         input_vcf = ("X", "one-hundred", "A", "C")
         self.assertRaises(ValueError, get_pos_start_end, *input_vcf)
@@ -0,0 +1,73 @@
+import gzip
+import os
+import tempfile
+import unittest
+
+from utils import liftover
+from utils.liftover import LiftOver, normalize_chrom
+
+CHAIN = """\
+chain 1000 chr1 1000 + 100 300 chr1 2000 + 500 710 1
+50\t10\t20
+140
+
+chain 1000 chr2 1000 + 0 100 chr3 500 - 0 100 2
+100
+"""
+
+
+class TestLiftOver(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "test.over.chain.gz")
+            with gzip.open(path, "wt") as f:
+                f.write(CHAIN)
+            cls.lift = LiftOver.from_chain_file(path)
+
+    def test_normalize_chrom(self):
+        self.assertEqual("1", normalize_chrom("chr1"))
+        self.assertEqual("X", normalize_chrom("x"))
+        self.assertEqual("MT", normalize_chrom("chrM"))
+
+    def test_convert(self):
+        self.assertEqual(("1", 501, "+"), self.lift.convert("1", 101))
+        self.assertEqual(("1", 550, "+"), self.lift.convert("chr1", 150))
+        self.assertIsNone(self.lift.convert("1", 151))  # in a gap
+        self.assertEqual(("1", 571, "+"), self.lift.convert("1", 161))
+        self.assertIsNone(self.lift.convert("1", 301))
+        self.assertIsNone(self.lift.convert("1", 100))
+        self.assertIsNone(self.lift.convert("4", 100))
+
+    def test_reverse_strand(self):
+        self.assertEqual(("3", 500, "-"), self.lift.convert("2", 1))
+        self.assertEqual(("3", 401, "-"), self.lift.convert("2", 100))
+
+    def test_convert_many(self):
+        positions = [1, 101, 150, 151, 161, 300, 301]
+        expected = [self.lift.convert("1", position) for position in positions]
+        self.assertEqual(expected, self.lift.convert_many("1", positions))
+        self.assertEqual([None, None], self.lift.convert_many("4", [1, 2]))
+
+    def test_convert_many_without_numpy(self):
+        np, liftover.np = liftover.np, None
+        try:
+            self.assertEqual([("1", 501, "+"), None], self.lift.convert_many("1", [101, 151]))
+        finally:
+            liftover.np = np
+
+    def test_convert_interval(self):
+        self.assertEqual(("1", 501, 610), self.lift.convert_interval("1", 101, 200))
+        self.assertEqual(("3", 401, 500), self.lift.convert_interval("2", 1, 100))
+        self.assertIsNone(self.lift.convert_interval("1", 101, 155))
+
+    def test_convert_hgvs(self):
+        self.assertEqual("chr1:g.501G>A", self.lift.convert_hgvs("chr1:g.101G>A"))
+        self.assertEqual("chr3:g.500T>C", self.lift.convert_hgvs("chr2:g.1A>G"))
+        self.assertEqual("chr1:g.501_505del", self.lift.convert_hgvs("chr1:g.101_105del"))
+        self.assertEqual("chr1:g.501dup", self.lift.convert_hgvs("chr1:g.101dup"))
+        self.assertEqual("chr1:g.501_502insAT", self.lift.convert_hgvs("chr1:g.101_102insAT"))
+        self.assertIsNone(self.lift.convert_hgvs("chr1:g.149_161del"))  # spans a gap
+        self.assertIsNone(self.lift.convert_hgvs("chr2:g.1_2del"))  # reverse strand
+        self.assertIsNone(self.lift.convert_hgvs("chr1:g.151G>A"))
+        self.assertIsNone(self.lift.convert_hgvs("rs58991260"))
@@ -0,0 +1,74 @@
+import json
+import os
+import re
+import tempfile
+import unittest
+
+from utils.offline import OfflineAnnotator, OfflineStore, OfflineStoreWriter
+from web.dispatch import IDDispatcher
+
+DOCS = [
+    {"_id": "chr1:g.218631822G>A", "dbsnp": {"rsid": "rs58991260"}, "hg19": {"start": 218631822, "end": 218631822}},
+    {"_id": "chr1:g.218631822G>T", "dbsnp": {"rsid": "rs58991260"}},
+    {"_id": "chr8:g.7194707G>A", "cadd": {"phred": 8.6}},
+]
+PATTERNS = [
+    (re.compile(r"chr(.?)+", re.I), "_id"),
+    (re.compile(r"rs[0-9]+", re.I), "dbsnp.rsid"),
+    (re.compile(r"rcv[0-9\.]+", re.I), "clinvar.rcv.accession"),
+]
+
+
+class TestOfflineStore(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.folder.name, "myvariant_hg19.sqlite")
+        with OfflineStoreWriter(self.path, version="20240101", assembly="hg19", batch_size=2) as writer:
+            writer.update(DOCS)
+        self.store = OfflineStore(self.path)
+
+    def tearDown(self):
+        self.store.close()
+        self.folder.cleanup()
+
+    def test_store(self):
+        self.assertEqual(["myvariant_hg19.sqlite"], os.listdir(self.folder.name))
+        self.assertEqual(("20240101", "hg19", 3), (self.store.version, self.store.assembly, len(self.store)))
+        self.assertEqual(DOCS[2], self.store.get("chr8:g.7194707G>A"))
+        self.assertIsNone(self.store.get("chr8:g.7194707G>C"))
+        self.assertEqual({58991260: ["chr1:g.218631822G>A", "chr1:g.218631822G>T"]},
+                         self.store.rsid_ids([58991260, 1]))
+
+    def test_abort(self):
+        path = os.path.join(self.folder.name, "aborted.sqlite")
+        with self.assertRaises(KeyError):
+            with OfflineStoreWriter(path) as writer:
+                writer.add({})
+        self.assertEqual(["myvariant_hg19.sqlite"], os.listdir(self.folder.name))
+
+    def test_annotate(self):
+        annotator = OfflineAnnotator(self.store, IDDispatcher(PATTERNS))
+        lines = [json.loads(line) for line in annotator.annotate(
+            ["chr8:g.7194707G>A", "rs58991260", "RCV000000001", "chr8:g.7194707G>C"])]
+        self.assertEqual([
+            {"query": "chr8:g.7194707G>A", **DOCS[2]},
+            {"query": "rs58991260", **DOCS[0]},
+            {"query": "rs58991260", **DOCS[1]},
+            {"query": "RCV000000001", "notfound": True},
+            {"query": "chr8:g.7194707G>C", "notfound": True},
+        ], lines)
+
+    def test_annotate_vcf(self):
+        annotator = OfflineAnnotator(self.store, IDDispatcher(PATTERNS))
+        vcf = [
+            "##fileformat=VCFv4.2\n",
+            "#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n",
+            "chr1\t218631822\trs58991260\tG\tA,C\t.\t.\t.\n",
+            "not a record\n",
+        ]
+        records = [json.loads(line) for line in annotator.annotate_vcf(vcf)]
+        self.assertEqual({
+            "chrom": "chr1", "pos": 218631822, "id": "rs58991260", "ref": "G", "alt": ["A", "C"],
+            "hits": [DOCS[0], {"query": "chr1:g.218631822G>C", "notfound": True}],
+        }, records[0])
+        self.assertEqual("Invalid VCF record.", records[1]["error"])
@@ -0,0 +1,55 @@
+import os
+import tempfile
+import unittest
+
+from utils.rsidtable import RsidTable, parse_rsid, write_rsid_table
+
+
+class TestRsidTable(unittest.TestCase):
+    PAIRS = [
+        (1047781, "chr19:g.13207859C>T"),
+        (58991260, "chr1:g.218631822G>A"),
+        (1047781, "chr19:g.13207859C>A"),
+        (771931171, "chr8:g.7194707G>A"),
+        (1047781, "chr19:g.13207859C>T"),  # duplicated
+    ]
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.folder.name, "rsid_hg19.tbl")
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_lookup(self):
+        # chunk_size=2, also merges sorted runs
+        self.assertEqual(3, write_rsid_table(self.path, self.PAIRS, "20240101", chunk_size=2))
+        self.assertEqual(["rsid_hg19.tbl"], os.listdir(self.folder.name))
+
+        table = RsidTable(self.path)
+        self.assertEqual("20240101", table.version)
+        self.assertEqual(3, len(table))
+        self.assertEqual(["chr19:g.13207859C>A", "chr19:g.13207859C>T"], table.lookup(1047781))
+        self.assertEqual(["chr8:g.7194707G>A"], table.lookup(771931171))
+        self.assertEqual([], table.lookup(1))
+        self.assertEqual([], table.lookup(10 ** 12))
+        table.close()
+
+    def test_empty(self):
+        write_rsid_table(self.path, [], "20240101")
+        table = RsidTable(self.path)
+        self.assertEqual(0, len(table))
+        self.assertEqual([], table.lookup(1047781))
+        table.close()
+
+    def test_not_a_table(self):
+        with open(self.path, "wb") as f:
+            f.write(b"\0" * 128)
+        self.assertRaises(ValueError, RsidTable, self.path)
+
+    def test_parse_rsid(self):
+        self.assertEqual(58991260, parse_rsid("rs58991260"))
+        self.assertEqual(58991260, parse_rsid("RS58991260"))
+        self.assertEqual(58991260, parse_rsid("DBSNP:rs58991260"))
+        self.assertIsNone(parse_rsid("rs"))
+        self.assertIsNone(parse_rsid("chr1:g.218631822G>A"))
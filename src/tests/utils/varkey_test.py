@@ -0,0 +1,79 @@
+import random
+import unittest
+
+from utils.varkey import VariantKeySet, decode, encode, from_bytes, sort_key, to_bytes
+
+
+class TestVariantKeys(unittest.TestCase):
+    ENCODABLE = [
+        "chr1:g.35366C>T",
+        "chrX:g.1A>A",
+        "chrMT:g.16569G>C",
+        "chr1:g.268435455T>G",
+        "chr2:g.5del",
+        "chr2:g.5_20del",
+        "chr22:g.100_101insACGTACGTACGT",
+        "chrY:g.9delinsA",
+        "chrY:g.9_24delinsACGTACGTAC",
+    ]
+    NOT_ENCODABLE = [
+        "chr1:g.268435456T>G",  # start beyond 28 bits
+        "chrM:g.1A>G",
+        "chrUn_gl000220:g.1A>G",
+        "chr1:g.05A>G",
+        "chr1:g.5_5del",
+        "chr1:g.5_4del",
+        "chr1:g.5dup",
+        "chr1:g.5_7insA",
+        "chr1:g.5_6insN",
+        "chr1:g.5_6insACGTACGTACGTA",
+        "chr1:g.5_21delinsA",
+        "chr1:g.5delinsACGTACGTACG",
+        "chr1:g.5A>N",
+        "chr1:g.5a>g",
+        "rs58991260",
+    ]
+
+    def test_encode_decode(self):
+        for hgvs_id in self.ENCODABLE:
+            key = encode(hgvs_id)
+            self.assertIsInstance(key, int, hgvs_id)
+            self.assertTrue(0 <= key < 2 ** 63, hgvs_id)
+            self.assertEqual(hgvs_id, decode(key))
+            self.assertEqual(key, from_bytes(to_bytes(key)))
+        for hgvs_id in self.NOT_ENCODABLE:
+            self.assertIsNone(encode(hgvs_id), hgvs_id)
+
+    def test_decode_invalid(self):
+        self.assertRaises(ValueError, decode, 0)
+        self.assertRaises(ValueError, decode, 26 << 58 | 1 << 30)
+        self.assertRaises(ValueError, decode, encode("chr1:g.5C>T") | 1 << 4)
+        self.assertRaises(ValueError, decode, encode("chr1:g.5_6insA") & ~(15 << 24))
+
+    def test_order(self):
+        rnd = random.Random(0)
+        chroms = [str(i) for i in range(1, 23)] + ["X", "Y", "MT"]
+        variants = sorted({
+            (rank, rnd.randint(1, 10 ** 6), rnd.choice("ACGT"), rnd.choice("ACGT"))
+            for rank in range(len(chroms)) for _ in range(20)
+        })
+        ids = [f"chr{chroms[rank]}:g.{pos}{ref}>{alt}" for rank, pos, ref, alt in variants]
+        shuffled = ids[:]
+        rnd.shuffle(shuffled)
+        self.assertEqual(ids, [decode(key) for key in sorted(encode(_id) for _id in shuffled)])
+        self.assertEqual(ids, sorted(shuffled, key=lambda _id: to_bytes(encode(_id))))
+        self.assertEqual(ids + ["chrM:g.1A>G"], sorted(shuffled + ["chrM:g.1A>G"], key=sort_key))
+
+    def test_key_set(self):
+        ids = self.ENCODABLE + self.NOT_ENCODABLE
+        keys = VariantKeySet(ids + ids[:3])
+        self.assertEqual(len(ids), len(keys))
+        self.assertEqual(len(self.NOT_ENCODABLE), len(keys.others))
+        self.assertEqual(set(ids), set(keys))
+        self.assertTrue(all(_id in keys for _id in ids))
+        self.assertNotIn("chr1:g.35366C>A", keys)
+        keys.discard("chr1:g.35366C>T")
+        keys.discard("chrM:g.1A>G")
+        self.assertNotIn("chr1:g.35366C>T", keys)
+        self.assertNotIn("chrM:g.1A>G", keys)
+        self.assertEqual(len(ids) - 2, len(keys))
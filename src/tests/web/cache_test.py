@@ -0,0 +1,208 @@
+import asyncio
+import gzip
+import unittest
+from unittest import mock
+
+from web.cache import CachedResponse, LRUCache, IndexVersionTracker, MemoryStore, ResultCache, SingleFlight
+
+
+class TestLRUCache(unittest.TestCase):
+    def test_get_set(self):
+        cache = LRUCache(maxsize=2)
+        cache.set("a", 1)
+        self.assertEqual(1, cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual({"size": 1, "maxsize": 2, "hits": 1, "misses": 1}, cache.stats())
+
+    def test_eviction(self):
+        cache = LRUCache(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")  # "b" is now the least recently used
+        cache.set("c", 3)
+        self.assertEqual(1, cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(3, cache.get("c"))
+        self.assertEqual(2, len(cache))
+
+    def test_version(self):
+        cache = LRUCache()
+        cache.set("a", 1, version="20240101")
+        self.assertEqual(1, cache.get("a", "20240101"))
+        self.assertIsNone(cache.get("a", "20240202"))
+        # a stale entry is dropped
+        self.assertIsNone(cache.get("a", "20240101"))
+        self.assertEqual(0, len(cache))
+
+    def test_ttl(self):
+        cache = LRUCache(ttl=10)
+        with mock.patch("web.cache.time.monotonic", return_value=100):
+            cache.set("a", 1)
+        with mock.patch("web.cache.time.monotonic", return_value=105):
+            self.assertEqual(1, cache.get("a"))
+        with mock.patch("web.cache.time.monotonic", return_value=111):
+            self.assertIsNone(cache.get("a"))
+
+    def test_disabled(self):
+        cache = LRUCache(maxsize=0)
+        cache.set("a", 1)
+        self.assertIsNone(cache.get("a"))
+
+
+class TestIndexVersionTracker(unittest.TestCase):
+    @staticmethod
+    def client(*responses):
+        client = mock.Mock()
+        client.indices.get_mapping = mock.AsyncMock(side_effect=responses)
+        return client
+
+    def test_version(self):
+        client = self.client(
+            {"myvariant_20240101_hg19": {"mappings": {"_meta": {"build_version": "20240101"}}}},
+        )
+        tracker = IndexVersionTracker(ttl=60)
+        self.assertIsNone(tracker.peek("myvariant_current_hg19"))
+        self.assertEqual("20240101", asyncio.run(tracker.version(client, "myvariant_current_hg19")))
+        # memoized
+        self.assertEqual("20240101", asyncio.run(tracker.version(client, "myvariant_current_hg19")))
+        self.assertEqual(1, client.indices.get_mapping.await_count)
+        self.assertEqual("20240101", tracker.peek("myvariant_current_hg19"))
+
+    def test_refresh(self):
+        client = self.client(
+            {"idx_a": {"mappings": {"_meta": {"build_version": "20240101"}}}},
+            {"idx_b": {"mappings": {"_meta": {"build_version": "20240202"}}}},
+        )
+        tracker = IndexVersionTracker(ttl=0)
+        self.assertEqual("20240101", asyncio.run(tracker.version(client, "alias")))
+        self.assertEqual("20240202", asyncio.run(tracker.version(client, "alias")))
+
+    def test_no_version(self):
+        client = self.client({})
+        tracker = IndexVersionTracker()
+        self.assertIsNone(asyncio.run(tracker.version(client, "idx")))
+
+
+class TestSingleFlight(unittest.TestCase):
+    def test_coalesce(self):
+        flight = SingleFlight()
+        calls = []
+
+        async def search(q):
+            calls.append(q)
+            await asyncio.sleep(0.01)
+            return {"hits": [q]}
+
+        async def main():
+            return await asyncio.gather(
+                flight.do("a", search, "a"),
+                flight.do("a", search, "a"),
+                flight.do("b", search, "b"),
+            )
+
+        first, second, other = asyncio.run(main())
+        self.assertEqual(["a", "b"], calls)
+        self.assertEqual(first, second)
+        self.assertIsNot(first, second)  # each caller can modify its own copy
+        self.assertEqual({"hits": ["b"]}, other)
+        self.assertEqual(1, flight.coalesced)
+        self.assertEqual(0, len(flight))
+
+    def test_exception(self):
+        flight = SingleFlight()
+
+        async def search():
+            await asyncio.sleep(0.01)
+            raise ValueError()
+
+        async def main():
+            return await asyncio.gather(
+                flight.do("a", search), flight.do("a", search),
+                return_exceptions=True)
+
+        errors = asyncio.run(main())
+        self.assertTrue(all(isinstance(error, ValueError) for error in errors))
+
+    def test_cancelled_caller(self):
+        flight = SingleFlight()
+        calls = []
+
+        async def search():
+            calls.append(None)
+            await asyncio.sleep(0.01)
+            return "res"
+
+        async def main():
+            first = asyncio.ensure_future(flight.do("a", search))
+            second = asyncio.ensure_future(flight.do("a", search))
+            await asyncio.sleep(0)
+            first.cancel()
+            return await second
+
+        # the waiter makes the call itself
+        self.assertEqual("res", asyncio.run(main()))
+        self.assertEqual(2, len(calls))
+
+
+class TestCachedResponse(unittest.TestCase):
+    def test_response(self):
+        response = CachedResponse('{"took":1}')
+        self.assertEqual(b'{"took":1}', response.body)
+        self.assertEqual(10, len(response))
+        gzipped, _ = response.encode("gzip")
+        self.assertEqual(response.body, gzip.decompress(gzipped))
+        self.assertIs(gzipped, response.encode("gzip")[0])  # compressed once
+
+    def test_etag(self):
+        body, etag = CachedResponse(b"{}").encode()
+        self.assertEqual(b"{}", body)
+        self.assertTrue(etag.startswith('"') and etag.endswith('"'))
+        self.assertEqual(etag, CachedResponse("{}").encode()[1])
+        self.assertNotEqual(etag, CachedResponse("[]").encode()[1])
+        self.assertNotEqual(etag, CachedResponse("{}").encode("gzip")[1])
+
+
+class TestResultCache(unittest.TestCase):
+    RESPONSE = {"hits": {"total": {"value": 1}, "hits": [{"_id": "chr1:g.35366C>T"}]}}
+
+    def test_local(self):
+        cache = ResultCache(maxsize=2)
+
+        async def main():
+            self.assertIsNone(await cache.get("q", "20240101"))
+            await cache.set("q", "20240101", self.RESPONSE)
+            first = await cache.get("q", "20240101")
+            first["hits"]["hits"].clear()  # as the formatters do
+            return first, await cache.get("q", "20240101"), await cache.get("q", "20240202")
+
+        first, second, stale = asyncio.run(main())
+        self.assertEqual(self.RESPONSE, second)
+        self.assertIsNone(stale)
+        self.assertEqual(2, cache.stats()["hits"])
+
+    def test_shared(self):
+        store = MemoryStore()
+        node_a, node_b = ResultCache(shared=store), ResultCache(shared=store)
+
+        async def main():
+            await node_a.set("q", "20240101", self.RESPONSE)
+            return await node_b.get("q", "20240101"), await node_b.get("q", "20240202")
+
+        response, stale = asyncio.run(main())
+        self.assertEqual(self.RESPONSE, response)
+        self.assertIsNone(stale)
+        self.assertEqual(1, node_b.stats()["shared_hits"])
+
+    def test_shared_unavailable(self):
+        store = mock.Mock()
+        store.get = mock.AsyncMock(side_effect=ConnectionError())
+        store.set = mock.AsyncMock(side_effect=ConnectionError())
+        cache = ResultCache(maxsize=0, shared=store)
+
+        async def main():
+            await cache.set("q", "20240101", self.RESPONSE)
+            return await cache.get("q", "20240101")
+
+        with self.assertLogs("web.cache", "WARNING"):
+            self.assertIsNone(asyncio.run(main()))
+        self.assertEqual(2, cache.stats()["shared_errors"])
@@ -0,0 +1,98 @@
+import random
+import re
+import unittest
+
+from web.dispatch import IDDispatcher
+
+# as built in config_web.ANNOTATION_ID_REGEX_LIST
+PATTERNS = [
+    (re.compile(r"(DBSNP):(?P<term>(DBSNP:rs[0-9]+|rs[0-9]+))", re.I), "dbsnp.rsid"),
+    (re.compile(r"(CLINVAR):(?P<term>(CLINVAR:[0-9]+|[0-9]+))", re.I), "clinvar.variant_id"),
+    (re.compile(r"(CAID):(?P<term>(CAID:CA[0-9]+|CA[0-9]+))", re.I), "clingen.caid"),
+    (re.compile(r"chr(.?)+", re.I), "_id"),
+    (re.compile(r"rs[0-9]+", re.I), "dbsnp.rsid"),
+    (re.compile(r"rcv[0-9\.]+", re.I), "clinvar.rcv.accession"),
+    (re.compile(r"var_[0-9]+", re.I), "uniprot.humsavar.ftid"),
+]
+DEFAULT_SCOPES = ["_id", "clingen.caid"]
+
+
+def sequential_parse(q, patterns=PATTERNS, default_scopes=DEFAULT_SCOPES):
+    # what the framework query string parser does
+    for regex, scopes in patterns:
+        match = re.fullmatch(regex, q)
+        if match:
+            named_groups = match.groupdict()
+            scopes = [scopes] if isinstance(scopes, str) else scopes
+            scope = named_groups.get("scope")
+            return named_groups.get("term") or q, [scope] if scope else scopes or default_scopes
+    return q, default_scopes
+
+
+class TestIDDispatcher(unittest.TestCase):
+    IDS = [
+        "chr8:g.7194707G>A", "CHRX:g.30718532C>T", "rs58991260", "RS58991260",
+        "DBSNP:rs58991260", "dbsnp:DBSNP:rs1", "CLINVAR:12345", "clinvar:CLINVAR:1",
+        "CAID:CA123", "caid:CA1", "RCV000665743", "rcv000665743.2", "VAR_062998",
+        "var_062998", "CA123", "12345", "rs", "DBSNP:foo", "", "chr", "varx_1",
+    ]
+
+    def test_parse(self):
+        dispatcher = IDDispatcher(PATTERNS, DEFAULT_SCOPES)
+        self.assertIsNotNone(dispatcher.regex)
+        for q in self.IDS:
+            self.assertEqual(sequential_parse(q), tuple(dispatcher.parse(q)), q)
+
+    def test_parse_random(self):
+        dispatcher = IDDispatcher(PATTERNS, DEFAULT_SCOPES)
+        rnd = random.Random(0)
+        for _ in range(2000):
+            prefix = rnd.choice(["", "chr", "rs", "rcv", "var_", "DBSNP:", "CLINVAR:", "CAID:", "CA"])
+            q = prefix + "".join(rnd.choice("0123456789.:_aArRsSCcgG>") for _ in range(rnd.randint(0, 6)))
+            self.assertEqual(sequential_parse(q), tuple(dispatcher.parse(q)), q)
+
+    def test_scope_group(self):
+        patterns = [
+            (r"(?P<scope>[a-z]+\.[a-z]+):(?P<term>.+)", []),
+            (r"(?P<term>\d+)", "entrezgene"),
+            (r"g(?P<term>\d+)", []),
+        ]
+        dispatcher = IDDispatcher(patterns)
+        self.assertEqual(("1017", ["dbsnp.rsid"]), dispatcher.parse("dbsnp.rsid:1017"))
+        self.assertEqual(("1017", ["entrezgene"]), dispatcher.parse("1017"))
+        # no scope, the default scopes
+        self.assertEqual(("1017", ("_id",)), dispatcher.parse("g1017"))
+        self.assertEqual(("x", ("_id",)), dispatcher.parse("x"))
+
+    def test_fallback(self):
+        # a numbered backreference can't be combined
+        patterns = [(r"(a)\1", "aa"), (r"(?P<term>a+)", "a")]
+        dispatcher = IDDispatcher(patterns)
+        self.assertIsNone(dispatcher.regex)
+        self.assertEqual(("aa", ["aa"]), dispatcher.parse("aa"))
+        self.assertEqual(("aaa", ["a"]), dispatcher.parse("aaa"))
+
+    def test_classify(self):
+        dispatcher = IDDispatcher(PATTERNS, DEFAULT_SCOPES)
+        groups = dispatcher.classify(["rs1", "chr1:g.1A>T", "DBSNP:rs2", "CA1"])
+        self.assertEqual({
+            ("dbsnp.rsid",): [(0, "rs1"), (2, "rs2")],
+            ("_id",): [(1, "chr1:g.1A>T")],
+            ("_id", "clingen.caid"): [(3, "CA1")],
+        }, groups)
+
+    def test_batch(self):
+        dispatcher = IDDispatcher(PATTERNS, DEFAULT_SCOPES)
+        with dispatcher.batch(["rs1"]):
+            self.assertEqual(("rs1", ["dbsnp.rsid"]), dispatcher.parse("rs1"))
+            self.assertEqual(1, len(dispatcher._batch))
+        self.assertEqual({}, dispatcher._batch)
+
+    def test_metadata_fields(self):
+        patterns = [(r"(?P<scope>[^:]+):(?P<term>[\W\w]+)", ())]
+        dispatcher = IDDispatcher(patterns, fields=lambda metadata: metadata)
+        self.assertEqual(("1017", ["dbsnp.rsid"]), dispatcher.parse("dbsnp.rsid:1017", {"dbsnp.rsid"}))
+        self.assertEqual(("foo:1017", ("_id",)), dispatcher.parse("foo:1017", {"dbsnp.rsid"}))
+        self.assertEqual(("1017", ["foo"]), dispatcher.parse("foo:1017"))
+        with dispatcher.batch(["foo:1017"], {"dbsnp.rsid"}):
+            self.assertEqual(("foo:1017", ("_id",)), dispatcher.parse("foo:1017", {"dbsnp.rsid"}))
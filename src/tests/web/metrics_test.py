@@ -0,0 +1,24 @@
+import unittest
+
+from web.metrics import Histogram, Metrics
+
+
+class TestMetrics(unittest.TestCase):
+    def test_histogram(self):
+        histogram = Histogram(bounds=(1, 10))
+        for value in (0.5, 1, 3, 12):
+            histogram.observe(value)
+        self.assertEqual(
+            {"count": 4, "sum": 16.5, "buckets": {"1": 2, "10": 3, "+Inf": 4}},
+            histogram.snapshot())
+
+    def test_snapshot(self):
+        metrics = Metrics()
+        metrics.incr("hits")
+        metrics.incr("hits", 2)
+        metrics.register("size", lambda: 42)
+        metrics.observe("timing.es", 3)
+        snapshot = metrics.snapshot()
+        self.assertEqual(3, snapshot["hits"])
+        self.assertEqual(42, snapshot["size"])
+        self.assertEqual(1, snapshot["timing.es"]["count"])
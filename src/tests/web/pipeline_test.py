@@ -0,0 +1,148 @@
+import asyncio
+import os
+import tempfile
+import types
+import unittest
+
+try:
+    from biothings.web.applications import BiothingsAPI
+    from biothings.web.query.pipeline import AsyncESQueryPipeline, QueryPipelineException
+    from biothings.web.settings.configs import ConfigModule
+    import config_web
+    from web.pipeline import IdSearch, MVQueryBackend, MVQueryBuilder, MVResultFormatter
+except ImportError:  # the web requirements, see requirements_web.txt
+    AsyncESQueryPipeline = None
+
+from utils.bloom import BloomFilter
+from utils.rsidtable import write_rsid_table
+from web.metrics import metrics
+
+
+class Client:
+    """An ES client answering mget and mapping requests, failing on searches."""
+
+    def __init__(self, ids=(), version="20240101"):
+        self.ids = set(ids)
+        self.version = version
+        self.indices = self
+        self.mgets = []
+
+    async def get_mapping(self, index, **kwargs):
+        return {index: {"mappings": {"_meta": {"build_version": self.version}}}}
+
+    async def mget(self, index, body, **params):
+        self.mgets.append((body["docs"], params))
+        return {"docs": [
+            {"_index": index, "_id": doc["_id"], "_version": 1, "found": True, "_source": {"_id": doc["_id"]}}
+            if doc["_id"] in self.ids else {"_index": index, "_id": doc["_id"], "found": False}
+            for doc in body["docs"]
+        ]}
+
+    async def search(self, **kwargs):
+        raise AssertionError("unexpected search request")
+
+    async def msearch(self, **kwargs):
+        raise AssertionError("unexpected _msearch request")
+
+
+@unittest.skipIf(AsyncESQueryPipeline is None, "the web requirements are not installed")
+class TestPipeline(unittest.TestCase):
+    INDEX = "mvtest_pipeline"
+
+    def pipeline(self, client, **settings):
+        """The query pipeline of an application, with config_web `settings`."""
+        config = {key: getattr(config_web, key) for key in dir(config_web) if key.isupper()}
+        config = types.SimpleNamespace(**{**config, **settings})
+        # as biothings.web.services.namespace creates it
+        builder = MVQueryBuilder(
+            None, config.ANNOTATION_ID_REGEX_LIST, config.ANNOTATION_DEFAULT_SCOPES)
+        backend = MVQueryBackend(client, {None: self.INDEX, "hg38": self.INDEX + "_hg38"}, "1m", 1000)
+        builder.configure(config)
+        backend.configure(config)
+        return AsyncESQueryPipeline(builder, backend, MVResultFormatter())
+
+    def test_app_pipeline(self):
+        pipeline = BiothingsAPI.get_app(ConfigModule(config_web)).biothings.pipeline
+        self.assertIsInstance(pipeline.builder, MVQueryBuilder)
+        self.assertIsInstance(pipeline.backend, MVQueryBackend)
+        self.assertIsInstance(pipeline.formatter, MVResultFormatter)
+
+    def test_build_id_search(self):
+        builder = self.pipeline(Client()).builder
+        search = builder.build("chr1:g.35366C>T", autoscope=True, version=True, size=1001)
+        self.assertIsInstance(search, IdSearch)
+        self.assertEqual("chr1:g.35366C>T", search.hgvs_id)
+        searches = builder.build(["chr1:g.35366C>T", "CA123"], scopes=["_id"])._searches
+        self.assertTrue(all(isinstance(search, IdSearch) for search in searches))
+
+    def test_batch_mget(self):
+        client = Client(["chr1:g.35366C>T"])
+        pipeline = self.pipeline(client, BATCH_MGET=True)
+        ids = ["chr1:g.35366C>T", "chr2:g.1A>G"]
+        result = asyncio.run(pipeline.fetch(ids))
+        self.assertEqual(1, len(client.mgets))
+        self.assertEqual(ids, [doc["_id"] for doc in client.mgets[0][0]])
+        self.assertEqual("chr1:g.35366C>T", result[0]["_id"])
+        self.assertEqual(1, result[0]["_version"])
+        self.assertTrue(result[1]["notfound"])
+        self.assertGreaterEqual(metrics.snapshot()["batch_mget.ids"], 2)
+
+    def test_rsid_lookup(self):
+        client = Client(["chr1:g.218631822G>A", "chr1:g.218631822G>T"])
+        with tempfile.TemporaryDirectory() as folder:
+            write_rsid_table(os.path.join(folder, "rsid_hg19.tbl"), [
+                (58991260, "chr1:g.218631822G>A"), (58991260, "chr1:g.218631822G>T")
+            ], client.version)
+            pipeline = self.pipeline(client, RSID_TABLES=folder)
+            result = asyncio.run(pipeline.fetch("rs58991260"))
+            self.assertEqual(["chr1:g.218631822G>A", "chr1:g.218631822G>T"], [hit["_id"] for hit in result])
+            result = asyncio.run(pipeline.fetch(["dbsnp.rsid:rs58991260", "rs1"]))
+        # the rsids resolved by the table, absent ones included, are not searched
+        self.assertEqual(["dbsnp.rsid:rs58991260"] * 2 + ["rs1"], [hit["query"] for hit in result])
+        self.assertTrue(result[2]["notfound"])
+        self.assertEqual(2, len(client.mgets))
+
+    def test_id_filter(self):
+        client = Client()
+        with tempfile.TemporaryDirectory() as folder:
+            bloom = BloomFilter.create(100, version=client.version)
+            bloom.add("chr1:g.35366C>T")
+            bloom.save(os.path.join(folder, "ids_hg19.bloom"))
+            pipeline = self.pipeline(client, ID_FILTERS=folder)
+            hits = metrics.snapshot().get("id_filter.hits", 0)
+            # absent ids are answered without any request to ES
+            with self.assertRaises(QueryPipelineException) as raised:
+                asyncio.run(pipeline.fetch("chr2:g.1A>G"))
+            self.assertEqual(404, raised.exception.code)
+            result = asyncio.run(pipeline.search(["chr2:g.1A>G", "chr3:g.1A>G"], scopes=["_id"]))
+        self.assertTrue(all(hit["notfound"] for hit in result))
+        self.assertEqual(hits + 3, metrics.snapshot()["id_filter.hits"])
+
+    def test_routing(self):
+        client = Client(["chr1:g.35366C>T"])
+        pipeline = self.pipeline(client, CHROM_ROUTING=True, BATCH_MGET=True)
+        search = pipeline.builder.build("chr1:g.35366C>T", autoscope=True, version=True, size=1001)
+        self.assertEqual("1", search._params["routing"])
+        searches = pipeline.builder.build(["chrX:g.1A>G", "rs1"], autoscope=True)._searches
+        self.assertEqual("X", searches[0]._params["routing"])
+        self.assertNotIn("routing", searches[1]._params)
+        asyncio.run(pipeline.fetch(["chr1:g.35366C>T", "chrMT:g.1A>G"]))
+        self.assertEqual([{"_id": "chr1:g.35366C>T", "routing": "1"}, {"_id": "chrMT:g.1A>G", "routing": "MT"}],
+                         client.mgets[0][0])
+
+    def test_region_error(self):
+        formatter = self.pipeline(Client()).formatter
+        hit = {"_id": "chr1:g.35366C>T", "_score": 1.0, "_source": {}}
+        error = {"type": "search_phase_execution_exception", "reason": "all shards failed"}
+        responses = [
+            {"hits": {"total": {"value": 1}, "max_score": 1.0, "hits": [hit]}},
+            {"error": error, "status": 400},
+        ]
+        # one failed region does not fail the others
+        result = formatter.transform_regions(["chr1:35366", "chr2:1-10"], responses)
+        self.assertEqual("chr1:35366", result[0]["query"])
+        self.assertEqual(["chr1:g.35366C>T"], [hit["_id"] for hit in result[0]["hits"]])
+        self.assertEqual({"query": "chr2:1-10", "error": "all shards failed", "success": False}, result[1])
+        result = formatter.transform_regions(["chr1:35366", "chr2:1-10"], responses[1:], combine=True)
+        self.assertEqual(["chr1:35366", "chr2:1-10"], [res["query"] for res in result])
+        self.assertTrue(all(res["success"] is False for res in result))
@@ -0,0 +1,40 @@
+import os
+import tempfile
+import unittest
+
+from utils.rsidtable import write_rsid_table
+from web.rsid import RsidResolver
+
+
+class TestRsidResolver(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def write(self, assembly, pairs, version):
+        write_rsid_table(os.path.join(self.folder.name, f"rsid_{assembly}.tbl"), pairs, version)
+
+    def test_resolve(self):
+        self.write("hg19", [(58991260, "chr1:g.218631822G>A")], "20240101")
+        resolver = RsidResolver(self.folder.name)
+        self.assertEqual(["chr1:g.218631822G>A"], resolver.resolve(58991260, "hg19", "20240101"))
+        self.assertEqual([], resolver.resolve(1, "hg19", "20240101"))
+
+    def test_fallback(self):
+        self.write("hg19", [(58991260, "chr1:g.218631822G>A")], "20240101")
+        resolver = RsidResolver(self.folder.name)
+        # stale table
+        self.assertIsNone(resolver.resolve(58991260, "hg19", "20240202"))
+        self.assertIsNone(resolver.resolve(58991260, "hg19", None))
+        # missing table
+        self.assertIsNone(resolver.resolve(58991260, "hg38", "20240101"))
+
+    def test_reload(self):
+        self.write("hg19", [(58991260, "chr1:g.218631822G>A")], "20240101")
+        resolver = RsidResolver(self.folder.name, check_interval=0)
+        self.assertIsNotNone(resolver.resolve(58991260, "hg19", "20240101"))
+        self.write("hg19", [(58991260, "chr1:g.218631822G>T")], "20240202")
+        os.utime(os.path.join(self.folder.name, "rsid_hg19.tbl"), (0, 0))  # a different mtime
+        self.assertEqual(["chr1:g.218631822G>T"], resolver.resolve(58991260, "hg19", "20240202"))
@@ -0,0 +1,84 @@
+"""
+UCSC-style hierarchical genomic bins.
+
+A variant is assigned the smallest bin that fully contains it. Bins come in
+five levels of 128kb, 1Mb, 8Mb, 64Mb and 512Mb, so any interval overlaps a
+small, fixed set of bins, which ES can filter on with a single terms query
+before checking the exact start/end ranges.
+
+See Kent et al. (2002) "The Human Genome Browser at UCSC", and
+http://genomewiki.ucsc.edu/index.php/Bin_indexing_system
+"""
+
+# offsets of the first bin of each level, from the smallest bins to the largest
+BIN_OFFSETS = (512 + 64 + 8 + 1, 64 + 8 + 1, 8 + 1, 1, 0)
+BIN_FIRST_SHIFT = 17  # the smallest bins span 2^17 = 128kb
+BIN_NEXT_SHIFT = 3  # each level is 2^3 = 8 times larger than the previous one
+BIN_MAX_POSITION = 1 << (BIN_FIRST_SHIFT + BIN_NEXT_SHIFT * (len(BIN_OFFSETS) - 1))
+
+
+def _zero_based(start, end):
+    """1-based inclusive coordinates -> 0-based, half open ones"""
+    start, end = int(start), int(end)
+    if end < start:
+        start, end = end, start
+    if start < 1 or end > BIN_MAX_POSITION:
+        raise ValueError("Position out of binning range: {}".format((start, end)))
+    return start - 1, end
+
+
+def bin_from_range(start, end):
+    """
+    Return the bin of the 1-based, inclusive interval [start, end],
+    as positions are stored in the "hg19"/"hg38" fields.
+    """
+    start, end = _zero_based(start, end)
+    start_bin = start >> BIN_FIRST_SHIFT
+    end_bin = (end - 1) >> BIN_FIRST_SHIFT
+    for offset in BIN_OFFSETS:
+        if start_bin == end_bin:
+            return offset + start_bin
+        start_bin >>= BIN_NEXT_SHIFT
+        end_bin >>= BIN_NEXT_SHIFT
+    raise ValueError("Position out of binning range: {}".format((start, end)))
+
+
+def bin_from_positions(positions):
+    """
+    Return the bin of the "hg19"/"hg38" field of a variant: a {"start", "end"}
+    position, or a list of them, from sources which disagree, binned as their
+    union. Positions out of the binning range get bin 0, which every binned
+    query matches. Return None if there is no position with a start and end.
+    """
+    if isinstance(positions, dict):
+        positions = [positions]
+    if not isinstance(positions, list):
+        return None
+    bounds = []
+    for position in positions:
+        try:
+            bounds.extend((int(position["start"]), int(position["end"])))
+        except (KeyError, TypeError, ValueError):
+            continue
+    if not bounds:
+        return None
+    try:
+        return bin_from_range(min(bounds), max(bounds))
+    except ValueError:
+        return 0
+
+
+def overlapping_bins(start, end):
+    """
+    Return the list of all the bins a variant overlapping the 1-based,
+    inclusive interval [start, end] can be assigned to.
+    """
+    start, end = _zero_based(start, end)
+    start_bin = start >> BIN_FIRST_SHIFT
+    end_bin = (end - 1) >> BIN_FIRST_SHIFT
+    bins = []
+    for offset in BIN_OFFSETS:
+        bins.extend(range(offset + start_bin, offset + end_bin + 1))
+        start_bin >>= BIN_NEXT_SHIFT
+        end_bin >>= BIN_NEXT_SHIFT
+    return bins
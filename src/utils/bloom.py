@@ -0,0 +1,111 @@
+"""
+Bloom filter of variant _ids.
+
+Tells whether an id is definitely not in a set, with no false negatives and
+a configurable rate of false positives. The hub builds one per assembly
+from the ids exported on publish, the web nodes use it to answer lookups of
+absent ids without querying ES.
+
+File layout, integers are little-endian unsigned 64-bit:
+
+    header   magic (8 bytes), bits m, hashes k, ids n, build version (48 bytes)
+    bits     ceil(m / 8) bytes
+"""
+import hashlib
+import math
+import mmap
+import os
+import struct
+import tempfile
+
+MAGIC = b"MVBLOOM1"
+HEADER = struct.Struct("<8sQQQ48s")
+
+
+def optimal_size(capacity, error_rate):
+    """Return the number of bits and hashes of a filter of `capacity` items at `error_rate`."""
+    if not 0 < error_rate < 1:
+        raise ValueError(f"Invalid error rate: {error_rate}")
+    capacity = max(capacity, 1)
+    bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+    hashes = max(1, round(bits / capacity * math.log(2)))
+    return bits, hashes
+
+
+class BloomFilter:
+
+    def __init__(self, bits, hashes, count=0, version=None, data=None):
+        self.bits = bits
+        self.hashes = hashes
+        self.count = count
+        self.version = version
+        self._data = bytearray((bits + 7) // 8) if data is None else data
+        self._mmap = None
+
+    @classmethod
+    def create(cls, capacity, error_rate=0.001, version=None):
+        bits, hashes = optimal_size(capacity, error_rate)
+        return cls(bits, hashes, version=version)
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        # Kirsch-Mitzenmacher: k hashes out of two
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def add(self, item):
+        data = self._data
+        for position in self._positions(item):
+            data[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def update(self, items):
+        for item in items:
+            self.add(item)
+
+    def __contains__(self, item):
+        """False if `item` was definitely not added."""
+        data = self._data
+        for position in self._positions(item):
+            if not data[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def error_rate(self):
+        """The expected false positive rate, given the number of items added."""
+        return (1 - math.exp(-self.hashes * self.count / self.bits)) ** self.hashes
+
+    def save(self, path):
+        """Write the filter to `path`, atomically."""
+        version = str(self.version or "").encode()
+        if len(version) > 48:
+            raise ValueError(f"Version too long: {version}")
+        folder = os.path.dirname(os.path.abspath(path))
+        with tempfile.NamedTemporaryFile("wb", dir=folder, delete=False, suffix=".bloom") as f:
+            try:
+                f.write(HEADER.pack(MAGIC, self.bits, self.hashes, self.count, version))
+                f.write(self._data)
+            except BaseException:
+                os.remove(f.name)
+                raise
+        os.replace(f.name, path)
+
+    @classmethod
+    def load(cls, path):
+        """Open a filter written by save(), read through mmap."""
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, bits, hashes, count, version = HEADER.unpack_from(mapped)
+        if magic != MAGIC or len(mapped) != HEADER.size + (bits + 7) // 8:
+            mapped.close()
+            raise ValueError(f"Not a bloom filter: {path}")
+        bloom = cls(bits, hashes, count, version.rstrip(b"\0").decode() or None, memoryview(mapped)[HEADER.size:])
+        bloom._mmap = mapped
+        return bloom
+
+    def close(self):
+        if self._mmap is not None:
+            self._data.release()
+            self._mmap.close()
+            self._mmap = None
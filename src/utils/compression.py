@@ -0,0 +1,135 @@
+"""
+HTTP content encodings: gzip, and zstd and brotli when their optional
+packages, zstandard and brotli, are installed.
+
+Responses are compressed with the encoding the client prefers among the
+ones enabled, see negotiate(), either at once with compress(), or chunk by
+chunk, for streamed responses, with a compressor().
+"""
+import gzip
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # no zstd encoding
+    zstandard = None
+
+try:
+    import brotli
+except ImportError:  # no br encoding
+    brotli = None
+
+# by server preference
+ENCODINGS = tuple(encoding for encoding, available in (
+    ("zstd", zstandard is not None),
+    ("br", brotli is not None),
+    ("gzip", True),
+) if available)
+
+# levels of the payloads compressed once and sent many times
+PRECOMPRESS_LEVELS = {"zstd": 19, "br": 11, "gzip": 9}
+
+
+def parse_accept_encoding(header):
+    """Return {encoding: q} of an Accept-Encoding header."""
+    accepted = {}
+    for item in header.split(","):
+        encoding, _, params = item.strip().partition(";")
+        encoding = encoding.strip().lower()
+        if not encoding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[encoding] = q
+    return accepted
+
+
+def negotiate(header, encodings=ENCODINGS):
+    """
+    Return the encoding of `encodings` to send a response in, given the
+    Accept-Encoding `header` of the request, None to send it as is.
+    The client preference, by q-value, comes first, then the order of `encodings`.
+    """
+    if not header:
+        return None
+    accepted = parse_accept_encoding(header)
+    default = accepted.get("*", 0.0)
+    best, best_q = None, 0.0
+    for encoding in encodings:
+        q = accepted.get(encoding, default)
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class _GzipCompressor:
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class _ZstdCompressor:
+    def __init__(self, level):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+class _BrotliCompressor:
+    def __init__(self, level):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+COMPRESSORS = {"gzip": _GzipCompressor, "zstd": _ZstdCompressor, "br": _BrotliCompressor}
+
+
+def compressor(encoding, level):
+    """
+    Return a streaming compressor: compress(data) returns compressed data
+    as it comes, flush() all the data given so far, so that it can be sent,
+    and finish() the end of the stream.
+    """
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Unsupported encoding: {encoding}")
+    return COMPRESSORS[encoding](level)
+
+
+def compress(data, encoding, level):
+    """Compress `data` with `encoding` at once."""
+    if encoding == "gzip":
+        return gzip.compress(data, level, mtime=0)
+    if encoding == "zstd" and zstandard is not None:
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    if encoding == "br" and brotli is not None:
+        return brotli.compress(data, quality=level)
+    raise ValueError(f"Unsupported encoding: {encoding}")
@@ -0,0 +1,124 @@
+"""
+Gene symbol -> genomic regions table.
+
+The region of a gene is the extent of the variants annotated with its symbol
+in one of the GENE_FIELDS, one region per chromosome. The hub collects them
+while merging a build (see hub.databuild.builder.chrom_worker) and exports
+the table of each assembly on publish, the web nodes use it to restrict gene
+queries to the regions of the gene (see the GENE_TABLES setting of config_web).
+
+The table is a JSON file:
+
+    {"version": "<build version>", "genes": {"BTK": [["X", 100604435, 100641212]], ...}}
+"""
+import json
+import os
+import tempfile
+from typing import Dict, List, Optional, Tuple
+
+# the fields holding the gene symbols of a variant, lowercase normalized keywords
+GENE_FIELDS = ("dbnsfp.genename", "dbsnp.gene.symbol", "snpeff.ann.genename")
+
+
+def _values(doc, path):
+    """Values of the dotted `path` in `doc`, through lists."""
+    values = [doc]
+    for key in path.split("."):
+        found = []
+        for value in values:
+            if isinstance(value, dict) and key in value:
+                value = value[key]
+                found.extend(value if isinstance(value, list) else [value])
+        values = found
+    return values
+
+
+def gene_symbols(doc, fields=GENE_FIELDS):
+    """Return the set of gene symbols of a merged doc, upper case."""
+    return {value.strip().upper() for field in fields for value in _values(doc, field)
+            if isinstance(value, str) and value.strip()}
+
+
+class GeneRegions:
+    """Collect the extent of the variants of each gene, per chromosome."""
+
+    def __init__(self):
+        self.genes = {}  # symbol -> {chrom: [start, end]}
+
+    def __len__(self):
+        return len(self.genes)
+
+    def add(self, symbol, chrom, start, end):
+        regions = self.genes.setdefault(symbol, {})
+        region = regions.get(chrom)
+        if region is None:
+            regions[chrom] = [start, end]
+        else:
+            region[0] = min(region[0], start)
+            region[1] = max(region[1], end)
+
+    def add_doc(self, doc, chrom, assembly):
+        """Add the position of a merged doc, {"<assembly>": {"start": ..., "end": ...}}, to its genes."""
+        position = doc.get(assembly)
+        if not chrom or type(position) != dict:
+            return
+        try:
+            start, end = int(position["start"]), int(position["end"])
+        except (KeyError, TypeError, ValueError):
+            return
+        for symbol in gene_symbols(doc):
+            self.add(symbol, chrom, start, end)
+
+    def update(self, other):
+        """Merge the regions of another GeneRegions, or of its `genes`."""
+        genes = other.genes if isinstance(other, GeneRegions) else other
+        for symbol, regions in genes.items():
+            for chrom, (start, end) in regions.items():
+                self.add(symbol, chrom, start, end)
+
+
+class GeneTable:
+
+    def __init__(self, genes: Dict[str, List[Tuple[str, int, int]]], version=None):
+        self.genes = genes
+        self.version = version
+
+    @classmethod
+    def from_regions(cls, regions: GeneRegions, version=None):
+        return cls({
+            symbol: sorted((chrom, start, end) for chrom, (start, end) in chroms.items())
+            for symbol, chroms in regions.genes.items()
+        }, version)
+
+    def __len__(self):
+        return len(self.genes)
+
+    def __contains__(self, symbol):
+        return symbol.upper() in self.genes
+
+    def lookup(self, symbol) -> Optional[List[Tuple[str, int, int]]]:
+        """Return the (chrom, start, end) regions of a gene symbol, or None if it is unknown."""
+        return self.genes.get(symbol.upper())
+
+    def save(self, path):
+        """Write the table to `path`, atomically."""
+        folder = os.path.dirname(os.path.abspath(path))
+        with tempfile.NamedTemporaryFile("w", dir=folder, delete=False, suffix=".json") as f:
+            try:
+                json.dump({"version": self.version, "genes": self.genes}, f, separators=(",", ":"))
+            except BaseException:
+                os.remove(f.name)
+                raise
+        os.replace(f.name, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            try:
+                data = json.load(f)
+                genes = {symbol: [tuple(region) for region in regions]
+                         for symbol, regions in data["genes"].items()}
+            except (ValueError, KeyError, TypeError, AttributeError):
+                raise ValueError(f"Not a gene table: {path}")
+        version = data.get("version")
+        return cls(genes, str(version) if version is not None else None)
@@ -0,0 +1,328 @@
+"""
+Reference genome, 2 bits per base, read through mmap.
+
+Replaces the pickled dicts of per-chromosome bitarrays (4 bits per base, see
+utils.validate.get_genome_in_bit), which every process had to load whole in
+memory. The file is mapped read-only: a base is read from the page holding
+it, and all the processes reading a genome share the page cache.
+
+Bases other than A, C, G and T, mostly runs of N, are stored as A in the
+packed sequence and listed in a few runs, overriding it.
+
+File layout, integers are little-endian unsigned:
+
+    header    magic (8 bytes), number of chromosomes, offset of the index (64-bit)
+    per chromosome, from offset 16, 8-byte aligned:
+        bases ceil(length / 4) bytes, 4 bases per byte, the first one in the high bits
+        runs  start, end (0-based, end excluded, 32-bit), base (1 byte), 3 bytes of padding
+    index     per chromosome: name (16 bytes), length, offset of the bases,
+              offset of the runs, number of runs (64-bit)
+
+Converters are from_fasta() and from_bitarrays(), from_pickle() for the
+downloaded "<assembly>_genome.pyobj" files:
+
+    python -m utils.genome hg19_genome.pyobj hg19_genome.mvgenome
+"""
+import gzip
+import mmap
+import os
+import re
+import struct
+import tempfile
+from bisect import bisect_right
+from typing import Dict, Iterable, Iterator, Tuple
+
+from utils.liftover import normalize_chrom
+
+MAGIC = b"MVGENOM1"
+HEADER = struct.Struct("<8sQQ")
+INDEX = struct.Struct("<16sQQQQ")
+RUN = struct.Struct("<IIc3x")
+
+BASES = "ACGT"
+_CODES = bytes.maketrans(b"ACGT", b"\0\1\2\3")
+_RUN = re.compile(r"([^ACGT])\1*")
+_PACK = {a + b + c + d: (BASES.index(a) << 6 | BASES.index(b) << 4 | BASES.index(c) << 2 | BASES.index(d))
+         for a in BASES for b in BASES for c in BASES for d in BASES}
+
+# the 4-bit codes of utils.validate.nuc_to_bit
+BIT_CODES = "YACGTNMRWK"
+_HIGH_NIBBLE = bytes.maketrans(bytes(range(256)), bytes(ord(BIT_CODES[i >> 4]) if i >> 4 < len(BIT_CODES) else 0
+                                                        for i in range(256)))
+_LOW_NIBBLE = bytes.maketrans(bytes(range(256)), bytes(ord(BIT_CODES[i & 15]) if i & 15 < len(BIT_CODES) else 0
+                                                       for i in range(256)))
+
+# the 4 bases of each byte, and the base of each byte at each of its 4 slots
+_QUADS = tuple("".join(BASES[i >> shift & 3] for shift in (6, 4, 2, 0)) for i in range(256))
+_SLOTS = [bytes.maketrans(bytes(range(256)), bytes(ord(BASES[i >> shift & 3]) for i in range(256)))
+          for shift in (6, 4, 2, 0)]
+# above, in bytes, a range is decoded by bytes.translate of the slots rather than joined from quads
+SLOTS_MIN_BYTES = 64
+
+try:
+    import numpy as np
+except ImportError:  # bases are packed in pure python
+    np = None
+
+
+def _pack(seq: str) -> bytes:
+    """Pack `seq`, of ACGT only and of a multiple of 4 bases, 4 bases per byte."""
+    if np is not None:
+        codes = np.frombuffer(seq.encode().translate(_CODES), dtype=np.uint8).reshape(-1, 4)
+        return (codes[:, 0] << 6 | codes[:, 1] << 4 | codes[:, 2] << 2 | codes[:, 3]).astype(np.uint8).tobytes()
+    return bytes(_PACK[seq[i:i + 4]] for i in range(0, len(seq), 4))
+
+
+class _ChromWriter:
+    """Packs the sequence of a chromosome, written in chunks, and collects its runs of other bases."""
+
+    def __init__(self, f):
+        self.f = f
+        self.offset = f.tell()
+        self.length = 0
+        self.runs = []
+        self._pending = ""
+
+    def write(self, seq: str):
+        seq = seq.upper()
+        for match in _RUN.finditer(seq):
+            start, end, base = self.length + match.start(), self.length + match.end(), match.group(1)
+            if self.runs and self.runs[-1][1] == start and self.runs[-1][2] == base:
+                self.runs[-1][1] = end
+            else:
+                self.runs.append([start, end, base])
+        self.length += len(seq)
+        seq = self._pending + _RUN.sub(lambda match: "A" * len(match.group()), seq)
+        cut = len(seq) - len(seq) % 4
+        self.f.write(_pack(seq[:cut]))
+        self._pending = seq[cut:]
+
+    def close(self) -> Tuple[int, int, int, int]:
+        """Write the runs, return the length, the offsets of the bases and the runs, the number of runs."""
+        if self._pending:
+            self.f.write(_pack(self._pending.ljust(4, "A")))
+        self._align()
+        runs_offset = self.f.tell()
+        for start, end, base in self.runs:
+            self.f.write(RUN.pack(start, end, base.encode()))
+        self._align()
+        return self.length, self.offset, runs_offset, len(self.runs)
+
+    def _align(self):
+        self.f.write(b"\0" * (-self.f.tell() % 8))
+
+
+def write_genome(path: str, chroms: Iterable[Tuple[str, Iterable[str]]]):
+    """
+    Write a genome file of `chroms`, (name, chunks of sequence) pairs,
+    atomically. Names are normalized, e.g. "chr1" -> "1", "chrM" -> "MT".
+    """
+    folder = os.path.dirname(os.path.abspath(path))
+    with tempfile.NamedTemporaryFile("wb", dir=folder, delete=False, suffix=".mvgenome") as f:
+        try:
+            f.write(HEADER.pack(MAGIC, 0, 0))
+            index = []
+            for name, chunks in chroms:
+                name = normalize_chrom(name)
+                if len(name.encode()) > 16:
+                    raise ValueError(f"Chromosome name too long: {name}")
+                writer = _ChromWriter(f)
+                for chunk in chunks:
+                    writer.write(chunk)
+                index.append((name.encode(), *writer.close()))
+            index_offset = f.tell()
+            for entry in index:
+                f.write(INDEX.pack(*entry))
+            f.seek(0)
+            f.write(HEADER.pack(MAGIC, len(index), index_offset))
+        except BaseException:
+            f.close()
+            os.remove(f.name)
+            raise
+    os.replace(f.name, path)
+
+
+def _read_fasta(path) -> Iterator[Tuple[str, Iterator[str]]]:
+    """(name, chunks of sequence) of the sequences of a FASTA file, each read before the next one."""
+    with open(path, "rb") as f:
+        compressed = f.read(2) == b"\x1f\x8b"
+    with (gzip.open(path, "rt") if compressed else open(path)) as f:
+        header = f.readline()
+
+        def chunks():
+            nonlocal header
+            for line in f:
+                if line.startswith(">"):
+                    header = line
+                    return
+                yield line.rstrip()
+
+        while header.startswith(">"):
+            name, header = header[1:].split()[0], ""
+            yield name, chunks()
+
+
+def from_fasta(paths: Iterable[str], path: str):
+    """Write a genome file of the sequences of FASTA files, optionally gzip compressed."""
+    def chroms():
+        for fasta in paths:
+            yield from _read_fasta(fasta)
+    write_genome(path, chroms())
+
+
+def _bits_to_seq(chr_bit, chunk_size=1 << 24) -> Iterator[str]:
+    """The sequence of a bitarray of 4-bit codes, in chunks."""
+    data = chr_bit.tobytes()
+    length = len(chr_bit) // 4
+    for start in range(0, (length + 1) // 2, chunk_size):
+        chunk = data[start:start + chunk_size]
+        seq = bytearray(2 * len(chunk))
+        seq[0::2] = chunk.translate(_HIGH_NIBBLE)
+        seq[1::2] = chunk.translate(_LOW_NIBBLE)
+        if 2 * (start + len(chunk)) > length:
+            del seq[length - 2 * start:]
+        if 0 in seq:
+            raise ValueError(f"Invalid 4-bit code at base {2 * start + seq.index(0)}")
+        yield seq.decode()
+
+
+def from_bitarrays(chr_bit_d: Dict[str, "bitarray"], path: str):
+    """Write a genome file of a dict of bitarrays, see utils.validate.get_genome_in_bit()."""
+    write_genome(path, ((chrom, _bits_to_seq(chr_bit)) for chrom, chr_bit in chr_bit_d.items()))
+
+
+def from_pickle(pyobj_path: str, path: str):
+    """Write a genome file of a pickled dict of bitarrays, e.g. "hg19_genome.pyobj"."""
+    from biothings.utils.common import loadobj
+    from_bitarrays(loadobj(pyobj_path), path)
+
+
+class Chromosome:
+    """The sequence of a chromosome of a GenomeStore, positions are 1-based."""
+
+    def __init__(self, name, length, bases, runs):
+        self.name = name
+        self.length = length
+        self.bases = bases  # memoryview of the packed bases, in the mmap
+        self._run_starts = [start for start, _, _ in runs]
+        self._runs = runs
+
+    def __len__(self):
+        return self.length
+
+    def base(self, position: int) -> str:
+        """The base at `position`."""
+        i = position - 1
+        if not 0 <= i < self.length:
+            raise IndexError(f"Position {position} out of chromosome {self.name} of length {self.length}")
+        k = bisect_right(self._run_starts, i) - 1
+        if k >= 0 and i < self._runs[k][1]:
+            return self._runs[k][2]
+        return BASES[self.bases[i >> 2] >> (6 - 2 * (i & 3)) & 3]
+
+    def view(self, start: int, end: int) -> memoryview:
+        """
+        The packed bytes holding the bases from `start` to `end` included, without
+        copy: the base at `start` is in the first byte, at bits 7-6 if start % 4 == 1.
+        Runs of other bases are not applied.
+        """
+        if not 1 <= start <= end <= self.length:
+            raise IndexError(f"Range {start}-{end} out of chromosome {self.name} of length {self.length}")
+        return self.bases[(start - 1) >> 2:((end - 1) >> 2) + 1]
+
+    def seq(self, start: int, end: int) -> str:
+        """The bases from `start` to `end` included, decoded in one pass over their bytes."""
+        data = self.view(start, end)
+        if len(data) < SLOTS_MIN_BYTES:
+            bases = "".join([_QUADS[byte] for byte in data])
+        else:
+            data = bytes(data)
+            decoded = bytearray(4 * len(data))
+            for slot, table in enumerate(_SLOTS):
+                decoded[slot::4] = data.translate(table)
+            bases = decoded.decode()
+        skip = (start - 1) & 3
+        bases = bases[skip:skip + end - start + 1]
+
+        # runs of other bases overlapping the range, from the last one
+        k = bisect_right(self._run_starts, end - 1) - 1
+        while k >= 0 and self._runs[k][1] > start - 1:
+            run_start, run_end, base = self._runs[k]
+            lo, hi = max(run_start, start - 1) - (start - 1), min(run_end, end) - (start - 1)
+            bases = bases[:lo] + base * (hi - lo) + bases[hi:]
+            k -= 1
+        return bases
+
+
+class GenomeStore:
+    """A genome file written by write_genome(), read through mmap, chromosomes as keys."""
+
+    def __init__(self, mapped, view, chroms):
+        self._mmap = mapped
+        self._view = view
+        self._chroms = chroms
+
+    @classmethod
+    def open(cls, path):
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mapped)
+        chroms = {}
+        try:
+            magic, count, index_offset = HEADER.unpack_from(mapped)
+            if magic != MAGIC or index_offset + count * INDEX.size != len(mapped):
+                raise ValueError(f"Not a genome file: {path}")
+            for i in range(count):
+                name, length, offset, runs_offset, runs_count = INDEX.unpack_from(mapped, index_offset + i * INDEX.size)
+                name = name.rstrip(b"\0").decode()
+                runs = [(start, end, base.decode())
+                        for start, end, base in RUN.iter_unpack(mapped[runs_offset:runs_offset + runs_count * RUN.size])]
+                chroms[name] = Chromosome(name, length, view[offset:offset + (length + 3) // 4], runs)
+        except (ValueError, struct.error):
+            cls(mapped, view, chroms).close()
+            raise ValueError(f"Not a genome file: {path}")
+        return cls(mapped, view, chroms)
+
+    def __getitem__(self, chrom: str) -> Chromosome:
+        """The chromosome `chrom`, named as in MyVariant ids, "chr" prefix and "M" accepted."""
+        try:
+            return self._chroms[chrom]
+        except KeyError:
+            return self._chroms[normalize_chrom(chrom)]
+
+    def __contains__(self, chrom):
+        return chrom in self._chroms or normalize_chrom(chrom) in self._chroms
+
+    def __iter__(self):
+        return iter(self._chroms)
+
+    def __len__(self):
+        return len(self._chroms)
+
+    def base(self, chrom: str, position: int) -> str:
+        return self[chrom].base(position)
+
+    def seq(self, chrom: str, start: int, end: int) -> str:
+        return self[chrom].seq(start, end)
+
+    def close(self):
+        if self._mmap is not None:
+            for chrom in self._chroms.values():
+                chrom.bases.release()
+            self._view.release()
+            self._chroms = {}
+            self._mmap.close()
+            self._mmap = None
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Convert a reference genome to a genome file.")
+    parser.add_argument("source", nargs="+", help="a pickled dict of bitarrays (.pyobj), or FASTA files")
+    parser.add_argument("output")
+    args = parser.parse_args()
+    if len(args.source) == 1 and args.source[0].endswith(".pyobj"):
+        from_pickle(args.source[0], args.output)
+    else:
+        from_fasta(args.source, args.output)
@@ -1,6 +1,8 @@
 import re
 import copy
+from functools import lru_cache
 from hashlib import blake2b
+from typing import NamedTuple, Optional
 
 """
 Some of the HGVS related functions dated back to 2015, and the recommendations changed a lot nowadays.
@@ -22,7 +24,19 @@ class HGVSHelper:
     """
     Modern (at the time of writing) HGVS formats in our application, 
     as described in http://varnomen.hgvs.org/recommendations/DNA/
+    All of them are matched by ID_PATTERN, see parse_hgvs_id():
+
+        chr<i>:g.<pos><ref>&gt;<alt>, e.g. chrX:g.123A>G
+        chr<i>:g.<start>_<end>ins<seq>, e.g. chrX:g.123_124insAGC
+        chr<i>:g.<start>_<end>delins<seq>, e.g. chrX:g.123_127delinsAG, or chr<i>:g.<pos>delins<seq>
+        chr<i>:g.<start>_<end>del, e.g. chrX:g.123_127del, or chr<i>:g.<pos>del
+        chr<i>:g.<start>_<end>dup, e.g. chrX:g.123_345dup, or chr<i>:g.<pos>dup
     """
+    # ASCII classes, fully matched, see parse_hgvs_id()
+    ID_PATTERN = re.compile(
+        r'chr([0-9A-Za-z_]+):g\.([0-9]+)(?:_([0-9]+))?'
+        r'(?:([A-Za-z])>([A-Za-z])|(delins|ins)([A-Za-z]+)|(del|dup))'
+    )
     # chr<i>:g.<pos><ref>&gt;<alt>, e.g. chrX:g.123A>G
     SNP_PATTERN = re.compile(f'({_SINGLE_POSITION_PATTERN})(\w)>(\w)')
     # chr<i>:g.<start>_<end>ins<seq>, e.g. chrX:g.123_124insAGC
@@ -76,6 +90,42 @@ class SeqHelper:
     SEQ_PATTERN = re.compile('^[ACGTN]+$')
 
 
+class HGVSRecord(NamedTuple):
+    """A genomic HGVS id, see parse_hgvs_id()."""
+    chrom: str
+    start: int
+    end: int  # the same as start for a single position
+    type: str  # 'snp', 'del', 'ins', 'delins' or 'dup'
+    ref: Optional[str]  # the reference base of a SNP
+    alt: Optional[str]  # the alternate base of a SNP, the inserted sequence of an ins or a delins
+
+
+_new_record = tuple.__new__
+
+
+@lru_cache(maxsize=65536)
+def parse_hgvs_id(hgvs_id: str) -> Optional[HGVSRecord]:
+    """
+    Parse a "chr<i>:g." HGVS id of any of the formats of HGVSHelper in one pass,
+    return an HGVSRecord, or None if `hgvs_id` is none of them.
+    Repeated ids, e.g. the ids of the variants of a batch, are parsed once.
+    """
+    match = HGVSHelper.ID_PATTERN.fullmatch(hgvs_id)
+    if match is None:
+        return None
+    chrom, start, end, ref, alt, op, seq, no_seq_op = match.groups()
+    start = int(start)
+    # tuple.__new__ skips the argument parsing of HGVSRecord(...), a good part of the time spent
+    if ref is not None:
+        if end is not None:
+            return None
+        return _new_record(HGVSRecord, (chrom, start, start, 'snp', ref, alt))
+    if op == 'ins' and end is None:
+        return None
+    end = int(end) if end is not None else start
+    return _new_record(HGVSRecord, (chrom, start, end, op or no_seq_op, None, seq))
+
+
 def is_snp(hgvs: str):
     """return True/False if an hgvs id a SNP or not."""
     return HGVSHelper.SNP_PATTERN.match(hgvs) is not None
@@ -202,6 +252,108 @@ def get_hgvs_from_vcf(chr, pos, ref, alt, mutant_type=None):
         return hgvs
 
 
+_SNV_CHANGES = {(ref, alt): '{}>{}'.format(ref, alt) for ref in 'ACGTN' for alt in 'ACGTN'}
+
+
+def _column(values):
+    """A list of the values of a column, e.g. a list, a NumPy or a pyarrow array."""
+    if hasattr(values, 'to_pylist'):  # pyarrow
+        return values.to_pylist()
+    if hasattr(values, 'tolist'):  # numpy
+        return values.tolist()
+    return list(values)
+
+
+def get_hgvs_from_vcf_batch(chroms, positions, refs, alts):
+    """
+    get the hgvs names of VCF-style "chr, pos, ref, alt" columns, as get_hgvs_from_vcf does
+    for each row, e.g. columns of a NumPy or pyarrow table of variants.
+
+    Return 4 lists, the hgvs ids, the var types ('snp', 'del', 'ins' or 'delins'), and the
+    start and end positions of the ids, None for the rows that cannot be converted.
+    The positions are the ones of the ids, e.g. 124 and 127 for "chr1:g.124_127del".
+    """
+    chroms, positions, refs, alts = map(_column, (chroms, positions, refs, alts))
+    if not len(chroms) == len(positions) == len(refs) == len(alts):
+        raise ValueError("Columns of different lengths.")
+
+    ids, var_types, starts, ends = [], [], [], []
+    snv_changes = _SNV_CHANGES
+    valid = SeqHelper.SEQ_PATTERN.match
+    for chr, pos, ref, alt in zip(chroms, positions, refs, alts):
+        change = snv_changes.get((ref, alt))
+        if change is not None:
+            # SNVs are most rows
+            hgvs, var_type = f'chr{chr}:g.{pos}{change}', 'snp'
+            try:
+                start = end = int(pos)
+            except (TypeError, ValueError):
+                start = end = None
+        elif isinstance(ref, str) and isinstance(alt, str) and valid(ref) and valid(alt):
+            try:
+                hgvs, var_type, start, end = _hgvs_from_vcf(chr, pos, ref, alt)
+            except (TypeError, ValueError):  # an invalid position
+                hgvs = var_type = start = end = None
+        else:
+            hgvs = var_type = start = end = None
+        ids.append(hgvs)
+        var_types.append(var_type)
+        starts.append(start)
+        ends.append(end)
+    return ids, var_types, starts, ends
+
+
+def _hgvs_from_vcf(chr, pos, ref, alt):
+    """get_hgvs_from_vcf, with the positions of the id, of a valid ref/alt which is not an SNV."""
+    len_ref, len_alt = len(ref), len(alt)
+    if len_ref > 1 and len_alt == 1:
+        if ref[0] == alt:
+            start = int(pos) + 1
+            end = int(pos) + len_ref - 1
+            if start == end:
+                return 'chr{0}:g.{1}del'.format(chr, start), 'del', start, end
+            return 'chr{0}:g.{1}_{2}del'.format(chr, start, end), 'del', start, end
+        end = int(pos) + len_ref - 1
+        return 'chr{0}:g.{1}_{2}delins{3}'.format(chr, pos, end, alt), 'delins', int(pos), end
+    if len_ref == 1 and len_alt > 1:
+        if alt[0] == ref:
+            return 'chr{0}:g.{1}_{2}ins{3}'.format(chr, pos, int(pos) + 1, alt[1:]), 'ins', int(pos), int(pos) + 1
+        return 'chr{0}:g.{1}delins{2}'.format(chr, pos, alt), 'delins', int(pos), int(pos)
+    if len_ref > 1 and len_alt > 1:
+        if ref[0] == alt[0]:
+            # trimmed, as get_hgvs_from_vcf does, or raise ValueError as it does
+            chr, pos, ref, alt = _normalized_vcf(chr, pos, ref, alt)
+            if not (SeqHelper.SEQ_PATTERN.match(ref) and SeqHelper.SEQ_PATTERN.match(alt)):
+                return None, None, None, None
+            if len(ref) == len(alt) == 1:
+                return 'chr{0}:g.{1}{2}>{3}'.format(chr, pos, ref, alt), 'snp', pos, pos
+            return _hgvs_from_vcf(chr, pos, ref, alt)
+        end = int(pos) + len_ref - 1
+        return 'chr{0}:g.{1}_{2}delins{3}'.format(chr, pos, end, alt), 'delins', int(pos), end
+    return None, None, None, None
+
+
+def get_hgvs_from_vcf_record(fields):
+    """
+    Return the hgvs id of each ALT allele of a VCF record, split into its fields, None
+    for the alleles that have none (e.g. symbolic alleles). Raise IndexError or ValueError
+    if `fields` is not a VCF record.
+    """
+    chrom = fields[0]
+    if chrom[:3].lower() == 'chr':
+        chrom = chrom[3:]
+    chrom = 'MT' if chrom.upper() == 'M' else chrom.upper()
+    pos = int(fields[1])
+    ref = fields[3].upper()
+    ids = []
+    for alt in fields[4].split(','):
+        try:
+            ids.append(get_hgvs_from_vcf(chrom, pos, ref, alt.upper()))
+        except ValueError:
+            ids.append(None)
+    return ids
+
+
 def get_pos_start_end(chr, pos, ref, alt):
     """get start,end tuple from VCF-style "chr, pos, ref, alt" data."""
     try:
@@ -0,0 +1,189 @@
+"""
+Liftover of positions between assemblies, with UCSC chain files, e.g.
+https://hgdownload.soe.ucsc.edu/goldenPath/hg19/liftOver/hg19ToHg38.over.chain.gz
+
+The aligned blocks of all the chains are kept in sorted arrays per source
+chromosome, a position is lifted by a binary search of the block holding
+it. Batches of positions are lifted with numpy, if available.
+
+Positions are 1-based, chromosomes named as in MyVariant ids: "1", "X", "MT".
+"""
+import gzip
+from bisect import bisect_right
+from typing import Iterable, List, Optional, Tuple
+
+from utils.hgvs import parse_hgvs_id
+
+try:
+    import numpy as np
+except ImportError:  # batches are lifted one position at a time
+    np = None
+
+COMPLEMENT = str.maketrans("ACGTacgt", "TGCAtgca")
+
+
+def normalize_chrom(chrom: str) -> str:
+    """"chr1" -> "1", "chrM" -> "MT" """
+    if chrom[:3].lower() == "chr":
+        chrom = chrom[3:]
+    chrom = chrom.upper()
+    return "MT" if chrom == "M" else chrom
+
+
+def _open(path):
+    with open(path, "rb") as f:
+        compressed = f.read(2) == b"\x1f\x8b"
+    return gzip.open(path, "rt") if compressed else open(path)
+
+
+class LiftOver:
+    """Lift positions with the aligned blocks of a chain file."""
+
+    def __init__(self, blocks: Iterable[Tuple[str, int, int, str, int, str, int]]):
+        """
+        `blocks` are (source chrom, source start, size, target chrom, target start,
+        target strand, target chrom size), 0-based coordinates, the target ones on
+        the target strand, as in chain files.
+        """
+        by_chrom = {}
+        for chrom, start, size, *target in blocks:
+            by_chrom.setdefault(chrom, []).append((start, start + size, *target))
+
+        self._chroms = {}
+        for chrom, chrom_blocks in by_chrom.items():
+            chrom_blocks.sort()
+            columns = list(zip(*chrom_blocks))
+            if np is not None:
+                columns = [np.array(column, dtype=np.int64) if isinstance(column[0], int) else np.array(column)
+                           for column in columns]
+            else:
+                columns = [list(column) for column in columns]
+            self._chroms[chrom] = columns
+
+    @classmethod
+    def from_chain_file(cls, path):
+        """Load a chain file, optionally gzip compressed."""
+        return cls(cls._read_chains(path))
+
+    @staticmethod
+    def _read_chains(path):
+        with _open(path) as f:
+            chain = None
+            for line in f:
+                fields = line.split()
+                if not fields:
+                    continue
+                if fields[0] == "chain":
+                    t_name, t_strand, t_start = fields[2], fields[4], int(fields[5])
+                    q_name, q_size, q_strand, q_start = fields[7], int(fields[8]), fields[9], int(fields[10])
+                    if t_strand != "+":
+                        raise ValueError(f"Unexpected source strand in chain: {line.strip()}")
+                    chain = [normalize_chrom(t_name), t_start, normalize_chrom(q_name), q_start, q_strand, q_size]
+                    continue
+                if chain is None:
+                    raise ValueError(f"Alignment data outside of a chain: {line.strip()}")
+                t_chrom, t_pos, q_chrom, q_pos, q_strand, q_size = chain
+                size = int(fields[0])
+                yield t_chrom, t_pos, size, q_chrom, q_pos, q_strand, q_size
+                if len(fields) == 3:
+                    chain[1] = t_pos + size + int(fields[1])
+                    chain[3] = q_pos + size + int(fields[2])
+                else:  # last block of the chain
+                    chain = None
+
+    @staticmethod
+    def _target(offset, target_start, strand, target_size):
+        position = target_start + offset
+        if strand == "-":
+            position = target_size - 1 - position
+        return position + 1
+
+    def convert(self, chrom: str, position: int) -> Optional[Tuple[str, int, str]]:
+        """Return the (chrom, position, strand) `position` lifts to, None if it is not aligned."""
+        columns = self._chroms.get(normalize_chrom(chrom))
+        if columns is None:
+            return None
+        starts, ends, target_chroms, target_starts, strands, target_sizes = columns
+        x = position - 1
+        i = bisect_right(starts, x) - 1
+        if i < 0 or x >= ends[i]:
+            return None
+        return (
+            str(target_chroms[i]),
+            int(self._target(x - starts[i], target_starts[i], strands[i], target_sizes[i])),
+            str(strands[i])
+        )
+
+    def convert_many(self, chrom: str, positions: Iterable[int]) -> List[Optional[Tuple[str, int, str]]]:
+        """Lift a batch of positions of a chromosome, see convert()."""
+        columns = self._chroms.get(normalize_chrom(chrom))
+        if columns is None:
+            return [None for _ in positions]
+        starts, ends, target_chroms, target_starts, strands, target_sizes = columns
+        if np is None:
+            out = []
+            for position in positions:
+                x = position - 1
+                i = bisect_right(starts, x) - 1
+                if i < 0 or x >= ends[i]:
+                    out.append(None)
+                else:
+                    out.append((target_chroms[i],
+                                self._target(x - starts[i], target_starts[i], strands[i], target_sizes[i]),
+                                strands[i]))
+            return out
+
+        x = np.asarray(positions, dtype=np.int64) - 1
+        i = np.searchsorted(starts, x, side="right") - 1
+        found = i >= 0
+        found[found] &= x[found] < ends[i[found]]
+        i = np.where(found, i, 0)
+        reverse = strands[i] == "-"
+        offset = target_starts[i] + (x - starts[i])
+        lifted = np.where(reverse, target_sizes[i] - 1 - offset, offset) + 1
+        return [
+            (str(target_chroms[k]), int(lifted[n]), str(strands[k])) if ok else None
+            for n, (k, ok) in enumerate(zip(i.tolist(), found.tolist()))
+        ]
+
+    def convert_interval(self, chrom: str, start: int, end: int) -> Optional[Tuple[str, int, int]]:
+        """
+        Lift both ends of an interval, return (chrom, start, end) or None
+        when they are not aligned to the same chromosome.
+        """
+        lifted_start, lifted_end = self.convert_many(chrom, [start, end])
+        if lifted_start is None or lifted_end is None or lifted_start[0] != lifted_end[0]:
+            return None
+        positions = sorted((lifted_start[1], lifted_end[1]))
+        return lifted_start[0], positions[0], positions[1]
+
+    def convert_hgvs(self, hgvs: str) -> Optional[str]:
+        """
+        Lift a genomic HGVS id, e.g. "chr1:g.218631822G>A". SNPs are lifted on
+        either strand, deletions, duplications and insertions only when
+        aligned on the same strand, with the same length. Return None
+        if the id can't be lifted.
+        """
+        record = parse_hgvs_id(hgvs)
+        if record is None:
+            return None
+
+        if record.type == "snp":
+            lifted = self.convert(record.chrom, record.start)
+            if lifted is None:
+                return None
+            chrom, position, strand = lifted
+            ref, alt = record.ref, record.alt
+            if strand == "-":
+                ref, alt = ref.translate(COMPLEMENT), alt.translate(COMPLEMENT)
+            return f"chr{chrom}:g.{position}{ref}>{alt}"
+
+        lifted_start, lifted_end = self.convert_many(record.chrom, [record.start, record.end])
+        if lifted_start is None or lifted_end is None or lifted_start[2] != "+" or lifted_end[2] != "+":
+            return None
+        if lifted_start[0] != lifted_end[0] or lifted_end[1] - lifted_start[1] != record.end - record.start:
+            return None
+        edit = record.type + (record.alt or "")
+        if record.end != record.start or record.type == "ins":
+            return f"chr{lifted_start[0]}:g.{lifted_start[1]}_{lifted_end[1]}{edit}"
+        return f"chr{lifted_start[0]}:g.{lifted_start[1]}{edit}"
@@ -0,0 +1,245 @@
+"""
+Offline annotation store, the merged documents of a build in an SQLite
+database, for annotation jobs that cannot reach Elasticsearch.
+
+The hub exports one store per assembly on publish (see
+hub.dataindex.indexer.MyVariantIndexerManager.export_offline_store), the
+annotator looks ids up in it as the annotation endpoint does, see
+bin/annotate.py.
+
+Tables:
+
+    docs    _id -> document, orjson serialized, zlib compressed
+    rsids   dbSNP rsid -> _id, indexed
+    meta    key -> value: version, assembly, count
+
+Documents are read as their serialized JSON, and written out as is.
+"""
+import os
+import sqlite3
+import tempfile
+import zlib
+from urllib.parse import quote
+
+import orjson
+
+from utils.hgvs import get_hgvs_from_vcf_record
+from utils.rsidtable import parse_rsid
+
+SCHEMA = """
+CREATE TABLE docs (_id TEXT PRIMARY KEY, doc BLOB NOT NULL) WITHOUT ROWID;
+CREATE TABLE rsids (rsid INTEGER NOT NULL, _id TEXT NOT NULL);
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+# at most 999 parameters per statement in older SQLite versions
+LOOKUP_SIZE = 500
+
+
+class OfflineStoreWriter:
+    """
+    Write a store to `path`, atomically, on close(). Documents added
+    twice, by _id, are replaced.
+    """
+
+    def __init__(self, path, version=None, assembly=None, batch_size=10000, compresslevel=6):
+        self.path = path
+        self.version = version
+        self.assembly = assembly
+        self.batch_size = batch_size
+        self.compresslevel = compresslevel
+        self.count = 0
+        self._docs, self._rsids = [], []
+
+        folder = os.path.dirname(os.path.abspath(path))
+        fd, self._tmp = tempfile.mkstemp(dir=folder, suffix=".sqlite")
+        os.close(fd)
+        self._db = sqlite3.connect(self._tmp)
+        # a failed export is thrown away, no need for a journal
+        self._db.execute("PRAGMA journal_mode=OFF")
+        self._db.execute("PRAGMA synchronous=OFF")
+        self._db.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def add(self, doc):
+        _id = doc["_id"]
+        self._docs.append((_id, zlib.compress(
+            orjson.dumps(doc, option=orjson.OPT_NON_STR_KEYS), self.compresslevel)))
+        dbsnp = doc.get("dbsnp")
+        rsid = dbsnp.get("rsid") if isinstance(dbsnp, dict) else None
+        rsid = parse_rsid(str(rsid)) if rsid else None
+        if rsid is not None:
+            self._rsids.append((rsid, _id))
+        if len(self._docs) >= self.batch_size:
+            self._flush()
+
+    def update(self, docs):
+        for doc in docs:
+            self.add(doc)
+
+    def _flush(self):
+        self._db.executemany("INSERT OR REPLACE INTO docs VALUES (?, ?)", self._docs)
+        self._db.executemany("INSERT INTO rsids VALUES (?, ?)", self._rsids)
+        self._db.commit()
+        self._docs, self._rsids = [], []
+
+    def close(self):
+        self._flush()
+        # indexed once loaded, much faster than maintaining it while loading
+        self._db.execute("CREATE INDEX rsids_rsid ON rsids (rsid)")
+        self.count = self._db.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+        self._db.executemany("INSERT INTO meta VALUES (?, ?)", [
+            ("version", self.version), ("assembly", self.assembly), ("count", str(self.count))])
+        self._db.commit()
+        self._db.close()
+        os.replace(self._tmp, self.path)
+
+    def abort(self):
+        self._db.close()
+        os.remove(self._tmp)
+
+
+class OfflineStore:
+    """
+    Read a store, through mmap: documents are returned as serialized JSON,
+    bytes, which callers can write out without parsing them.
+    """
+
+    def __init__(self, path, mmap_size=1 << 36):
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+        self._db = sqlite3.connect(f"file:{quote(os.path.abspath(path))}?mode=ro", uri=True,
+                                   check_same_thread=False)
+        self._db.execute(f"PRAGMA mmap_size={int(mmap_size)}")
+        try:
+            meta = dict(self._db.execute("SELECT key, value FROM meta"))
+        except sqlite3.DatabaseError:
+            self._db.close()
+            raise ValueError(f"Not an offline store: {path}")
+        self.version = meta.get("version")
+        self.assembly = meta.get("assembly")
+        self.count = int(meta.get("count") or 0)
+
+    def __len__(self):
+        return self.count
+
+    def docs(self, ids):
+        """Return {_id: JSON document} of the `ids` in the store."""
+        ids = list(dict.fromkeys(ids))
+        found = {}
+        decompress = zlib.decompress
+        for i in range(0, len(ids), LOOKUP_SIZE):
+            chunk = ids[i:i + LOOKUP_SIZE]
+            rows = self._db.execute(
+                f"SELECT _id, doc FROM docs WHERE _id IN ({','.join('?' * len(chunk))})", chunk)
+            found.update((_id, decompress(doc)) for _id, doc in rows)
+        return found
+
+    def get(self, _id):
+        """Return the document of `_id`, parsed, or None."""
+        doc = self.docs([_id]).get(_id)
+        return orjson.loads(doc) if doc is not None else None
+
+    def rsid_ids(self, rsids):
+        """Return {rsid: [_id, ...]} of the `rsids`, ints, in the store."""
+        rsids = list(dict.fromkeys(rsids))
+        found = {}
+        for i in range(0, len(rsids), LOOKUP_SIZE):
+            chunk = rsids[i:i + LOOKUP_SIZE]
+            rows = self._db.execute(
+                f"SELECT rsid, _id FROM rsids WHERE rsid IN ({','.join('?' * len(chunk))})", chunk)
+            for rsid, _id in rows:
+                found.setdefault(rsid, []).append(_id)
+        return found
+
+    def close(self):
+        self._db.close()
+
+
+class OfflineAnnotator:
+    """
+    Annotate ids with the documents of an OfflineStore.
+
+    The scopes of each id are found by `parser`, a web.dispatch.IDDispatcher
+    of the ANNOTATION_ID_REGEX_LIST, as the annotation endpoint does. Only the
+    "_id" and "dbsnp.rsid" scopes are in the store, ids of other scopes are
+    reported as not found.
+    """
+    SCOPES = ("_id", "dbsnp.rsid")
+
+    def __init__(self, store, parser):
+        self.store = store
+        self.parser = parser
+
+    def lookup(self, ids):
+        """Return the list of the JSON documents of each of `ids`."""
+        results = [[] for _ in ids]
+        by_id, by_rsid = [], []
+        for scopes, terms in self.parser.classify(ids).items():
+            for position, term in terms:
+                if "_id" in scopes:
+                    by_id.append((position, term))
+                elif "dbsnp.rsid" in scopes:
+                    rsid = parse_rsid(term)
+                    if rsid is not None:
+                        by_rsid.append((position, rsid))
+
+        rsid_ids = self.store.rsid_ids(rsid for _, rsid in by_rsid)
+        docs = self.store.docs([term for _, term in by_id] +
+                               [_id for _, rsid in by_rsid for _id in rsid_ids.get(rsid, ())])
+        for position, term in by_id:
+            if term in docs:
+                results[position].append(docs[term])
+        for position, rsid in by_rsid:
+            results[position].extend(docs[_id] for _id in rsid_ids.get(rsid, ()) if _id in docs)
+        return results
+
+    def annotate(self, ids):
+        """
+        Yield the NDJSON lines of the annotation of `ids`, one per document
+        found, with the id queried, or one {"query": ..., "notfound": true}.
+        """
+        for q, docs in zip(ids, self.lookup(ids)):
+            query = orjson.dumps(q)
+            if not docs:
+                yield b'{"query":' + query + b',"notfound":true}\n'
+            for doc in docs:
+                # '{"query":"...",' + the fields of the document
+                yield b'{"query":' + query + (b',' + doc[1:] if len(doc) > 2 else b'}') + b'\n'
+
+    def annotate_vcf(self, lines):
+        """
+        Yield the NDJSON lines of the annotation of the VCF records in `lines`,
+        as the VCF annotation endpoint does, see web.handlers.MVVCFAnnotationHandler.
+        """
+        records = []
+        for line in lines:
+            if line.startswith("#") or not line.strip():
+                continue
+            fields = line.rstrip("\r\n").split("\t")
+            try:
+                records.append((fields, get_hgvs_from_vcf_record(fields)))
+            except (IndexError, ValueError):  # not a VCF record
+                records.append((fields, None))
+
+        docs = self.store.docs([_id for _, ids in records if ids for _id in ids if _id])
+        for fields, ids in records:
+            if ids is None:
+                yield orjson.dumps({"line": "\t".join(fields), "error": "Invalid VCF record."}) + b"\n"
+                continue
+            record = orjson.dumps({
+                "chrom": fields[0], "pos": int(fields[1]), "id": fields[2],
+                "ref": fields[3], "alt": fields[4].split(","),
+            })
+            hits = b",".join(
+                docs[_id] if _id in docs else b'{"query":' + orjson.dumps(_id) + b',"notfound":true}'
+                for _id in ids)
+            yield record[:-1] + b',"hits":[' + hits + b']}\n'
@@ -0,0 +1,162 @@
+"""
+rsid -> HGVS ids lookup table, stored in a file read through mmap.
+
+The hub exports one table per assembly (see
+hub.dataindex.indexer.MyVariantIndexerManager.export_rsid_table), the web
+nodes look rsids up in it instead of searching the "dbsnp.rsid" field.
+
+File layout, integers are little-endian unsigned 64-bit:
+
+    header   magic (8 bytes), count n, build version (48 bytes, utf-8, zero padded)
+    rsids    n sorted rsids
+    offsets  n + 1 offsets in the ids section
+    ids      the ids of each rsid, "\\n" separated, utf-8
+"""
+import heapq
+import mmap
+import os
+import re
+import struct
+import sys
+import tempfile
+from array import array
+from bisect import bisect_left
+from contextlib import ExitStack
+from itertools import groupby
+
+MAGIC = b"MVRSID01"
+HEADER = struct.Struct("<8sQ48s")
+
+RSID_PATTERN = re.compile(r"(?:DBSNP:)?rs(\d+)", re.I)
+
+
+def parse_rsid(term):
+    """Return the rsid number of "rs123" or "DBSNP:rs123", or None."""
+    match = RSID_PATTERN.fullmatch(term)
+    return int(match.group(1)) if match else None
+
+
+def _uint64_array(values=()):
+    arr = array("Q", values)
+    assert arr.itemsize == 8
+    return arr
+
+
+def _sorted_runs(pairs, chunk_size, folder):
+    """Sort (rsid, _id) pairs by chunks into temporary files, return the file names."""
+    runs = []
+    chunk = []
+
+    def flush():
+        chunk.sort()
+        with tempfile.NamedTemporaryFile("w", dir=folder, delete=False, suffix=".run") as f:
+            f.writelines(f"{rsid:020d}\t{_id}\n" for rsid, _id in chunk)
+        runs.append(f.name)
+        chunk.clear()
+
+    for rsid, _id in pairs:
+        chunk.append((rsid, _id))
+        if len(chunk) >= chunk_size:
+            flush()
+    if chunk:
+        flush()
+    return runs
+
+
+def write_rsid_table(path, pairs, version, chunk_size=5_000_000):
+    """
+    Write the table of the (rsid as int, HGVS _id) `pairs`, in any order,
+    tagged with the `version` of the index built from the same data.
+
+    At most `chunk_size` pairs are kept in memory, the others being sorted
+    in temporary files next to `path`. The table is written to a temporary
+    file first, and moved over `path` once complete.
+    """
+    folder = os.path.dirname(os.path.abspath(path))
+    runs = _sorted_runs(pairs, chunk_size, folder)
+    tmp_ids = tmp_table = None
+    try:
+        rsids, offsets = _uint64_array(), _uint64_array([0])
+        with ExitStack() as stack:
+            ids_file = stack.enter_context(
+                tempfile.NamedTemporaryFile("wb", dir=folder, delete=False, suffix=".ids"))
+            tmp_ids = ids_file.name
+            lines = heapq.merge(*(stack.enter_context(open(run)) for run in runs))
+            for rsid, group in groupby(lines, key=lambda line: line[:20]):
+                ids = sorted({line[21:-1] for line in group})
+                ids_file.write("\n".join(ids).encode())
+                rsids.append(int(rsid))
+                offsets.append(ids_file.tell())
+
+        if sys.byteorder != "little":
+            rsids.byteswap()
+            offsets.byteswap()
+        version = str(version).encode()
+        if len(version) > 48:
+            raise ValueError(f"Version too long: {version}")
+
+        with tempfile.NamedTemporaryFile("wb", dir=folder, delete=False, suffix=".tbl") as f:
+            tmp_table = f.name
+            f.write(HEADER.pack(MAGIC, len(rsids), version))
+            rsids.tofile(f)
+            offsets.tofile(f)
+            with open(tmp_ids, "rb") as ids_file:
+                while True:
+                    block = ids_file.read(1 << 20)
+                    if not block:
+                        break
+                    f.write(block)
+        os.replace(tmp_table, path)
+        tmp_table = None
+        return len(rsids)
+    finally:
+        for name in (*runs, tmp_ids, tmp_table):
+            if name and os.path.exists(name):
+                os.remove(name)
+
+
+class RsidTable:
+    """Read-only access to a table written by write_rsid_table()."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, count, version = HEADER.unpack_from(self._mmap)
+            if magic != MAGIC:
+                raise ValueError(f"Not an rsid table: {path}")
+            if sys.byteorder != "little":
+                raise ValueError("rsid tables can only be read on little-endian platforms.")
+            self.version = version.rstrip(b"\0").decode()
+            self._count = count
+            self._memory = memoryview(self._mmap)
+            start = HEADER.size
+            self._rsids = self._memory[start: start + 8 * count].cast("Q")
+            start += 8 * count
+            self._offsets = self._memory[start: start + 8 * (count + 1)].cast("Q")
+            self._ids_start = start + 8 * (count + 1)
+        except Exception:
+            self.close()
+            raise
+
+    def __len__(self):
+        return self._count
+
+    def lookup(self, rsid):
+        """Return the list of the HGVS ids of `rsid`, an int, empty if unknown."""
+        i = bisect_left(self._rsids, rsid)
+        if i == self._count or self._rsids[i] != rsid:
+            return []
+        start = self._ids_start + self._offsets[i]
+        end = self._ids_start + self._offsets[i + 1]
+        return self._mmap[start:end].decode().split("\n")
+
+    def close(self):
+        for view in ("_rsids", "_offsets", "_memory"):
+            if getattr(self, view, None) is not None:
+                getattr(self, view).release()
+                setattr(self, view, None)
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
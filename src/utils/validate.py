@@ -5,8 +5,10 @@ import time
 
 from bitarray import bitarray
 
-from biothings.utils.common import loadobj, is_str, open_anyfile, timesofar
+from biothings.utils.common import is_str, open_anyfile, timesofar
 from biothings.utils.mongo import get_src_db, doc_feeder
+from utils.genome import GenomeStore
+from utils.hgvs import parse_hgvs_id
 
 from warnings import warn
 
@@ -76,16 +78,14 @@ def bit_to_nuc2(bits):
     return bits.decode(code)
 
 
-def parse(str):
+def parse(hgvs_id):
     '''parse variant name, print the variant name and
        return chromosome number, nucleotide position
        and nucleotide name
     '''
-    pat = 'chr(\w+):g\.(\d+)(\w)\>(\w)'
-    mat = re.match(pat, str)
-    if mat:
-        r = mat.groups()
-        return (r[0], r[1], r[2])
+    record = parse_hgvs_id(hgvs_id)
+    if record is not None and record.type == 'snp':
+        return (record.chrom, str(record.start), record.ref)
 
 
 def get_genome_in_bit(chr_fa_folder):
@@ -128,8 +128,10 @@ class VariantValidator:
         self._chr_data = None
 
     def load_chr_data(self,genome_file):
+        '''open a genome file of utils.genome, see utils.genome.from_pickle
+           to convert the output of get_genome_in_bit'''
         print("\tLoading chromosome data...", end='')
-        self._chr_data = loadobj(genome_file)
+        self._chr_data = GenomeStore.open(genome_file)
         print("Done.")
 
     def validate_hgvs(self, hgvs_id, verbose=False):
@@ -154,13 +156,8 @@ class VariantValidator:
             pos = int(r[1])
             nuc_hgvs = r[2]
 
-            chr_bit = bitarray()
-            chr_bit = self._chr_data[str(chr)]
-
-            # get the nucleotide in chromsome sequence in bit form
-            nuc_chr_bit = bitarray()
-            nuc_chr_bit = chr_bit[pos*3-3:pos*3]
-            nuc_chr = bit_to_nuc(nuc_chr_bit)
+            # get the nucleotide in chromsome sequence
+            nuc_chr = self._chr_data.base(str(chr), pos)
 
             # compare HGVS id with genome
             matched = nuc_hgvs == nuc_chr
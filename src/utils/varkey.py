@@ -0,0 +1,198 @@
+"""
+Compact integer keys of variant _ids.
+
+SNVs and short indels of the chromosomes 1-22, X, Y and MT are packed in a
+non-negative 63-bit integer, reversible to the HGVS id, e.g.
+"chr1:g.35366C>T" <-> 288268350105059335. The keys fit a signed 64-bit
+integer, so they can go as is in numpy int64 arrays or ES long fields, and
+as 8 big-endian bytes, see to_bytes(), in on-disk indexes.
+
+Layout, most significant bits first:
+
+    chrom    5 bits, 1-22, 23 for X, 24 for Y, 25 for MT
+    start   28 bits
+    type     2 bits, 0 snp, 1 del, 2 ins, 3 delins
+    edit    28 bits
+        snp     ref, alt, 2 bits each
+        del     end - start
+        ins     length (4 bits), up to 12 inserted bases, 2 bits each
+        delins  end - start (4 bits), length (4 bits), up to 10 inserted bases
+
+so sorting keys sorts variants by chromosome, in the order above, then by
+position. Other ids, e.g. of duplications, longer insertions, other
+chromosomes or bases, don't have a key: encode() returns None for them and
+callers keep their string id, like VariantKeySet and sort_key() do.
+"""
+from typing import Iterable, Iterator, Optional
+
+from utils.hgvs import HGVSHelper
+
+CHROMS = [str(i) for i in range(1, 23)] + ["X", "Y", "MT"]
+CHROM_INDEX = {chrom: i for i, chrom in enumerate(CHROMS, start=1)}
+
+BASES = "ACGT"
+BASE_INDEX = {base: i for i, base in enumerate(BASES)}
+
+SNP, DEL, INS, DELINS = range(4)
+
+START_BITS = 28
+EDIT_BITS = 28
+MAX_INS = 12
+MAX_DELINS_INS = 10
+MAX_DELINS_SPAN = 15
+
+_EDIT_MASK = (1 << EDIT_BITS) - 1
+_START_MASK = (1 << START_BITS) - 1
+_SNP_EDITS = {ref + alt: BASE_INDEX[ref] << 2 | BASE_INDEX[alt] for ref in BASES for alt in BASES}
+_SNP_CHANGES = {edit: f"{key[0]}>{key[1]}" for key, edit in _SNP_EDITS.items()}
+
+
+def _pack_seq(seq):
+    packed = 0
+    for base in seq:
+        packed = packed << 2 | BASE_INDEX[base]
+    return packed
+
+
+def _unpack_seq(packed, length):
+    return "".join(BASES[packed >> shift & 3] for shift in range(2 * length - 2, -1, -2))
+
+
+def _key(chrom, start, var_type, edit):
+    return ((chrom << START_BITS | start) << 2 | var_type) << EDIT_BITS | edit
+
+
+def encode(hgvs_id: str) -> Optional[int]:
+    """
+    Return the key of `hgvs_id`, None if it has none: not a snp, del, ins or
+    delins id, or not written the way decode() writes it back.
+    """
+    match = HGVSHelper.ID_PATTERN.fullmatch(hgvs_id)
+    if match is None:
+        return None
+    chrom, start, end, ref, alt, op, seq, no_seq_op = match.groups()
+    chrom = CHROM_INDEX.get(chrom)
+    if chrom is None or start[0] == "0" or (end is not None and end[0] == "0"):
+        return None
+    start = int(start)
+    if start > _START_MASK:
+        return None
+
+    if ref is not None:
+        edit = _SNP_EDITS.get(ref + alt)
+        if edit is None or end is not None:
+            return None
+        return _key(chrom, start, SNP, edit)
+
+    # a span of one position is written without an end, but for insertions
+    span = int(end) - start if end is not None else 0
+    if span < 0 or (span == 0) != (end is None) and op != "ins":
+        return None
+    try:
+        if no_seq_op == "del":
+            return _key(chrom, start, DEL, span) if span <= _EDIT_MASK else None
+        if op == "ins":
+            if span != 1 or len(seq) > MAX_INS:
+                return None
+            return _key(chrom, start, INS, len(seq) << 2 * MAX_INS | _pack_seq(seq))
+        if op == "delins":
+            if span > MAX_DELINS_SPAN or len(seq) > MAX_DELINS_INS:
+                return None
+            return _key(chrom, start, DELINS,
+                        (span << 4 | len(seq)) << 2 * MAX_DELINS_INS | _pack_seq(seq))
+    except KeyError:  # not an ACGT base
+        return None
+    return None
+
+
+def decode(key: int) -> str:
+    """Return the HGVS id of `key`, raise ValueError if it is not a key of encode()."""
+    edit = key & _EDIT_MASK
+    var_type = key >> EDIT_BITS & 3
+    start = key >> EDIT_BITS + 2 & _START_MASK
+    chrom = key >> EDIT_BITS + 2 + START_BITS
+    if not 0 < chrom <= len(CHROMS) or start == 0:
+        raise ValueError(f"Invalid variant key: {key}")
+    prefix = f"chr{CHROMS[chrom - 1]}:g.{start}"
+
+    if var_type == SNP:
+        if edit >> 4:
+            raise ValueError(f"Invalid variant key: {key}")
+        return prefix + _SNP_CHANGES[edit]
+    if var_type == DEL:
+        return f"{prefix}_{start + edit}del" if edit else prefix + "del"
+    if var_type == INS:
+        length = edit >> 2 * MAX_INS
+        if not 0 < length <= MAX_INS:
+            raise ValueError(f"Invalid variant key: {key}")
+        return f"{prefix}_{start + 1}ins{_unpack_seq(edit, length)}"
+    span, length = edit >> 2 * MAX_DELINS_INS + 4, edit >> 2 * MAX_DELINS_INS & 15
+    if not 0 < length <= MAX_DELINS_INS:
+        raise ValueError(f"Invalid variant key: {key}")
+    seq = _unpack_seq(edit, length)
+    return f"{prefix}_{start + span}delins{seq}" if span else f"{prefix}delins{seq}"
+
+
+def to_bytes(key: int) -> bytes:
+    """8 bytes of `key`, in the same order as the keys, for on-disk indexes."""
+    return key.to_bytes(8, "big")
+
+
+def from_bytes(data: bytes) -> int:
+    return int.from_bytes(data, "big")
+
+
+def sort_key(hgvs_id: str):
+    """
+    A sort key of `hgvs_id`, ordering the ids with a key by chromosome and position,
+    then the other ones by id.
+    """
+    key = encode(hgvs_id)
+    return (0, key, "") if key is not None else (1, 0, hgvs_id)
+
+
+class VariantKeySet:
+    """
+    A set of variant ids, holding the integer keys of the ids that have one,
+    the strings of the other ones. Iterates over ids.
+    """
+
+    def __init__(self, ids: Iterable[str] = ()):
+        self.keys = set()
+        self.others = set()
+        self.update(ids)
+
+    def add(self, hgvs_id: str):
+        key = encode(hgvs_id)
+        if key is None:
+            self.others.add(hgvs_id)
+        else:
+            self.keys.add(key)
+
+    def update(self, ids: Iterable[str]):
+        keys, others = self.keys, self.others
+        for hgvs_id in ids:
+            key = encode(hgvs_id)
+            if key is None:
+                others.add(hgvs_id)
+            else:
+                keys.add(key)
+
+    def discard(self, hgvs_id: str):
+        key = encode(hgvs_id)
+        if key is None:
+            self.others.discard(hgvs_id)
+        else:
+            self.keys.discard(key)
+
+    def __contains__(self, hgvs_id: str) -> bool:
+        key = encode(hgvs_id)
+        return hgvs_id in self.others if key is None else key in self.keys
+
+    def __len__(self) -> int:
+        return len(self.keys) + len(self.others)
+
+    def __iter__(self) -> Iterator[str]:
+        for key in self.keys:
+            yield decode(key)
+        yield from self.others
@@ -2,7 +2,10 @@ import sys
 
 from biothings.web.handlers import BaseAPIHandler
 from biothings.web.handlers import BaseQueryHandler
-from biothings.utils.common import dotdict
+
+from web.cache import LRUCache, index_versions
+from web.handlers import CachedResponseMixin
+from web.metrics import metrics
 
 
 class BeaconHandler(BaseQueryHandler):
@@ -11,16 +14,18 @@ class BeaconHandler(BaseQueryHandler):
     assembly_keys = {'NCBI36': 'hg18', 'GRCh37': 'hg19', 'GRCh38': 'hg38'}
     pos_dbs = ['exac', 'cadd']  # These are hg19 ONLY
     assembly_dbs = ['dbnsfp', 'dbsnp', 'clinvar', 'evs', 'mutdb', 'cosmic', 'docm', 'wellderly']
+    # dataset responses shared by all the requests of this process
+    allele_cache = None
 
-    def post(self, src=None):
-        self.receive_data()
+    async def post(self, src=None):
+        await self.receive_data()
         self.event['action'] = 'beacon_post'
 
-    def get(self, src=None):
-        self.receive_data()
+    async def get(self, src=None):
+        await self.receive_data()
         self.event['action'] = 'beacon_get'
 
-    def receive_data(self):
+    async def receive_data(self):
         chrom = self.get_argument('referenceName', None)
         start = self.get_argument('start', None)
         ref = self.get_argument('referenceBases', None)
@@ -38,10 +43,8 @@ class BeaconHandler(BaseQueryHandler):
         if len(datasets) < 1:
             datasets = self.pos_dbs + self.assembly_dbs
         try:
-            dataset_responses = []
-            for dataset in datasets:
-                dataset_responses.append(self.query_dataset(
-                    chrom, start, ref, alt, assembly, dataset))
+            dataset_responses = await self.query_datasets(
+                chrom, start, ref, alt, assembly, datasets)
             exists = any([response['exists'] for response in dataset_responses])
             out = {'exists': exists, 'alleleRequest': allele_request}
             if include_datasets:
@@ -59,38 +62,101 @@ class BeaconHandler(BaseQueryHandler):
         # Return the JSON response
         self.finish(out)
 
-    def query_dataset(self, chrom, start, ref, alt, assembly, dataset):
-        # Initialzie output
-        out = {'datasetId': dataset, 'exists': False}
+    def build_dataset_query(self, chrom, start, ref, alt, assembly, dataset):
+        """
+        Prepare the ES lookup of a single dataset.
+
+        Returns a (q_type, index, query_string) tuple, or None when the
+        dataset cannot answer this allele request.
+        """
         q_type = 'snp'
 
         # verify information and build query string
-        if dataset in self.pos_dbs + self.assembly_dbs:
-            if chrom and start and alt and assembly in self.assembly_keys:
-                assembly = self.assembly_keys[assembly]  # get hg assembly notation
-                if alt[:3] == 'DEL':  # syntax: "alternateBases": "DEL85689"
-                    q_type = 'del'
-                    ref = ''
-                elif alt[:3] == 'DUP':  # "alternateBases": "DUP85689"
-                    q_type = 'dup'
-                    ref = ''
-                elif not ref:
-                    q_type = 'ins'
-                    ref = ''
-
-                q = self.format_query_string(q_type, chrom, start, ref, alt, assembly, dataset)
-                # perform query and format result
-                # for now always search against hg19 index...
-                res = self.web_settings.es_client.search(
-                    index=self.web_settings.ES_INDICES[assembly],
-                    body={"query": {"query_string": {"query": q}}},
-                    _source=[dataset]
-                )
-                res = self.result_transform.transform(res, dotdict(dotfield=True))
-                if res and res.get('total') > 0:
-                    out = self.format_output(res, out, q_type)
+        if dataset not in self.pos_dbs + self.assembly_dbs:
+            return None
+        if not (chrom and start and alt and assembly in self.assembly_keys):
+            return None
 
-        return out
+        assembly = self.assembly_keys[assembly]  # get hg assembly notation
+        if alt[:3] == 'DEL':  # syntax: "alternateBases": "DEL85689"
+            q_type = 'del'
+            ref = ''
+        elif alt[:3] == 'DUP':  # "alternateBases": "DUP85689"
+            q_type = 'dup'
+            ref = ''
+        elif not ref:
+            q_type = 'ins'
+            ref = ''
+
+        q = self.format_query_string(q_type, chrom, start, ref, alt, assembly, dataset)
+        return q_type, self.biothings.config.ES_INDICES[assembly], q
+
+    def get_allele_cache(self):
+        cls = type(self)
+        if cls.allele_cache is None:
+            cls.allele_cache = LRUCache(
+                maxsize=self.biothings.config.BEACON_CACHE_SIZE,
+                ttl=self.biothings.config.BEACON_CACHE_TTL)
+            metrics.register('beacon.allele_cache', cls.allele_cache.stats)
+        return cls.allele_cache
+
+    @staticmethod
+    def allele_cache_key(chrom, start, ref, alt, assembly, dataset):
+        values = [chrom, start, ref, alt, assembly]
+        values = [value.strip() if value else '' for value in values]
+        if values[1].isdigit():
+            values[1] = str(int(values[1]))  # leading zeros
+        return (*values, dataset)
+
+    async def query_datasets(self, chrom, start, ref, alt, assembly, datasets):
+        """
+        Look up all the requested datasets in a single _msearch round trip.
+        The returned dataset responses are in the same order as `datasets`.
+
+        Dataset responses are cached per allele and dataset, and tagged with
+        the build version of the index they came from.
+        """
+        outs = [{'datasetId': dataset, 'exists': False} for dataset in datasets]
+        cache = self.get_allele_cache()
+        client = self.biothings.elasticsearch.async_client
+
+        lookups, body = [], []
+        for i, dataset in enumerate(datasets):
+            prepared = self.build_dataset_query(chrom, start, ref, alt, assembly, dataset)
+            if prepared:
+                q_type, index, q = prepared
+                key = self.allele_cache_key(chrom, start, ref, alt, assembly, dataset)
+                version = await index_versions.version(client, index)
+                cached = cache.get(key, version)
+                if cached is not None:
+                    outs[i] = cached
+                    continue
+                lookups.append((i, q_type, key, version))
+                body.append({'index': index})
+                body.append({
+                    'query': {'query_string': {'query': q}},
+                    '_source': [dataset]
+                })
+        if not lookups:
+            return outs
+
+        res = await client.msearch(body=body)
+
+        # map the responses back to their datasets
+        formatter = self.biothings.pipeline.formatter
+        for (i, q_type, key, version), response in zip(lookups, res['responses']):
+            if 'error' in response:
+                outs[i]['error'] = {
+                    'errorCode': response.get('status'),
+                    'errorMessage': response['error'].get('reason')
+                }
+                continue
+            response = formatter.transform(response, dotfield=True)
+            if response and response.get('total') > 0:
+                outs[i] = self.format_output(response, outs[i], q_type)
+            cache.set(key, outs[i], version)
+
+        return outs
 
     def format_query_string(self, q_type, chrom, start, ref, alt, assembly, dataset):
         # Initialize some variables specific to Deletions and Duplicatoins
@@ -133,7 +199,7 @@ class BeaconHandler(BaseQueryHandler):
         return out
 
 
-class BeaconInfoHandler(BaseAPIHandler):
+class BeaconInfoHandler(CachedResponseMixin, BaseAPIHandler):
 
     # Current list of datasets in myvariant.info
     dataset_names = [
@@ -141,21 +207,30 @@ class BeaconInfoHandler(BaseAPIHandler):
         'mutdb', 'cosmic', 'docm', 'wellderly', 'exac'
     ]
 
-    def prepare(self):
-        self.meta = {
-            'GRCh37': self.web_settings.source_metadata['hg19']['src'],
-            'GRCh38': self.web_settings.source_metadata['hg38']['src']
-        }
+    assemblies = {'GRCh37': 'hg19', 'GRCh38': 'hg38'}
 
-    def get(self):
-        self.get_beacon_info()
+    async def get(self):
+        await self.get_beacon_info()
         self.event['action'] = 'beacon_info_post'
 
-    def post(self):
-        self.get_beacon_info()
+    async def post(self):
+        await self.get_beacon_info()
         self.event['action'] = 'beacon_info_post'
 
-    def get_beacon_info(self):
+    def response_indices(self):
+        config = self.biothings.config
+        return [config.ES_INDICES[assembly] for assembly in self.assemblies.values()]
+
+    async def get_beacon_info(self):
+        await self.finish_cached('info', self.beacon_info)
+
+    async def beacon_info(self):
+        metadata = self.biothings.metadata
+        sources_by_assembly = {}
+        for assembly, biothing_type in self.assemblies.items():
+            await metadata.refresh(biothing_type)
+            sources_by_assembly[assembly] = metadata.get_metadata(biothing_type)['src']
+
         # Boilerplate Beacon Info
         out = {
             'id': 'myvariant.info',
@@ -167,7 +242,7 @@ class BeaconInfoHandler(BaseAPIHandler):
         # Loop through datasets to generate info
         datasets = {}
 
-        for assembly, sources in self.meta.items():
+        for assembly, sources in sources_by_assembly.items():
             for source, meta in sources.items():
                 version = meta['version']
                 for dataset, count in meta['stats'].items():
@@ -186,6 +261,4 @@ class BeaconInfoHandler(BaseAPIHandler):
                             }
 
         out['datasets'] = list(datasets.values())
-
-        # Return info
-        self.finish(out)
+        return out
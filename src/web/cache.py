@@ -0,0 +1,347 @@
+"""
+In-process caches shared by the web handlers and the query pipeline.
+
+Cached entries are tagged with the `_meta.build_version` of the ES index
+they were computed from, so that publishing a new index release makes
+them stale without any explicit invalidation.
+"""
+import asyncio
+import copy
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+
+from utils.compression import PRECOMPRESS_LEVELS, compress
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache:
+    """
+    A bounded least-recently-used mapping with an optional time-to-live.
+
+    Reading an entry stored under a different version than the one asked
+    for counts as a miss and drops the entry.
+    """
+
+    def __init__(self, maxsize=1024, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, version=None, default=None):
+        entry = self._data.get(key)
+        if entry is not None:
+            value, entry_version, expires = entry
+            if entry_version == version and (expires is None or expires > time.monotonic()):
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._data[key]
+        self.misses += 1
+        return default
+
+    def set(self, key, value, version=None):
+        if self.maxsize <= 0:
+            return
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        self._data[key] = (value, version, expires)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self):
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+class IndexVersionTracker:
+    """
+    Keep track of the `_meta.build_version` of ES indices.
+
+    Looking a version up costs a mapping request, so the answer is reused
+    for `ttl` seconds before asking ES again.
+    """
+
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self._versions = {}  # index -> (version, checked_at)
+
+    def peek(self, index):
+        """Return the last known version of `index` without contacting ES."""
+        known = self._versions.get(index)
+        return known[0] if known else None
+
+    async def version(self, client, index):
+        known = self._versions.get(index)
+        if known and time.monotonic() - known[1] < self.ttl:
+            return known[0]
+
+        res = await client.indices.get_mapping(
+            index=index, filter_path="*.mappings._meta.build_version")
+        res = getattr(res, "body", res)  # elasticsearch>=8 wraps the response
+
+        # an alias may point to more than one index
+        versions = sorted({
+            str(mapping["mappings"]["_meta"]["build_version"])
+            for mapping in res.values()
+        })
+        if not versions:
+            version = None
+        elif len(versions) == 1:
+            version = versions[0]
+        else:
+            version = tuple(versions)
+
+        self._versions[index] = (version, time.monotonic())
+        return version
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical async calls.
+
+    While a call for a key is in flight, other callers of the same key wait
+    for its result instead of making the call again. When a result is
+    shared, every caller gets its own deep copy of it, as the formatters
+    modify responses in place.
+    """
+
+    def __init__(self):
+        self.coalesced = 0
+        self._calls = {}  # key -> [future, number of callers]
+
+    def __len__(self):
+        return len(self._calls)
+
+    async def do(self, key, func, *args, **kwargs):
+        call = self._calls.get(key)
+        if call is not None:
+            call[1] += 1
+            self.coalesced += 1
+            try:
+                # a cancelled waiter must not cancel the call of the others
+                result = await asyncio.shield(call[0])
+            except asyncio.CancelledError:
+                if not call[0].cancelled():
+                    raise
+                # the caller making the call was cancelled, not us
+                return await self.do(key, func, *args, **kwargs)
+            return copy.deepcopy(result)
+
+        future = asyncio.get_running_loop().create_future()
+        call = self._calls[key] = [future, 1]
+        try:
+            result = await func(*args, **kwargs)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as exc:
+            future.set_exception(exc)
+            future.exception()  # retrieved, even when nobody else waits
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            del self._calls[key]
+
+        return copy.deepcopy(result) if call[1] > 1 else result
+
+
+class FileLoader:
+    """
+    Keep the files exported by the hub for the web nodes loaded, by key,
+    e.g. the rsid table of each assembly.
+
+    `path` is a template of the file names, like "rsid_{key}.tbl", and
+    `load(path)` returns the object to keep, with a `version` attribute.
+    A file is loaded again when it changes on disk, which is checked for
+    at most every `check_interval` seconds, or right away when asked for
+    another version than the one loaded.
+    """
+
+    def __init__(self, path, load, check_interval=60):
+        self.path = path
+        self.load = load
+        self.check_interval = check_interval
+        self._files = {}  # key -> (object or None, mtime, checked_at)
+
+    def get(self, key, version=None):
+        """Return the object loaded from the file of `key`, or None if there is none."""
+        known = self._files.get(key)
+        if known and time.monotonic() - known[2] < self.check_interval:
+            if version is None or known[0] is None or known[0].version == str(version):
+                return known[0]
+
+        path = self.path.format(key=key)
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            mtime = None
+
+        loaded = known[0] if known else None
+        if not known or mtime != known[1]:
+            # the previous object may still be in use by another thread,
+            # it is closed when garbage collected.
+            loaded = None
+            if mtime is not None:
+                try:
+                    loaded = self.load(path)
+                    logger.info("Loaded %s, version %s.", path, loaded.version)
+                except (OSError, ValueError):
+                    logger.exception("Cannot load %s.", path)
+        self._files[key] = (loaded, mtime, time.monotonic())
+        return loaded
+
+
+class CachedResponse:
+    """
+    A response body, kept as sent, and compressed with each content
+    encoding the first time it is asked for, see utils.compression.
+
+    The ETags are digests of the body, the same on every web node,
+    one per encoding.
+    """
+
+    __slots__ = ("body", "digest", "_encoded")
+
+    def __init__(self, body):
+        if isinstance(body, str):
+            body = body.encode()
+        self.body = body
+        self.digest = hashlib.sha1(body).hexdigest()
+        self._encoded = {}
+
+    def __len__(self):
+        return len(self.body)
+
+    def encode(self, encoding=None):
+        """Return the body compressed with `encoding`, as is if None, and its ETag."""
+        if encoding is None:
+            return self.body, '"%s"' % self.digest
+        body = self._encoded.get(encoding)
+        if body is None:
+            body = self._encoded[encoding] = compress(self.body, encoding, PRECOMPRESS_LEVELS[encoding])
+        return body, '"%s-%s"' % (self.digest, encoding)
+
+
+class MemoryStore:
+    """
+    A shared store of ResultCache kept in this process, a stand-in of a
+    store shared by the web nodes, e.g. in tests or on a single node.
+    """
+
+    def __init__(self):
+        self._data = {}  # key -> (value, expires)
+
+    def __len__(self):
+        return len(self._data)
+
+    async def get(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires = entry
+        if expires is not None and expires <= time.monotonic():
+            del self._data[key]
+            return None
+        return value
+
+    async def set(self, key, value, ttl=None):
+        self._data[key] = (value, time.monotonic() + ttl if ttl else None)
+
+
+class RedisStore:
+    """
+    A shared store of ResultCache on a redis server, given a
+    redis.asyncio client, e.g. redis.asyncio.from_url("redis://cache:6379").
+    """
+
+    def __init__(self, client, prefix="myvariant:"):
+        self.client = client
+        self.prefix = prefix
+
+    async def get(self, key):
+        return await self.client.get(self.prefix + key)
+
+    async def set(self, key, value, ttl=None):
+        await self.client.set(self.prefix + key, value, ex=ttl)
+
+
+class ResultCache:
+    """
+    Search responses by key, tagged with the version of the index searched,
+    kept in a local LRUCache, and, when given, in a `shared` store of all the
+    web processes, e.g. a RedisStore: any store with async get(key) and
+    set(key, value, ttl) methods of bytes values.
+
+    Responses are modified by the formatters, every caller gets its own copy.
+    The shared store being unavailable only makes for cache misses.
+    """
+
+    def __init__(self, maxsize=1024, ttl=3600, shared=None):
+        self.local = LRUCache(maxsize=maxsize, ttl=ttl)
+        self.ttl = ttl
+        self.shared = shared
+        self.shared_hits = 0
+        self.shared_errors = 0
+
+    @staticmethod
+    def shared_key(key, version):
+        # a new index release is a new key, the stale entries expire
+        return hashlib.sha1(json.dumps([str(version), key]).encode()).hexdigest()
+
+    async def get(self, key, version):
+        response = self.local.get(key, version)
+        if response is not None:
+            return copy.deepcopy(response)
+        if self.shared is None:
+            return None
+        try:
+            data = await self.shared.get(self.shared_key(key, version))
+        except Exception:  # the store is pluggable, so are its errors
+            self.shared_errors += 1
+            logger.warning("Cannot read the shared result cache.", exc_info=True)
+            return None
+        if data is None:
+            return None
+        self.shared_hits += 1
+        response = json.loads(data)
+        self.local.set(key, response, version)
+        return copy.deepcopy(response)
+
+    async def set(self, key, version, response):
+        self.local.set(key, copy.deepcopy(response), version)
+        if self.shared is None:
+            return
+        try:
+            await self.shared.set(self.shared_key(key, version), json.dumps(response).encode(), self.ttl)
+        except Exception:  # the store is pluggable, so are its errors
+            self.shared_errors += 1
+            logger.warning("Cannot write to the shared result cache.", exc_info=True)
+
+    def stats(self):
+        return {
+            **self.local.stats(),
+            "shared_hits": self.shared_hits,
+            "shared_errors": self.shared_errors
+        }
+
+
+# shared by everything in the web process
+index_versions = IndexVersionTracker()
@@ -0,0 +1,131 @@
+"""
+Response compression, with the zstd, br or gzip content encoding the client
+prefers, see utils.compression.
+
+CompressionTransform replaces tornado's GZipContentEncoding, its levels,
+minimum response size and encodings are set with the --compression_*
+options of the web server. Cached payloads, like the metadata responses
+(see web.handlers.CachedResponseMixin) and the static pages, are
+compressed once, at the highest levels, and sent as is.
+"""
+import os
+
+from tornado.options import define, options
+from tornado.web import GZipContentEncoding, HTTPError, OutputTransform, StaticFileHandler
+
+from utils.compression import ENCODINGS, compressor, negotiate
+from web.cache import CachedResponse, LRUCache
+
+define("compression_encodings", default=",".join(ENCODINGS), type=str,
+       help="content encodings of the responses, by preference, among " + ", ".join(ENCODINGS))
+define("compression_min_length", default=1024, type=int,
+       help="size of the smallest response compressed, in bytes")
+define("compression_level_gzip", default=6, type=int, help="gzip compression level, 1-9")
+define("compression_level_br", default=4, type=int, help="brotli compression quality, 0-11")
+define("compression_level_zstd", default=3, type=int, help="zstd compression level, 1-22")
+
+
+def enabled_encodings():
+    return tuple(encoding.strip() for encoding in options.compression_encodings.split(",")
+                 if encoding.strip() in ENCODINGS)
+
+
+class CompressionTransform(OutputTransform):
+    """
+    Compress responses, streamed ones chunk by chunk, as GZipContentEncoding
+    does, with the best encoding the client accepts.
+    """
+    CONTENT_TYPES = GZipContentEncoding.CONTENT_TYPES | {
+        "application/x-ndjson",
+        "application/x-msgpack",
+    }
+
+    def __init__(self, request):
+        self._encoding = negotiate(request.headers.get("Accept-Encoding", ""), enabled_encodings())
+        self._compressor = None
+
+    @classmethod
+    def compressible_type(cls, ctype):
+        return ctype.startswith("text/") or ctype in cls.CONTENT_TYPES
+
+    def transform_first_chunk(self, status_code, headers, chunk, finishing):
+        if self._encoding:
+            # the response depends on the encodings the client accepts
+            if "Vary" in headers:
+                headers["Vary"] += ", Accept-Encoding"
+            else:
+                headers["Vary"] = "Accept-Encoding"
+            ctype = headers.get("Content-Type", "").split(";")[0]
+            if (self.compressible_type(ctype)
+                    and (not finishing or len(chunk) >= options.compression_min_length)
+                    and "Content-Encoding" not in headers
+                    and status_code not in (204, 304)):
+                headers["Content-Encoding"] = self._encoding
+                level = getattr(options, "compression_level_" + self._encoding)
+                self._compressor = compressor(self._encoding, level)
+                chunk = self.transform_chunk(chunk, finishing)
+                if "Content-Length" in headers:
+                    if finishing:
+                        headers["Content-Length"] = str(len(chunk))
+                    else:
+                        del headers["Content-Length"]
+        return status_code, headers, chunk
+
+    def transform_chunk(self, chunk, finishing):
+        if self._compressor is None:
+            return chunk
+        # flushed, each chunk written can be decompressed as soon as it is received
+        data = self._compressor.compress(chunk)
+        return data + (self._compressor.finish() if finishing else self._compressor.flush())
+
+
+class PrecompressedStaticFileHandler(StaticFileHandler):
+    """
+    Serve static files compressed once per encoding, e.g. the pages of the
+    demo and standalone apps. Range requests, large files, and clients
+    accepting none of the encodings get the file as is.
+    """
+    MAX_SIZE = 16 * 1024 * 1024  # bytes, of the files kept compressed
+
+    # (path, mtime) -> CachedResponse
+    files = LRUCache(maxsize=256)
+
+    async def get(self, path, include_body=True):
+        encoding = negotiate(self.request.headers.get("Accept-Encoding", ""), enabled_encodings())
+        if encoding is None or "Range" in self.request.headers:
+            return await super().get(path, include_body)
+
+        self.path = self.parse_url_path(path)
+        absolute_path = self.get_absolute_path(self.root, self.path)
+        self.absolute_path = self.validate_absolute_path(self.root, absolute_path)
+        if self.absolute_path is None:  # redirected
+            return
+        stat = os.stat(self.absolute_path)
+        ctype = self.get_content_type()
+        if stat.st_size > self.MAX_SIZE or not CompressionTransform.compressible_type(ctype.split(";")[0]):
+            return await super().get(path, include_body)
+
+        key = (self.absolute_path, stat.st_mtime)
+        response = self.files.get(key)
+        if response is None:
+            try:
+                with open(self.absolute_path, "rb") as f:
+                    response = CachedResponse(f.read())
+            except OSError:
+                raise HTTPError(404)
+            self.files.set(key, response)
+        body, etag = response.encode(encoding)
+
+        self.set_header("Content-Type", ctype)
+        self.set_header("Content-Encoding", encoding)
+        self.set_header("Etag", etag)
+        modified = self.get_modified_time()
+        if modified is not None:
+            self.set_header("Last-Modified", modified)
+        self.set_extra_headers(path)
+        if self.check_etag_header():
+            self.set_status(304)
+            return
+        self.set_header("Content-Length", len(body))
+        if include_body:
+            self.write(body)
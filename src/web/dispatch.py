@@ -0,0 +1,149 @@
+"""
+Annotation id dispatcher.
+
+Finds the fields an id of an annotation request is looked up in, as the
+query string parser of the framework does with ANNOTATION_ID_REGEX_LIST:
+the first pattern fully matching the id gives its scopes, the "term" and
+"scope" named groups of the pattern, if any, override the id and the
+scopes. Instead of trying each pattern in turn, the patterns are compiled
+into a single alternation, tried in the same order by the regex engine.
+As the parser of the framework, scopes which are not fields of the index,
+according to its metadata, fall back to the default scopes.
+"""
+import re
+from collections import namedtuple
+from contextlib import contextmanager
+
+Query = namedtuple('Query', ('term', 'scopes'))
+
+# flags that can be set on a part of a pattern only
+SCOPED_FLAGS = {re.IGNORECASE: 'i', re.MULTILINE: 'm', re.DOTALL: 's', re.VERBOSE: 'x', re.ASCII: 'a'}
+
+# numbered backreferences and conditionals, which would refer to
+# other groups once the patterns are combined
+NUMBERED_REFERENCE = re.compile(r'\\[1-9]|\(\?\(\d')
+
+
+def _alternative(index, regex):
+    """Wrap the source of `regex` in a group named after its position."""
+    prefix = f'p{index}_'
+    source = regex.pattern
+    source = re.sub(r'\(\?P<(\w+)>', lambda m: f'(?P<{prefix}{m[1]}>', source)
+    source = re.sub(r'\(\?P=(\w+)\)', lambda m: f'(?P={prefix}{m[1]})', source)
+    source = re.sub(r'\(\?\(([A-Za-z_]\w*)\)', lambda m: f'(?({prefix}{m[1]})', source)
+    flags = ''.join(flag for value, flag in SCOPED_FLAGS.items() if regex.flags & value)
+    if flags:
+        # a trailing comment of a verbose pattern must not hide the closing parenthesis
+        source = f'(?{flags}:{source}\n)' if 'x' in flags else f'(?{flags}:{source})'
+    return f'(?P<p{index}>{source})'
+
+
+class IDDispatcher:
+    """
+    Parse annotation ids against a list of (regex, scopes) patterns.
+
+    Patterns that cannot be combined, e.g. using numbered backreferences
+    or global inline flags, make the dispatcher try the patterns in turn.
+    `fields`, if given, returns the fields of the index from its metadata,
+    or None if unknown, as QStringParser._build_endpoint_metadata_fields.
+    """
+
+    def __init__(self, patterns=(), default_scopes=('_id',), gpnames=('term', 'scope'), fields=None):
+        self.default_scopes = default_scopes
+        self.gpnames = gpnames
+        self.fields = fields
+        self.patterns = []
+        for regex, scopes in patterns:
+            if isinstance(regex, str):
+                regex = re.compile(regex)
+            if isinstance(scopes, str):
+                scopes = [scopes]
+            self.patterns.append((regex, scopes))
+
+        self.regex = self._combine()
+        self._batch = {}
+        self._batch_fields = None
+
+    def _combine(self):
+        if not self.patterns:
+            return None
+        if any(NUMBERED_REFERENCE.search(regex.pattern) for regex, _ in self.patterns):
+            return None
+        try:
+            combined = re.compile('|'.join(
+                _alternative(index, regex) for index, (regex, _) in enumerate(self.patterns)))
+        except re.error:  # e.g. "(?i)" not at the start of the combined pattern
+            return None
+
+        # group names to read, by alternative
+        self._groups = {}
+        for index, (regex, scopes) in enumerate(self.patterns):
+            term, scope = (
+                f'p{index}_{name}' if name in regex.groupindex else None
+                for name in self.gpnames
+            )
+            self._groups[f'p{index}'] = (term, scope, scopes)
+        return combined
+
+    def _parse(self, q):
+        if self.regex is None:
+            for regex, scopes in self.patterns:
+                match = regex.fullmatch(q)
+                if match:
+                    named_groups = match.groupdict()
+                    scope = named_groups.get(self.gpnames[1])
+                    return Query(
+                        named_groups.get(self.gpnames[0]) or q,
+                        [scope] if scope else scopes or self.default_scopes)
+            return Query(q, self.default_scopes)
+
+        match = self.regex.fullmatch(q)
+        if not match:
+            return Query(q, self.default_scopes)
+        term, scope, scopes = self._groups[match.lastgroup]
+        scope = scope and match.group(scope)
+        return Query(
+            term and match.group(term) or q,
+            [scope] if scope else scopes or self.default_scopes)
+
+    def _check(self, q, query, fields):
+        if fields is not None and not set(query.scopes) <= fields:
+            return Query(q, self.default_scopes)
+        return query
+
+    def parse(self, q, metadata=None):
+        """
+        Return the Query, the term and scopes, of id `q`,
+        called as QStringParser.parse by the query builder.
+        """
+        assert isinstance(q, str)
+        query = self._batch.get(q)
+        if query is not None:
+            return self._check(q, query, self._batch_fields)
+        query = self._parse(q)
+        if metadata is not None and self.fields is not None:
+            return self._check(q, query, self.fields(metadata))
+        return query
+
+    def classify(self, ids):
+        """
+        Group `ids` by the scopes they are looked up in, in one pass.
+        Return {scopes: [(position in ids, term), ...]}, scopes as tuples.
+        """
+        groups = {}
+        for position, q in enumerate(ids):
+            term, scopes = self.parse(q)
+            groups.setdefault(tuple(scopes), []).append((position, term))
+        return groups
+
+    @contextmanager
+    def batch(self, ids, metadata=None):
+        """Parse `ids` once, for the parse() calls made in this context."""
+        self._batch = {q: self._parse(q) for q in ids if isinstance(q, str)}
+        if metadata is not None and self.fields is not None:
+            self._batch_fields = self.fields(metadata)
+        try:
+            yield self
+        finally:
+            self._batch = {}
+            self._batch_fields = None
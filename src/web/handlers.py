@@ -1,8 +1,28 @@
-from tornado.web import RequestHandler
+import gzip
+import io
+import json
+import tempfile
+from urllib.parse import quote
+
+from tornado.iostream import StreamClosedError
+from tornado.web import Finish, HTTPError, RequestHandler, stream_request_body
 
 from biothings.web.handlers import (
+    BaseAPIHandler,
+    BiothingHandler,
     MetadataFieldHandler,
-    MetadataSourceHandler)
+    MetadataSourceHandler,
+    QueryHandler)
+from biothings.utils.serializer import to_json
+from biothings.web.handlers.query import capture_exceptions
+from biothings.web.query.pipeline import QueryPipelineInterrupt
+
+from utils.compression import negotiate
+from utils.hgvs import get_hgvs_from_vcf_record
+from web.cache import CachedResponse, LRUCache, index_versions
+from web.compression import enabled_encodings
+from web.metrics import metrics
+from web.pipeline import configure_pipeline, search_response
 
 
 class AssemblyAwareMixin(RequestHandler):
@@ -12,9 +32,315 @@ class AssemblyAwareMixin(RequestHandler):
         self.biothing_type = self.args.assembly
 
 
-class MVMetadataFieldHandler(AssemblyAwareMixin, MetadataFieldHandler):
+class PipelineSettingsMixin(RequestHandler):
+    """
+    Apply the settings of config_web to the query pipeline
+    before it is used, see web.pipeline.configure_pipeline.
+    """
+
+    async def prepare(self):
+        super().prepare()
+        await configure_pipeline(self.biothings)
+
+
+class CachedResponseMixin(RequestHandler):
+    """
+    Cache JSON responses per request arguments, for the index releases
+    they are computed from.
+
+    A response is serialized, and compressed once per content encoding
+    (see web.compression), then sent as is, with an ETag, until the
+    `_meta.build_version` of one of its indices changes. Requests with a
+    matching If-None-Match get a 304.
+    """
+    # shared by the handlers of this process, created on first use
+    response_cache = None
+
+    def response_indices(self):
+        """The indices the responses of this handler are computed from."""
+        return [self.biothings.config.ES_INDICES[self.biothing_type]]
+
+    async def finish_cached(self, key, render):
+        """
+        Finish the request with the response cached under `key`,
+        or with `await render()`, serialized and cached.
+        """
+        cls = CachedResponseMixin
+        if cls.response_cache is None:
+            cls.response_cache = LRUCache(maxsize=self.biothings.config.RESPONSE_CACHE_SIZE)
+            metrics.register('response_cache', cls.response_cache.stats)
+
+        client = self.biothings.elasticsearch.async_client
+        versions = tuple([await index_versions.version(client, index) for index in self.response_indices()])
+        key = (type(self).__name__, key)
+        response = cls.response_cache.get(key, versions)
+        if response is None:
+            response = CachedResponse(to_json(await render()))
+            if None not in versions:  # no build_version to tell when it is stale
+                cls.response_cache.set(key, response, versions)
+
+        encoding = negotiate(self.request.headers.get('Accept-Encoding', ''), enabled_encodings())
+        body, etag = response.encode(encoding)
+        self.set_header('Content-Type', 'application/json; charset=UTF-8')
+        self.set_header('Etag', etag)
+        if encoding:
+            self.set_header('Content-Encoding', encoding)
+        if self.request.method in ('GET', 'HEAD') and self.check_etag_header():
+            self.set_status(304)
+            return self.finish()
+        RequestHandler.write(self, body)  # already serialized
+        return self.finish()
+
+
+class CachedGetMixin(CachedResponseMixin):
+    """
+    Cache the JSON responses of a biothings GET handler,
+    by arguments, see CachedResponseMixin.
+    """
+
+    async def get(self, *args, **kwargs):
+        if self.format != 'json':
+            return await super().get(*args, **kwargs)
+        key = tuple(sorted((name, repr(value)) for name, value in self.args.items()))
+        await self.finish_cached(key, lambda: self._render_cached(super(CachedGetMixin, self).get, *args, **kwargs))
+
+    async def _render_cached(self, method, *args, **kwargs):
+        """Return what `method` finishes the request with, without finishing it."""
+        self._rendering = True
+        try:
+            await method(*args, **kwargs)
+        except Finish as finish:
+            return finish.args[0] if finish.args else None
+        finally:
+            self._rendering = False
+        return self._rendered
+
+    def finish(self, chunk=None):
+        if getattr(self, '_rendering', False):
+            self._rendered = chunk
+            return None
+        return super().finish(chunk)
+
+
+class MVMetadataFieldHandler(AssemblyAwareMixin, CachedGetMixin, MetadataFieldHandler):
+    pass
+
+
+class MVMetadataSourceHandler(AssemblyAwareMixin, CachedGetMixin, MetadataSourceHandler):
     pass
 
 
-class MVMetadataSourceHandler(AssemblyAwareMixin, MetadataSourceHandler):
+class MVMetricsHandler(BaseAPIHandler):
+    name = 'metrics'
+
+    def get(self):
+        self.finish(metrics.snapshot())
+
+
+class MVBiothingHandler(PipelineSettingsMixin, BiothingHandler):
     pass
+
+
+class MVRegionQueryHandler(PipelineSettingsMixin, BaseAPIHandler):
+    """
+    Batch genomic region query.
+
+    POST a list of "chr<N>:<start>-<end>" or "chr<N>:<pos>" regions, and
+    optionally a query string `q` they share, to get the hits of each
+    region in one request. Few regions are answered by a single search,
+    more are sent as chunked, concurrent _msearch requests.
+    """
+    name = 'region'
+
+    async def post(self):
+        config = self.biothings.config
+        pipeline = self.biothings.pipeline
+        options = dict(self.args)
+        regions = options.pop('regions')
+        q = options.pop('q', None)
+
+        combine = len(regions) <= config.REGION_QUERY_COMBINE_MAX and \
+            options['size'] <= config.REGION_QUERY_COMBINE_MAX_SIZE
+        try:
+            searches = pipeline.builder.build_region_queries(
+                regions, q, combine=combine, **options)
+        except ValueError as exc:
+            raise HTTPError(400, reason=str(exc))
+
+        responses = await pipeline.backend.multisearch(
+            searches,
+            chunk_size=config.REGION_QUERY_CHUNK_SIZE,
+            concurrency=config.REGION_QUERY_CONCURRENCY,
+            **options)
+        self.finish(pipeline.formatter.transform_regions(regions, responses, combine, **options))
+
+
+class MVQueryHandler(PipelineSettingsMixin, QueryHandler):
+    """
+    Query handler, with a streaming mode for large result sets.
+
+    With stream=true, all the hits of the query are fetched as with
+    fetch_all, and written as newline-delimited JSON, one hit per line,
+    each scroll page being flushed to the client before the next one is
+    requested from ES.
+    """
+
+    @capture_exceptions
+    async def get(self, *args, **kwargs):
+        if not self.args.stream:
+            return await super().get(*args, **kwargs)
+
+        pipeline = self.biothings.pipeline
+        options = dict(self.args)
+        options.pop('stream')
+        q = options.pop('q', None)
+        options['fetch_all'] = True
+
+        self.set_header('Content-Type', 'application/x-ndjson; charset=UTF-8')
+        response = await pipeline.search(q, **options)
+        while True:
+            hits = response.get('hits') or []
+            # already serialized, BaseAPIHandler.write would serialize the lines again
+            RequestHandler.write(self, ''.join(json.dumps(hit, separators=(',', ':')) + '\n' for hit in hits))
+            try:
+                # wait until the page is sent, this process keeps at most one page in memory
+                await self.flush()
+            except StreamClosedError:  # the client went away
+                return
+
+            scroll_id = response.get('_scroll_id')
+            if not hits or not scroll_id:
+                break
+            try:
+                response = await pipeline.search(None, **{**options, 'scroll_id': scroll_id})
+            except QueryPipelineInterrupt:  # the end of the scroll, see capturesESExceptions
+                break
+
+        self.finish()
+
+
+@stream_request_body
+class MVVCFAnnotationHandler(PipelineSettingsMixin, BaseAPIHandler):
+    """
+    Annotate the variants of a VCF file.
+
+    POST a VCF file, plain, gzip or bgzip compressed, as the request body.
+    The HGVS id of each ALT allele of each record is looked up by batches
+    of records, and the annotated records are streamed back, as NDJSON, one
+    line per record, or with out=vcf as the VCF file itself, annotations
+    in a MYVARIANT INFO field. The upload is spooled to a temporary file
+    and read back batch by batch, the memory used does not depend on its size.
+    """
+    name = 'vcf'
+
+    INFO_HEADER = (
+        '##INFO=<ID=MYVARIANT,Number=A,Type=String,'
+        'Description="MyVariant.info annotation of each ALT allele, URL-encoded JSON">\n'
+    )
+
+    async def prepare(self):
+        await super().prepare()
+        self.request.connection.set_max_body_size(self.biothings.config.VCF_UPLOAD_MAX_SIZE)
+        self.upload = tempfile.TemporaryFile()
+
+    def data_received(self, chunk):
+        self.upload.write(chunk)
+
+    def write(self, chunk):
+        # the records are already serialized, BaseAPIHandler.write would serialize them again
+        RequestHandler.write(self, chunk)
+
+    def on_finish(self):
+        upload = getattr(self, 'upload', None)
+        if upload is not None:
+            upload.close()
+
+    def lines(self):
+        self.upload.seek(0)
+        compressed = self.upload.read(2) == b'\x1f\x8b'
+        self.upload.seek(0)
+        # bgzip files are multi-member gzip files
+        raw = gzip.GzipFile(fileobj=self.upload) if compressed else self.upload
+        return io.TextIOWrapper(raw, encoding='utf-8', errors='replace')
+
+    async def annotate(self, lines, vcf, options):
+        config = self.biothings.config
+        pipeline = self.biothings.pipeline
+
+        records = []
+        for line in lines:
+            fields = line.rstrip('\r\n').split('\t')
+            try:
+                records.append((fields, get_hgvs_from_vcf_record(fields)))
+            except (IndexError, ValueError):  # not a VCF record
+                records.append((fields, None))
+
+        ids = [_id for _, record_ids in records if record_ids for _id in record_ids if _id]
+        hits = await pipeline.backend.mget_ids(
+            ids,
+            chunk_size=config.VCF_ANNOTATION_MGET_SIZE,
+            concurrency=config.VCF_ANNOTATION_CONCURRENCY,
+            **options)
+        found = [hit for hit in hits if hit]
+        docs = pipeline.formatter.transform(search_response(found, len(found)), **options)['hits']
+        docs = {doc['_id']: doc for doc in docs}
+
+        out = []
+        for fields, record_ids in records:
+            if vcf:
+                if record_ids is not None:
+                    fields += ['.'] * (8 - len(fields))
+                    value = ','.join(
+                        quote(json.dumps(docs[_id], separators=(',', ':')), safe='') if _id in docs else '.'
+                        for _id in record_ids)
+                    info = 'MYVARIANT=' + value
+                    fields[7] = info if fields[7] in ('', '.') else fields[7] + ';' + info
+                out.append('\t'.join(fields) + '\n')
+            elif record_ids is None:
+                out.append(json.dumps({'line': '\t'.join(fields), 'error': 'Invalid VCF record.'}) + '\n')
+            else:
+                out.append(json.dumps({
+                    'chrom': fields[0], 'pos': int(fields[1]), 'id': fields[2],
+                    'ref': fields[3], 'alt': fields[4].split(','),
+                    'hits': [
+                        docs[_id] if _id in docs else {'query': _id, 'notfound': True}
+                        for _id in record_ids
+                    ]
+                }, separators=(',', ':')) + '\n')
+
+        self.write(''.join(out))
+        await self.flush()
+
+    async def post(self):
+        options = dict(self.args)
+        vcf = options.pop('out') == 'vcf'
+        batch_size = self.biothings.config.VCF_ANNOTATION_BATCH_SIZE
+
+        if vcf:
+            self.set_header('Content-Type', 'text/x-vcf; charset=UTF-8')
+        else:
+            self.set_header('Content-Type', 'application/x-ndjson; charset=UTF-8')
+
+        batch = []
+        try:
+            for line in self.lines():
+                if line.startswith('#'):
+                    if vcf:
+                        if line.startswith('#CHROM'):
+                            self.write(self.INFO_HEADER)
+                        self.write(line)
+                elif line.strip():
+                    batch.append(line)
+                    if len(batch) >= batch_size:
+                        await self.annotate(batch, vcf, options)
+                        batch = []
+            if batch:
+                await self.annotate(batch, vcf, options)
+        except StreamClosedError:  # the client went away
+            return
+        except (OSError, EOFError) as exc:  # e.g. a truncated gzip file
+            if self._headers_written:
+                raise
+            raise HTTPError(400, reason=f"Cannot read the VCF file: {exc}")
+
+        self.finish()
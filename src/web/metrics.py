@@ -0,0 +1,63 @@
+"""
+Process-wide counters exposed on the /metrics endpoint.
+
+Every web worker keeps its own numbers, they are not aggregated across
+processes.
+"""
+from bisect import bisect_left
+from collections import defaultdict
+
+
+class Histogram:
+    """Counts of values, durations in milliseconds, per bucket upper bound."""
+
+    BOUNDS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+    def __init__(self, bounds=BOUNDS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # the last one for larger values
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def snapshot(self):
+        # cumulative, as in prometheus
+        buckets, total = {}, 0
+        for bound, count in zip((*self.bounds, "+Inf"), self.counts):
+            total += count
+            buckets[str(bound)] = total
+        return {"count": self.count, "sum": round(self.sum, 3), "buckets": buckets}
+
+
+class Metrics:
+
+    def __init__(self):
+        self.counters = defaultdict(int)
+        self.gauges = {}  # name -> callable returning the current value
+        self.histograms = defaultdict(Histogram)
+
+    def incr(self, name, value=1):
+        self.counters[name] += value
+
+    def observe(self, name, value):
+        """Add `value` to the histogram `name`."""
+        self.histograms[name].observe(value)
+
+    def register(self, name, func):
+        """Report the return value of `func` under `name` on every snapshot."""
+        self.gauges[name] = func
+
+    def snapshot(self):
+        out = dict(self.counters)
+        for name, func in self.gauges.items():
+            out[name] = func()
+        for name, histogram in self.histograms.items():
+            out[name] = histogram.snapshot()
+        return out
+
+
+metrics = Metrics()
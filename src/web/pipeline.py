@@ -1,8 +1,22 @@
+import asyncio
+import json
+import os
 import re
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
-from elasticsearch_dsl import Search
-from biothings.web.query import ESQueryBuilder, AsyncESQueryBackend
+from elasticsearch_dsl import A, MultiSearch, Q, Search
+from biothings.web.query import ESQueryBuilder, AsyncESQueryBackend, ESResultFormatter
+
+from utils.binning import BIN_MAX_POSITION, overlapping_bins
+from utils.bloom import BloomFilter
+from utils.genetable import GENE_FIELDS, GeneTable
+from utils.liftover import LiftOver
+from utils.rsidtable import parse_rsid
+from web.cache import FileLoader, ResultCache, SingleFlight, index_versions
+from web.dispatch import IDDispatcher
+from web.metrics import metrics
+from web.rsid import RsidResolver
+from web.timing import timed
 
 
 INTERVAL_PATTERN = re.compile(
@@ -24,9 +38,135 @@ INTERVAL_PATTERN = re.compile(
     flags=re.ASCII | re.IGNORECASE | re.VERBOSE
 )
 
+# chromosome of a genomic HGVS id, e.g. "X" for "chrX:g.1337588C>A"
+HGVS_CHROM_PATTERN = re.compile(r'chr(?P<chr>[1-9]|1[0-9]|2[0-2]|X|Y|MT):g\.')
+
+# a gene symbol, optionally in a field, e.g. "BTK" or "dbnsfp.genename:BTK"
+GENE_QUERY_PATTERN = re.compile(r'(?:(?P<field>[\w.]+):)?(?P<symbol>[A-Za-z0-9][A-Za-z0-9.\-]*)', re.ASCII)
+
+
+class RsidSearch(Search):
+    """
+    The search of the variants of an rsid, which the backend can answer
+    from an rsid table rather than by running it (see web.rsid).
+    """
+
+    def __init__(self, rsid=None, **kwargs):
+        super().__init__(**kwargs)
+        self.rsid = rsid
+
+    def _clone(self):
+        search = super()._clone()
+        search.rsid = self.rsid
+        return search
+
+
+class IdSearch(Search):
+    """
+    The search of a variant by _id, which the backend can answer without
+    running it if the id is known to be absent from the index.
+    """
+
+    def __init__(self, hgvs_id=None, **kwargs):
+        super().__init__(**kwargs)
+        self.hgvs_id = hgvs_id
+
+    def _clone(self):
+        search = super()._clone()
+        search.hgvs_id = self.hgvs_id
+        return search
+
+
+class GeneSearch(Search):
+    """
+    The search of the variants of a gene, which the backend restricts to
+    the regions of the gene when they come from the gene table of the index
+    queried (see utils.genetable).
+    """
+
+    def __init__(self, gene=None, version=None, region_filter=None, routing=None, **kwargs):
+        super().__init__(**kwargs)
+        self.gene = gene
+        self.version = version
+        self.region_filter = region_filter
+        self.routing = routing
+
+    def _clone(self):
+        search = super()._clone()
+        search.gene = self.gene
+        search.version = self.version
+        search.region_filter = self.region_filter
+        search.routing = self.routing
+        return search
+
+    def in_regions(self):
+        """Return the search restricted to the regions of the gene."""
+        search = self.filter(self.region_filter)
+        if self.routing:
+            search = search.params(routing=self.routing)
+        return search
+
+
+def mget_hit(doc):
+    """A search hit of a document returned by mget."""
+    hit = {'_index': doc['_index'], '_id': doc['_id'], '_score': 1.0, '_source': doc.get('_source', {})}
+    if '_version' in doc:  # kept by the formatter with the "version" option only
+        hit['_version'] = doc['_version']
+    return hit
+
+
+def search_response(hits=(), total=0):
+    """A search response made up by the backend."""
+    return {
+        'took': 0, 'timed_out': False,
+        'hits': {
+            'total': {'value': total, 'relation': 'eq'},
+            'max_score': 1.0 if hits else None,
+            'hits': list(hits)
+        }
+    }
+
 
 class MVQueryBuilder(ESQueryBuilder):
+
+    def __init__(self, user_query=None, scopes_regexs=(), scopes_default=('_id',), *args, **kwargs):
+        # biothings passes them positionally, see biothings.web.services.namespace
+        super().__init__(user_query, scopes_regexs, scopes_default, *args, **kwargs)
+        # ANNOTATION_ID_REGEX_LIST compiled as one pattern, see web.dispatch,
+        # with the default "scope:term" pattern the framework parser appends.
+        parser = self.parser
+        self.parser = IDDispatcher(
+            parser.patterns, parser.default_scopes,
+            fields=parser._build_endpoint_metadata_fields)
+        # settings of config_web, see configure()
+        self.interval_bins = False
+        self.liftover_chains = {}
+        self.liftovers = {}
+        self.gene_table_loader = None
+
+    def configure(self, config):
+        """Apply the settings of config_web, see configure_pipeline()."""
+        self.interval_bins = config.INTERVAL_BINS
+        self.liftover_chains = dict(config.LIFTOVER_CHAINS)
+        if config.GENE_TABLES:
+            self.gene_table_loader = FileLoader(
+                os.path.join(config.GENE_TABLES, "genes_{key}.json"), GeneTable.load)
+
+    async def load_liftovers(self):
+        """Parse the chain files of `liftover_chains` in a thread, not to block the event loop."""
+        loop = asyncio.get_running_loop()
+        for pair, chain_file in self.liftover_chains.items():
+            self.liftovers[pair] = await loop.run_in_executor(None, LiftOver.from_chain_file, chain_file)
+
+    def build(self, q=None, **options):
+        if isinstance(q, list):
+            # a batch of ids is parsed in one pass
+            with self.parser.batch(q, self.metadata):
+                return super().build(q, **options)
+        return super().build(q, **options)
+
     @staticmethod
+    @timed('interval')
     def _parse_interval_query(q: str) -> Optional[Dict[str, str]]:
         """
         Parse query string and extract appropriate genome interval query
@@ -87,30 +227,677 @@ class MVQueryBuilder(ESQueryBuilder):
         r['query'] = ' AND '.join(query)
         return r
 
+    @staticmethod
+    def interval_filter(chrom: str, gstart: str, gend: str, assembly: str, bins: bool = False) -> Q:
+        """
+        Build the filter matching variants overlapping an interval.
+        Positions may use commas as thousands separators.
+
+        With `bins`, a terms filter on the genomic bins overlapping the
+        interval narrows down the documents before the range checks.
+        """
+        assembly = 'hg38' if assembly == 'hg38' else 'hg19'
+        gstart = int(gstart.replace(',', ''))
+        gend = int(gend.replace(',', ''))
+        filters = [Q('match', chrom=chrom)]
+        if bins and 1 <= gstart <= min(gend, BIN_MAX_POSITION):
+            overlapping = overlapping_bins(gstart, min(gend, BIN_MAX_POSITION))
+            filters.append(Q('terms', **{assembly + ".bin": overlapping}))
+        filters.append(Q('range', **{assembly + ".start": {"lte": gend}}))
+        filters.append(Q('range', **{assembly + ".end": {"gte": gstart}}))
+        return Q('bool', filter=filters)
+
+    def liftover(self, options) -> Optional[LiftOver]:
+        """
+        Return the liftover from the "assembly_from" to the "assembly" of a
+        request, None if they are the same.
+        """
+        source = options.get('assembly_from')
+        target = 'hg38' if options.get('assembly') == 'hg38' else 'hg19'
+        if not source or source == target:
+            return None
+        if (source, target) not in self.liftovers:
+            supported = ', '.join(f"{s} to {t}" for s, t in self.liftovers) or 'none'
+            # a 400 response, see biothings.web.query.pipeline.capturesESExceptions
+            raise ValueError(f"Liftover from {source} to {target} is not supported (supported: {supported}).")
+        return self.liftovers[(source, target)]
+
+    @timed('build')
     def default_string_query(self, q, options):
 
         match = self._parse_interval_query(q)
         if match:  # interval query
+            chrom, gstart, gend = match['chr'], match['gstart'], match['gend']
+            liftover = self.liftover(options)
+            if liftover:
+                lifted = liftover.convert_interval(
+                    chrom, int(gstart.replace(',', '')), int(gend.replace(',', '')))
+                if not lifted:  # not in the assembly queried
+                    return Search().query('match_none')
+                chrom, gstart, gend = lifted[0], str(lifted[1]), str(lifted[2])
+
             search = Search()
             if match['query'] != '':
                 search = search.query("query_string", query=match['query'])
-            search = search.filter('match', chrom=match['chr'])
-            assembly = 'hg38' if options.assembly == 'hg38' else 'hg19'
-            search = search.filter('range', **{assembly + ".start": {"lte": match['gend']}})
-            search = search.filter('range', **{assembly + ".end": {"gte": match['gstart']}})
+            search = search.filter(self.interval_filter(
+                chrom, gstart, gend, options.assembly, self.interval_bins))
+            search = search.params(routing=chrom.upper())
 
         else:  # default query
-            search = super().default_string_query(q, options)
+            search = self.gene_query(q, options) or super().default_string_query(q, options)
 
         return search
 
+    def gene_table(self, assembly: str) -> Optional[GeneTable]:
+        """Return the latest gene table of `assembly`, or None if there is none."""
+        if self.gene_table_loader is None:
+            return None
+        return self.gene_table_loader.get(assembly)
+
+    def gene_query(self, q: str, options) -> Optional[GeneSearch]:
+        """Build the search of a gene symbol query, or return None if `q` is not one."""
+        if self.gene_table_loader is None:
+            return None
+        match = GENE_QUERY_PATTERN.fullmatch(q.strip())
+        if not match or match['field'] and match['field'] not in GENE_FIELDS:
+            return None
+        assembly = 'hg38' if options.get('assembly') == 'hg38' else 'hg19'
+        table = self.gene_table(assembly)
+        regions = table.lookup(match['symbol']) if table is not None else None
+        if not regions:
+            return None
+        fields = [match['field']] if match['field'] else GENE_FIELDS
+        return self.gene_search(match['symbol'], fields, regions, assembly, table.version, self.interval_bins)
+
+    @classmethod
+    def gene_search(cls, symbol, fields, regions, assembly, version=None, bins=False) -> GeneSearch:
+        """
+        Build the search of the variants of a gene: a match of its symbol in
+        `fields`, and the filter on its (chrom, start, end) `regions` the
+        backend adds when the table of the regions is `version`, see
+        interval_filter() for `bins`.
+        """
+        search = GeneSearch(
+            gene=symbol, version=version,
+            region_filter=Q('bool', should=[
+                cls.interval_filter(chrom, str(start), str(end), assembly, bins)
+                for chrom, start, end in regions
+            ], minimum_should_match=1),
+            routing=regions[0][0].upper() if len(regions) == 1 else None)
+        return search.query('bool', should=[
+            Q('match', **{field: symbol}) for field in fields
+        ], minimum_should_match=1)
+
+    def _build_match_query(self, q, scopes, options):
+        # the framework rebuilds a single match query as Search().query(...),
+        # which drops the IdSearch or RsidSearch of default_match_query and its routing
+        if isinstance(q, (list, tuple)):
+            return super()._build_match_query(q, scopes, options)
+        if not (q and scopes):
+            raise ValueError("No search terms or scopes.")
+        return self.default_match_query(q, scopes, options)
+
+    @timed('build')
+    def default_match_query(self, q, scopes, options):
+        liftover = self.liftover(options) if list(scopes) == ['_id'] else None
+        if liftover and isinstance(q, str):
+            q = liftover.convert_hgvs(q)
+            if q is None:  # not in the assembly queried
+                return Search().query('match_none')
+
+        search = super().default_match_query(q, scopes, options)
+
+        # an _id lookup can be routed to the shard of its chromosome
+        if isinstance(q, str) and list(scopes) == ['_id']:
+            search = IdSearch.from_dict(search.to_dict())
+            search.hgvs_id = q
+            match = HGVS_CHROM_PATTERN.match(q)
+            if match:
+                search = search.params(routing=match['chr'])
+
+        # an rsid lookup may be resolved to _ids by the backend
+        elif isinstance(q, str) and list(scopes) == ['dbsnp.rsid']:
+            rsid = parse_rsid(q)
+            if rsid is not None:
+                search = RsidSearch.from_dict(search.to_dict())
+                search.rsid = rsid
+
+        return search
+
+    def build_region_queries(self, regions: List[str], q: Optional[str] = None,
+                             combine: bool = False, **options) -> List[Search]:
+        """
+        Build the searches of a batch region query.
+
+        Each region is a "chr<Chromosome>:<start>-<end>" or a
+        "chr<Chromosome>:<position>" string, and `q` an optional query string
+        all the regions share. By default one search is built per region.
+        With `combine`, a single search is built instead: its query matches
+        any of the regions, and a "regions" filters aggregation holds the
+        total and the top hits of each region, keyed by region offset.
+
+        Raises ValueError on a malformed region.
+        """
+        filters, chroms = [], []
+        for region in regions:
+            match = self._parse_interval_query(region)
+            if not match or match['query']:
+                raise ValueError(f"Invalid region '{region}'.")
+            filters.append(self.interval_filter(
+                match['chr'], match['gstart'], match['gend'], options.get('assembly'), self.interval_bins))
+            chroms.append(match['chr'].upper())
+
+        size = options.get('size', 10)
+        fields = options.get('fields')
+
+        base = Search()
+        if q:
+            base = base.query("query_string", query=q)
+
+        if combine:
+            search = base.filter(Q('bool', should=filters, minimum_should_match=1))
+            top_hits = {'size': size}
+            if fields:
+                top_hits['_source'] = fields
+            agg = A('filters', filters={str(i): f for i, f in enumerate(filters)})
+            agg.bucket('top', 'top_hits', **top_hits)
+            search.aggs.bucket('regions', agg)
+            return [search.extra(size=0)]
+
+        searches = []
+        for f, chrom in zip(filters, chroms):
+            search = base.filter(f).params(routing=chrom).extra(size=size)
+            if fields:
+                search = search.source(includes=fields)
+            searches.append(search)
+        return searches
+
 
 class MVQueryBackend(AsyncESQueryBackend):
 
-    def execute(self, query, **options):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # settings of config_web, see configure()
+        self.chrom_routing = False
+        self.rsid_resolver = None
+        self.id_filter_loader = None
+        self.batch_mget = False
+        self.batch_mget_size = 200
+        self.batch_mget_concurrency = 4
+        self.result_cache = None
+
+    def configure(self, config):
+        """Apply the settings of config_web, see configure_pipeline()."""
+        self.chrom_routing = config.CHROM_ROUTING
+        self.batch_mget = config.BATCH_MGET
+        self.batch_mget_size = config.BATCH_MGET_SIZE
+        self.batch_mget_concurrency = config.BATCH_MGET_CONCURRENCY
+        if config.RESULT_CACHE_SIZE or config.RESULT_CACHE_STORE is not None:
+            self.result_cache = ResultCache(
+                config.RESULT_CACHE_SIZE, config.RESULT_CACHE_TTL, config.RESULT_CACHE_STORE)
+            metrics.register('result_cache', self.result_cache.stats)
+        if config.RSID_TABLES:
+            self.rsid_resolver = RsidResolver(config.RSID_TABLES)
+        if config.ID_FILTERS:
+            self.id_filter_loader = FileLoader(
+                os.path.join(config.ID_FILTERS, "ids_{key}.bloom"), BloomFilter.load)
+
+    def route(self, query):
+        """Drop the routing of `query` unless `chrom_routing` is enabled."""
+        if self.chrom_routing:
+            return query
+        if isinstance(query, MultiSearch):
+            routed = query._clone()
+            routed._searches = [self.route(search) for search in query._searches]
+            return routed
+        if isinstance(query, Search) and 'routing' in query._params:
+            query = query._clone()
+            del query._params['routing']
+        return query
+
+    # concurrent identical searches, typically bursts of requests
+    # for a trending variant, share a single ES request.
+    coalesce = True
+    inflight = SingleFlight()
+
+    @staticmethod
+    def coalesce_key(query, options):
+        """
+        Identify a search by its body, its request parameters and the
+        options it is executed with, or return None if it must not be shared.
+        """
+        # scrolls are stateful, each request gets its own
+        if options.get('fetch_all') or options.get('scroll_id'):
+            return None
+        if not isinstance(query, (Search, MultiSearch)):
+            return None
+        params = query._params if isinstance(query, Search) else \
+            [search._params for search in query._searches]
+        return json.dumps([query.to_dict(), params, options], sort_keys=True, default=str)
+
+    # the parts of a search the backend can answer by fetching documents by _id
+    MGET_KEYS = {'query', '_source', 'size', 'from', 'track_total_hits', 'version'}
+
+    def resolve_rsid(self, query, assembly, version):
+        """Return the _ids of the variants of an RsidSearch, or None to run the search."""
+        if self.rsid_resolver is None or not isinstance(query, RsidSearch):
+            return None
+        if not set(query.to_dict()) <= self.MGET_KEYS:
+            return None
+        ids = self.rsid_resolver.resolve(query.rsid, assembly, version)
+        metrics.incr('rsid_table.hits' if ids is not None else 'rsid_table.fallbacks')
+        return ids
+
+    @staticmethod
+    def source_params(body):
+        """The mget request parameters of the _source of the search `body`."""
+        params = {}
+        source = body.get('_source')
+        if isinstance(source, dict):
+            params['_source_includes'] = source.get('includes')
+            params['_source_excludes'] = source.get('excludes')
+        elif isinstance(source, (list, str)):
+            params['_source_includes'] = source
+        elif isinstance(source, bool):
+            params['_source'] = source
+        return {key: value for key, value in params.items() if value is not None}
+
+    def mget_doc(self, _id):
+        """The mget document of `_id`, with the routing of its chromosome if `chrom_routing` is enabled."""
+        match = HGVS_CHROM_PATTERN.match(_id) if self.chrom_routing else None
+        return {'_id': _id, 'routing': match['chr']} if match else {'_id': _id}
+
+    @staticmethod
+    def mget_page(ids, query):
+        """The `ids` of the page of results `query`, a search of these ids, asks for."""
+        body = query.to_dict()
+        start = body.get('from', 0)
+        return ids[start:start + body.get('size', 10)]
+
+    @staticmethod
+    def mget_response(ids, page, found):
+        """The response of a search of `ids`, of which the documents `found` of `page` were fetched."""
+        hits = [mget_hit(found[_id]) for _id in page if _id in found]
+        # ids missing from the index, if any, are only noticed on the page fetched
+        return search_response(hits, len(ids) - (len(page) - len(hits)))
+
+    async def mget(self, ids, query, index):
+        """
+        Fetch the documents of `ids` directly, and return them as the
+        response of `query`, a search of these ids.
+        """
+        page = self.mget_page(ids, query)
+        found = {}
+        if page:
+            res = await self.client.mget(
+                index=index, body={'docs': [self.mget_doc(_id) for _id in page]},
+                **self.source_params(query.to_dict()))
+            found = {doc['_id']: doc for doc in res['docs'] if doc.get('found')}
+        return self.mget_response(ids, page, found)
+
+    async def resolve_rsids(self, query, index, assembly):
+        """
+        Answer the searches of `query`, a multisearch, of the rsids the
+        rsid table resolves, by fetching the documents of their _ids.
+        Return the query left to run, None if there is none, and the
+        responses, None in place of the ones to get from ES, or None if
+        no rsid was resolved.
+        """
+        version = await index_versions.version(self.client, index)
+        resolved = [self.resolve_rsid(search, assembly, version) for search in query._searches]
+        if all(ids is None for ids in resolved):
+            return query, None
+
+        # the searches of a batch share their fields, group them anyway
+        groups, pages = {}, []
+        for search, ids in zip(query._searches, resolved):
+            page = self.mget_page(ids, search) if ids is not None else None
+            if page:
+                params = self.source_params(search.to_dict())
+                docs = groups.setdefault(json.dumps(params, sort_keys=True), (params, {}))[1]
+                docs.update((_id, self.mget_doc(_id)) for _id in page)
+            pages.append(page)
+        found = {}
+        for group_found in await asyncio.gather(*[
+                self.mget_chunks(index, list(docs.values()), self.batch_mget_size,
+                                 self.batch_mget_concurrency, **params)
+                for params, docs in groups.values()]):
+            found.update(group_found)
+
+        responses = [self.mget_response(ids, page, found) if ids is not None else None
+                     for ids, page in zip(resolved, pages)]
+        remaining = query._clone()
+        remaining._searches = [search for search, ids in zip(query._searches, resolved) if ids is None]
+        return remaining if remaining._searches else None, responses
+
+    def id_filter(self, assembly, version):
+        """Return the filter of the ids of the index `version` of `assembly`, or None."""
+        if self.id_filter_loader is None or version is None:
+            return None
+        # a new version of the index makes the loader look for a new filter
+        bloom = self.id_filter_loader.get(assembly, version)
+        if bloom is None or bloom.version != str(version):
+            return None
+        return bloom
+
+    def absent(self, search, bloom):
+        """True if `search` looks an id up which is definitely not in the index."""
+        if not isinstance(search, IdSearch):
+            return False
+        if search.hgvs_id in bloom:
+            metrics.incr('id_filter.misses')
+            return False
+        metrics.incr('id_filter.hits')
+        return True
+
+    async def filter_ids(self, query, index, assembly):
+        """
+        Answer the _id lookups of `query`, a search or a multisearch, of
+        ids absent from the index. Return the query left to run, None if
+        there is none, and the responses, None in place of the ones to get
+        from ES, or None if there is no response to make up.
+        """
+        bloom = self.id_filter(assembly, await index_versions.version(self.client, index))
+        if bloom is None:
+            return query, None
+        if isinstance(query, MultiSearch):
+            responses = [search_response() if self.absent(search, bloom) else None
+                         for search in query._searches]
+            if not any(responses):
+                return query, None
+            remaining = query._clone()
+            remaining._searches = [search for search, response in zip(query._searches, responses)
+                                   if response is None]
+            return remaining if remaining._searches else None, responses
+        if self.absent(query, bloom):
+            return None, search_response()
+        return query, None
+
+    def restrict_gene_search(self, query, version):
+        """Restrict a GeneSearch to the regions of its gene, if they come from the index `version`."""
+        if version is None or query.version != str(version):
+            metrics.incr('gene_table.fallbacks')
+            return query
+        metrics.incr('gene_table.hits')
+        return query.in_regions()
+
+    @timed('es')
+    async def execute(self, query, **options):
 
         # override index to query
         if options.get('assembly') == 'hg38':
             options['biothing_type'] = 'hg38'
 
-        return super().execute(query, **options)
+        if isinstance(query, RsidSearch) and self.rsid_resolver is not None:
+            index = self.indices[options.get('biothing_type')]
+            version = await index_versions.version(self.client, index)
+            assembly = 'hg38' if options.get('biothing_type') == 'hg38' else 'hg19'
+            ids = self.resolve_rsid(query, assembly, version)
+            if ids is not None:
+                return await self.mget(ids, query, index)
+
+        # rsids of a batch query, e.g. a POST of rsids
+        if isinstance(query, MultiSearch) and self.rsid_resolver is not None and not options.get('raw'):
+            index = self.indices[options.get('biothing_type')]
+            assembly = 'hg38' if options.get('biothing_type') == 'hg38' else 'hg19'
+            query, responses = await self.resolve_rsids(query, index, assembly)
+            if responses is not None:
+                found = iter(await self.execute_filtered(query, **options) if query else ())
+                return [response or next(found) for response in responses]
+
+        if isinstance(query, GeneSearch):
+            index = self.indices[options.get('biothing_type')]
+            query = self.restrict_gene_search(query, await index_versions.version(self.client, index))
+
+        return await self.execute_filtered(query, **options)
+
+    async def execute_filtered(self, query, **options):
+        """Execute `query`, without looking the ids the id filter knows are absent up."""
+        if self.id_filter_loader is not None and isinstance(query, (IdSearch, MultiSearch)):
+            index = self.indices[options.get('biothing_type')]
+            assembly = 'hg38' if options.get('biothing_type') == 'hg38' else 'hg19'
+            query, responses = await self.filter_ids(query, index, assembly)
+            if isinstance(responses, list):
+                found = iter(await self._execute(query, **options) if query else ())
+                return [response or next(found) for response in responses]
+            if responses is not None:
+                return responses
+
+        return await self._execute(query, **options)
+
+    def mget_lookup(self, search):
+        """
+        Return the mget document, {"_id", "routing"}, of a search the
+        backend can answer by fetching a document by _id, or None.
+        """
+        if not isinstance(search, IdSearch):
+            return None
+        body = search.to_dict()
+        if not set(body) <= self.MGET_KEYS or body.get('from', 0) or body.get('size', 10) < 1:
+            return None
+        if not self.chrom_routing:
+            return {'_id': search.hgvs_id}
+        # the shard of the document is only known with the routing of its chromosome
+        routing = search._params.get('routing')
+        return {'_id': search.hgvs_id, 'routing': routing} if routing else None
+
+    async def mget_chunks(self, index, docs, chunk_size, concurrency, **params):
+        """
+        Fetch `docs`, mget documents, by mget requests of up to `chunk_size`
+        documents, with at most `concurrency` requests in flight.
+        Return the documents found by _id.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        inflight = parallelism = 0
+
+        async def run(chunk):
+            nonlocal inflight, parallelism
+            async with semaphore:
+                inflight += 1
+                parallelism = max(parallelism, inflight)
+                try:
+                    res = await self.client.mget(index=index, body={'docs': chunk}, **params)
+                finally:
+                    inflight -= 1
+            return res['docs']
+
+        chunks = [docs[i:i + chunk_size] for i in range(0, len(docs), chunk_size)]
+        for chunk in chunks:
+            metrics.observe('mget.chunk_size', len(chunk))
+        found = {}
+        for chunk_docs in await asyncio.gather(*map(run, chunks)):
+            found.update((doc['_id'], doc) for doc in chunk_docs if doc.get('found'))
+        if chunks:
+            metrics.observe('mget.parallelism', parallelism)
+        return found
+
+    async def execute_batch(self, query, lookups, **options):
+        """
+        Run a multisearch, its searches with a document in `lookups` as
+        mget requests, the others as an _msearch request, concurrently.
+        Return the responses in the order of the searches.
+        """
+        index = self.indices[options.get('biothing_type')]
+        remaining = query._clone()
+        remaining._searches = [search for search, doc in zip(query._searches, lookups) if doc is None]
+
+        # the searches of a batch share their fields, group them anyway
+        groups = {}
+        for search, doc in zip(query._searches, lookups):
+            if doc is not None:
+                params = self.source_params(search.to_dict())
+                key = json.dumps(params, sort_keys=True)
+                groups.setdefault(key, (params, {}))[1][doc['_id']] = doc
+
+        tasks = [self.mget_chunks(index, list(docs.values()), self.batch_mget_size,
+                                  self.batch_mget_concurrency, **params)
+                 for params, docs in groups.values()]
+        if remaining._searches:
+            tasks.append(self._search(remaining, **options))
+        results = await asyncio.gather(*tasks)
+
+        found = {}
+        for group_found in results[:len(groups)]:
+            found.update(group_found)
+        searched = iter(results[-1] if remaining._searches else ())
+        metrics.incr('batch_mget.ids', sum(doc is not None for doc in lookups))
+
+        responses = []
+        for doc in lookups:
+            if doc is None:
+                responses.append(next(searched))
+            elif doc['_id'] in found:
+                responses.append(search_response([mget_hit(found[doc['_id']])], 1))
+            else:
+                responses.append(search_response())
+        return responses
+
+    async def _execute(self, query, **options):
+        # raw responses are the ones of ES
+        if self.batch_mget and isinstance(query, MultiSearch) and not options.get('raw'):
+            lookups = [self.mget_lookup(search) for search in query._searches]
+            if any(lookups):
+                return await self.execute_batch(query, lookups, **options)
+        return await self._search(query, **options)
+
+    def result_key(self, query, options):
+        """Identify the response of a search, or return None if it must not be cached."""
+        # scrolls are stateful, raw responses are raised by the backend
+        if options.get('fetch_all') or options.get('scroll_id') or options.get('raw'):
+            return None
+        if not isinstance(query, Search):
+            return None
+        index = self.indices[options.get('biothing_type')]
+        return json.dumps([index, query.to_dict(), query._params], sort_keys=True, default=str)
+
+    async def _search(self, query, **options):
+        query = self.route(query)
+        key = self.result_key(query, options) if self.result_cache is not None else None
+        if key is None:
+            return await self._coalesced(query, **options)
+
+        index = self.indices[options.get('biothing_type')]
+        version = await index_versions.version(self.client, index)
+        if version is None:
+            return await self._coalesced(query, **options)
+        response = await self.result_cache.get(key, version)
+        if response is not None:
+            return response
+        response = await self._coalesced(query, **options)
+        response = getattr(response, 'body', response)  # elasticsearch>=8 wraps the response
+        await self.result_cache.set(key, version, response)
+        return response
+
+    async def _coalesced(self, query, **options):
+        key = self.coalesce_key(query, options) if self.coalesce else None
+        if key is None:
+            return await super().execute(query, **options)
+        return await self.inflight.do(key, super().execute, query, **options)
+
+    @timed('es')
+    async def mget_ids(self, ids, chunk_size=100, concurrency=4, fields=None, **options):
+        """
+        Fetch the documents of `ids` by mget requests of up to `chunk_size`
+        ids, with at most `concurrency` requests in flight, skipping the ids
+        the id filter knows are absent. Return a list of search hits in the
+        order of `ids`, None for the ids not found.
+        """
+        if options.get('assembly') == 'hg38':
+            options['biothing_type'] = 'hg38'
+        index = self.indices[options.get('biothing_type')]
+        lookup = list(dict.fromkeys(ids))  # unique ids, in order
+
+        if self.id_filter_loader is not None:
+            assembly = 'hg38' if options.get('biothing_type') == 'hg38' else 'hg19'
+            bloom = self.id_filter(assembly, await index_versions.version(self.client, index))
+            if bloom is not None:
+                maybe = [_id for _id in lookup if _id in bloom]
+                metrics.incr('id_filter.hits', len(lookup) - len(maybe))
+                metrics.incr('id_filter.misses', len(maybe))
+                lookup = maybe
+
+        docs = [self.mget_doc(_id) for _id in lookup]
+        params = {'_source_includes': fields} if fields else {}
+        found = await self.mget_chunks(index, docs, chunk_size, concurrency, **params)
+        return [mget_hit(found[_id]) if _id in found else None for _id in ids]
+
+    @timed('es')
+    async def multisearch(self, searches, chunk_size=100, concurrency=4, **options):
+        """
+        Run `searches` as _msearch requests of up to `chunk_size` searches,
+        with at most `concurrency` requests in flight.
+        Responses are returned in the order of `searches`.
+        """
+        if options.get('assembly') == 'hg38':
+            options['biothing_type'] = 'hg38'
+        index = self.indices[options.get('biothing_type')]
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run(chunk):
+            body = []
+            for search in map(self.route, chunk):
+                body.append({'index': index, **search._params})
+                body.append(search.to_dict())
+            async with semaphore:
+                res = await self.client.msearch(body=body)
+            return res['responses']
+
+        chunks = [searches[i:i + chunk_size] for i in range(0, len(searches), chunk_size)]
+        responses = []
+        for chunk_responses in await asyncio.gather(*map(run, chunks)):
+            responses.extend(chunk_responses)
+        return responses
+
+
+class MVResultFormatter(ESResultFormatter):
+
+    @timed('format')
+    def transform(self, response, **options):
+        return super().transform(response, **options)
+
+    def transform_regions(self, regions, responses, combine=False, **options):
+        """
+        The results of the region queries of MVQueryBackend.multisearch, in the
+        order of `regions`. A region whose search failed gets an error object,
+        as the failed terms of a batch query, the other regions are answered.
+        """
+        if combine and 'error' in responses[0]:
+            responses = responses * len(regions)  # the single search of all the regions
+        elif combine:
+            buckets = responses[0]['aggregations']['regions']['buckets']
+            responses = [{'hits': buckets[str(i)]['top']['hits']} for i in range(len(regions))]
+
+        results = []
+        for region, response in zip(regions, responses):
+            if 'error' in response:
+                error = response['error']
+                results.append({
+                    'query': region,
+                    'error': error.get('reason', error) if isinstance(error, dict) else error,
+                    'success': False
+                })
+                continue
+            result = self.transform(response, **options)
+            result['query'] = region
+            results.append(result)
+        return results
+
+
+async def configure_pipeline(biothings):
+    """
+    Apply the settings of config_web to the query pipeline of an application,
+    once, as biothings creates it without the config. Handlers await it before
+    using the pipeline, see web.handlers.PipelineSettingsMixin. The chain files
+    of LIFTOVER_CHAINS are parsed in a thread meanwhile, the event loop keeps
+    serving the other requests.
+    """
+    pipeline = biothings.pipeline
+    if getattr(pipeline, 'configured', None) is None:
+        pipeline.builder.configure(biothings.config)
+        pipeline.backend.configure(biothings.config)
+        pipeline.configured = asyncio.ensure_future(pipeline.builder.load_liftovers())
+    # shared by the first requests, not cancelled with one of them
+    await asyncio.shield(pipeline.configured)
+
+
+metrics.register('backend.coalesced', lambda: MVQueryBackend.inflight.coalesced)
@@ -0,0 +1,37 @@
+"""
+Resolve rsids to the HGVS ids of their variants with the tables exported
+by the hub (see utils.rsidtable), instead of searching ES.
+"""
+import os
+
+from utils.rsidtable import RsidTable
+from web.cache import FileLoader
+
+
+class RsidResolver:
+    """
+    Look rsids up in "<folder>/rsid_<assembly>.tbl".
+
+    A table is only used when its version is the build version of the index
+    queried, and is reopened when the hub exports a new one.
+    """
+
+    def __init__(self, folder, check_interval=60):
+        self.folder = folder
+        self.tables = FileLoader(os.path.join(folder, "rsid_{key}.tbl"), RsidTable, check_interval)
+
+    def table(self, assembly):
+        """Return the table of `assembly`, or None if there is none."""
+        return self.tables.get(assembly)
+
+    def resolve(self, rsid, assembly, version):
+        """
+        Return the HGVS ids of `rsid`, an int, for `assembly`, or None
+        if there is no table of the index `version` to tell.
+        """
+        if version is None:
+            return None
+        table = self.tables.get(assembly, version)
+        if table is None or table.version != str(version):
+            return None
+        return table.lookup(rsid)
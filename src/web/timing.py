@@ -0,0 +1,87 @@
+"""
+Time spent by a request in each stage of the query pipeline.
+
+Stages are timed with `timer()`, or the `timed()` decorator. Each duration
+goes to a histogram on the /metrics endpoint, "timing.<stage>", and to the
+timings of the current request, sent back in a Server-Timing header when
+the web server is started with --server_timing.
+"""
+import asyncio
+import functools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from tornado.options import define, options
+from tornado.web import OutputTransform
+
+from web.metrics import metrics
+
+define("server_timing", default=False, type=bool,
+       help="send the time spent in each stage of the query pipeline in a Server-Timing header")
+
+_timings = ContextVar("timings", default=None)
+
+
+class Timings:
+    """Durations, in milliseconds, of the stages of one request."""
+
+    def __init__(self):
+        self.stages = {}
+
+    def add(self, stage, duration):
+        self.stages[stage] = self.stages.get(stage, 0) + duration
+
+    def header(self, **extra):
+        stages = {**self.stages, **extra}
+        return ", ".join(f"{stage};dur={duration:.3f}" for stage, duration in stages.items())
+
+
+@contextmanager
+def timer(stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = (time.perf_counter() - start) * 1000
+        metrics.observe("timing." + stage, duration)
+        timings = _timings.get()
+        if timings is not None:
+            timings.add(stage, duration)
+
+
+def timed(stage):
+    """Decorate a function, or a coroutine function, to time its calls as `stage`."""
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                with timer(stage):
+                    return await func(*args, **kwargs)
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with timer(stage):
+                    return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class ServerTimingTransform(OutputTransform):
+    """
+    Collect the timings of a request, and add them to its response headers,
+    with the total time spent before the response is sent.
+    """
+
+    def __init__(self, request):
+        super().__init__(request)
+        self.start = time.perf_counter()
+        self.timings = Timings()
+        # the request is handled in a task created after the transforms, within this context
+        _timings.set(self.timings)
+
+    def transform_first_chunk(self, status_code, headers, chunk, finishing):
+        if options.server_timing and self.timings.stages:
+            total = (time.perf_counter() - self.start) * 1000
+            headers["Server-Timing"] = self.timings.header(total=total)
+        return status_code, headers, chunk